@@ -1,19 +1,10 @@
-import asyncio
-
+import argparse
 import logging
-from pynput import keyboard
-import threading
-
-from langchain.agents import AgentExecutor
-from langchain.agents.conversational_chat.base import ConversationalChatAgent
-from langchain.chat_models import ChatOpenAI
+from typing import List, Optional
 
 import openjanus.app.config as openjanus_config
 from openjanus.app.banner import banner
-from openjanus.chains.prompt import BASE_AGENT_SYSTEM_PROMPT_PREFIX
-from openjanus.toolkits.toolkit import get_openjanus_tools
-from openjanus.stt.whisper.recorder import Recorder
-from openjanus.utils.exceptions import ListenKeyNotSupportedException
+from openjanus.app.profiling import start_profiler, profile_phase
 from openjanus.utils.text_coloring import YELLOW_TEXT, GREEN_TEXT, RESET_TEXT
 
 
@@ -21,95 +12,148 @@ logging.basicConfig(level=logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
 
 
-class KeyListener:
-        def __init__(self, recorder: Recorder, agent_chain: AgentExecutor, listen_key: str):
-            self.recorder = recorder
-            self.agent_chain = agent_chain
-            self.record_key_pressed = False
-            self.listen_key = self.get_key(listen_key)
-
-        def get_key(self, key: str):
-            try:
-                # Try to get a key for special keys
-                return keyboard.Key[key]
-            except KeyError:
-                try:
-                    # If that fails, the key is not a special key, then it must be a character
-                    return keyboard.KeyCode.from_char(key)
-                except KeyError:
-                    LOGGER.error(f"The key {key} is not a valid key that can be used")
-                    raise ListenKeyNotSupportedException(key)
-
-        def on_press(self, key):
-            try:
-                if key == self.listen_key and not self.recorder.is_recording:
-                    self.record_key_pressed = True
-                    LOGGER.info("Record button pressed")
-                    self.recorder.start_recording()
-            except AttributeError:
-                pass
-
-        def on_release(self, key):
-            if key == self.listen_key and self.recorder.is_recording:
-                LOGGER.info("Recording button released")
-                self.record_key_pressed = False
-                recording_path = self.recorder.stop_recording()
-                
-                def run_async_process():
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(self.recorder.transcribe_and_invoke(self.agent_chain, recording_path))
-                    print(YELLOW_TEXT + "Ready to record next interaction" + RESET_TEXT)
-                    # loop.close()
-
-                if recording_path:
-                    thread = threading.Thread(target=run_async_process)
-                    thread.start()
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="openjanus", description="A voice controlled Intelligent Assistant for Star Citizen")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Time each startup phase and module import, write a JSON report, then exit once OpenJanus is ready",
+    )
+    parser.add_argument(
+        "--profile-output",
+        default="startup_profile.json",
+        help="Where to write the startup profile, defaults to startup_profile.json",
+    )
+    return parser.parse_args(argv)
+
 
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    profiler = start_profiler() if args.profile_startup else None
 
+    # The heavy imports happen here rather than at the top of the module, so that they can be profiled
+    with profile_phase("imports"):
+        from pynput import keyboard
+        from langchain.agents import AgentExecutor
+        from langchain.agents.conversational_chat.base import ConversationalChatAgent
+        from langchain.chat_models import ChatOpenAI
+
+        from openjanus.app.listener import ContinuousListener, KeyListener
+        from openjanus.chains.prompt import BASE_AGENT_SYSTEM_PROMPT_PREFIX
+        from openjanus.toolkits.registry import get_openjanus_toolkit
+        from openjanus.stt.base import get_stt_backend
+        from openjanus.stt.whisper.recorder import Recorder
 
-if __name__ == "__main__":
     print(banner())
     LOGGER.info("Performing startup checks")
-    config = openjanus_config.load_config()
-    config_health_check = openjanus_config.startup_checks()
+    with profile_phase("startup_checks"):
+        config = openjanus_config.get_config()
+        config_health_check = openjanus_config.startup_checks()
     if not config_health_check:
         LOGGER.error("Startup checks failed")
         exit(1)
     LOGGER.info("Startup checks passed, configuration loaded")
-    chat_llm = ChatOpenAI(
-        model="gpt-3.5-turbo-1106",
-        # model="gpt-4-1106-preview",
-        temperature=0.3,
-        streaming=True,
-        verbose=True
-    )
-    # memory = ConversationSummaryBufferMemory(llm=chat_llm, return_messages=True, memory_key="chat_history")
-    chat_agent = ConversationalChatAgent.from_llm_and_tools(
-        llm=chat_llm,
-        tools=get_openjanus_tools(llm=chat_llm),
-        system_message=BASE_AGENT_SYSTEM_PROMPT_PREFIX,
-        verbose=True
-    )
-    agent_chain = AgentExecutor.from_agent_and_tools(
-        tools=get_openjanus_tools(llm=chat_llm),
-        llm=chat_llm,
-        agent=chat_agent,
-        verbose=True,
-    )
-    recorder = Recorder()
-    listen_key = config["openjanus"]["listen_key"]
-
-    key_listener = KeyListener(recorder, agent_chain, listen_key)
-    with keyboard.Listener(
-        on_press=key_listener.on_press,
-        on_release=key_listener.on_release,
-        suppress=False,
-        listen_key=listen_key
-    ) as listener:
+    with profile_phase("llm_client_creation"):
+        chat_llm = ChatOpenAI(
+            model="gpt-3.5-turbo-1106",
+            # model="gpt-4-1106-preview",
+            temperature=0.3,
+            streaming=True,
+            verbose=True
+        )
+    with profile_phase("tool_construction"):
+        # memory = ConversationSummaryBufferMemory(llm=chat_llm, return_messages=True, memory_key="chat_history")
+        # Build the tools once, so the agent and its executor share the same tool instances
+        toolkit = get_openjanus_toolkit(llm=chat_llm)
+        tools = toolkit.get_tools()
+        chat_agent = ConversationalChatAgent.from_llm_and_tools(
+            llm=chat_llm,
+            tools=tools,
+            system_message=BASE_AGENT_SYSTEM_PROMPT_PREFIX,
+            verbose=True
+        )
+        agent_chain = AgentExecutor.from_agent_and_tools(
+            tools=tools,
+            llm=chat_llm,
+            agent=chat_agent,
+            verbose=True,
+        )
+    if config.router.enabled:
+        with profile_phase("intent_router"):
+            from openjanus.toolkits.router import LocalIntentRouter, RoutingAgent
+            # Requests that clearly belong to one tool go straight to it, the agent only picks the tool when unsure
+            router = LocalIntentRouter(toolkit.registry.specs(), threshold=config.router.threshold, margin=config.router.margin)
+            agent_chain = RoutingAgent(agent_chain, toolkit, router=router)
+    if config.onboard_ia.fast_path:
+        with profile_phase("onboard_ia_fast_path"):
+            from openjanus.chains.onboardia.fastpath import KeymapMatcher, OnboardIaFastPath
+            from openjanus.toolkits.toolkit import get_onboard_ia_memory
+            # Ship controls that are named outright skip the agent, everything else is passed through to it
+            agent_chain = OnboardIaFastPath(
+                agent_chain,
+                matcher=KeymapMatcher(threshold=config.onboard_ia.fast_path_threshold),
+                memory=get_onboard_ia_memory(),
+            )
+    if profiler is not None:
+        # Tools are normally built on first use, build them all now so their cost (e.g. loading survey data) is
+        # part of the report
+        for tool in tools:
+            with profile_phase(f"tool_build:{tool.name}"):
+                toolkit.get_lazy_tool(tool.name).get()
+    with profile_phase("tts_warm_up"):
+        from openjanus.tts.service import get_tts_service
+        # The TTS tool and its client are built once, and shared by every chain and callback
+        get_tts_service().warm_up()
+    with profile_phase("stt_backend_load"):
+        # Local models are loaded here, rather than on the first utterance
+        get_stt_backend()
+    with profile_phase("recorder_creation"):
+        recorder = Recorder()
+        # Open the input stream now, rather than when the listen key is first pressed
+        recorder.open()
+    with profile_phase("runtime_start"):
+        from openjanus.app.runtime import get_runtime
+        # Every interaction runs on this one event loop, listeners only queue them
+        runtime = get_runtime()
+        runtime.start()
+    listen_key = config.openjanus.listen_key
+    listen_mode = openjanus_config.get_listen_mode()
+
+    if listen_mode == "continuous":
+        listener = ContinuousListener(recorder, agent_chain)
+        with profile_phase("continuous_listener_start"):
+            listener.start()
+    else:
+        key_listener = KeyListener(recorder, agent_chain, listen_key)
+        listener = keyboard.Listener(
+            on_press=key_listener.on_press,
+            on_release=key_listener.on_release,
+            suppress=False,
+            listen_key=listen_key
+        )
+        with profile_phase("keyboard_listener_start"):
+            listener.start()
+            listener.wait()
+
+    if profiler is not None:
+        report = profiler.write_report(args.profile_output)
+        listener.stop()
+        runtime.stop()
+        recorder.close()
+        print(f"{GREEN_TEXT}Startup profile written to {args.profile_output}, ready in {report['time_to_ready_ms']:.0f}ms{RESET_TEXT}")
+        return
+
+    try:
         print(f"{GREEN_TEXT}Ready!{RESET_TEXT}")
-        print(f"{YELLOW_TEXT}Press {GREEN_TEXT}{listen_key.upper()}{YELLOW_TEXT} to start recording" + RESET_TEXT)
+        if listen_mode == "continuous":
+            print(f"{YELLOW_TEXT}Listening, just start talking" + RESET_TEXT)
+        else:
+            print(f"{YELLOW_TEXT}Press {GREEN_TEXT}{listen_key.upper()}{YELLOW_TEXT} to start recording" + RESET_TEXT)
         listener.join()
+    finally:
+        listener.stop()
+        runtime.stop()
+        recorder.close()
 
     while True:
         try:
@@ -118,3 +162,5 @@ if __name__ == "__main__":
             break
 
 
+if __name__ == "__main__":
+    main()
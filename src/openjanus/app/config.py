@@ -1,13 +1,17 @@
-from os import getenv, environ, path, makedirs
+from dataclasses import dataclass, field
+from os import getenv, environ, path, makedirs, stat
 import logging
+import threading
 import toml
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Optional, TypeVar
 
 from openjanus.utils.exceptions import (
-    ApiKeyNotSetException, 
+    ApiKeyNotSetException,
     ConfigFileNotFound,
     ConfigKeyNotFound,
     DirectoryCreationException,
+    ListenModeNotSupportedException,
+    SttNotImplementedException,
     TtsMpvNotFoundException,
     TtsNotImplementedException
 )
@@ -15,26 +19,453 @@ from openjanus.utils.exceptions import (
 
 LOGGER = logging.getLogger(__name__)
 
+SectionT = TypeVar("SectionT")
+
+
+@dataclass(frozen=True)
+class OpenJanusSettings:
+    """The base `[openjanus]` section of the config"""
+    listen_key: str
+    tts_engine: str
+    recordings_directory: str
+    planetary_survey_filename: str = "survey_data.json"
+    listen_mode: str = "push_to_talk"
+    stt_engine: str = "openai"
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "OpenJanusSettings":
+        return cls(
+            listen_key=values["listen_key"],
+            tts_engine=values["tts_engine"],
+            recordings_directory=values["recordings_directory"],
+            planetary_survey_filename=values.get("planetary_survey_filename", "survey_data.json"),
+            listen_mode=values.get("listen_mode", "push_to_talk"),
+            stt_engine=values.get("stt_engine", "openai"),
+        )
+
+
+@dataclass(frozen=True)
+class OpenAISettings:
+    """The `[openai]` section of the config"""
+    openai_api_key: str
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "OpenAISettings":
+        return cls(openai_api_key=values["openai_api_key"])
+
+
+@dataclass(frozen=True)
+class OpenAIWhisperSettings:
+    """The `[openai.whisper]` section of the config, with defaults applied"""
+    whisper_voice_id: str = "nova"
+    whisper_voice_model: str = "tts-1"
+    whisper_engine: str = "whisper-1"
+    mpv_path: Optional[str] = None
+    transcription_concurrency: int = 4
+    transcription_retries: int = 3
+    transcription_timeout: float = 120
+    transcription_chunk_minutes: int = 20
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "OpenAIWhisperSettings":
+        if not values.get("whisper_voice_id"):
+            LOGGER.warning("The openai whisper voice id was not set, using the default voice id")
+        if not values.get("whisper_voice_model"):
+            LOGGER.warning("The openai whisper voice model was not set, using the default voice model")
+        if not values.get("whisper_engine"):
+            LOGGER.warning("The openai whisper engine was not set, using the default engine")
+        return cls(
+            whisper_voice_id=values.get("whisper_voice_id") or "nova",
+            whisper_voice_model=values.get("whisper_voice_model") or "tts-1",
+            whisper_engine=values.get("whisper_engine") or "whisper-1",
+            mpv_path=values.get("mpv_path"),
+            transcription_concurrency=values.get("transcription_concurrency", 4),
+            transcription_retries=values.get("transcription_retries", 3),
+            transcription_timeout=values.get("transcription_timeout", 120),
+            transcription_chunk_minutes=values.get("transcription_chunk_minutes", 20),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        values = {
+            "whisper_voice_id": self.whisper_voice_id,
+            "whisper_voice_model": self.whisper_voice_model,
+            "whisper_engine": self.whisper_engine,
+            "transcription_concurrency": self.transcription_concurrency,
+            "transcription_retries": self.transcription_retries,
+            "transcription_timeout": self.transcription_timeout,
+            "transcription_chunk_minutes": self.transcription_chunk_minutes,
+        }
+        if self.mpv_path:
+            values["mpv_path"] = self.mpv_path
+        return values
+
+
+@dataclass(frozen=True)
+class ElevenLabsSettings:
+    """The `[elevenlabs]` section of the config, with defaults applied"""
+    eleven_api_key: str = ""
+    elevenlabs_voice_id: str = ""
+    elevenlabs_stability: float = 0.5
+    elevenlabs_similarity_boost: float = 0.75
+    elevenlabs_style: float = 0
+    elevenlabs_use_speaker_boost: bool = False
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "ElevenLabsSettings":
+        if not values["elevenlabs_voice_id"]:
+            LOGGER.warning("The elevenlabs voice was not set, using the default voice")
+        if not values['elevenlabs_stability']:
+            LOGGER.warning("The elevenlabs stability was not set, using the default stability")
+        if not values['elevenlabs_similarity_boost']:
+            LOGGER.warning("The elevenlabs similarity boost was not set, using the default similarity boost")
+        if not values['elevenlabs_style']:
+            LOGGER.warning("The elevenlabs style was not set, using the default style")
+        # The example config stores this as a string, but a TOML boolean is accepted too
+        use_speaker_boost = values['elevenlabs_use_speaker_boost']
+        if isinstance(use_speaker_boost, str):
+            use_speaker_boost = use_speaker_boost.lower() == "true"
+        return cls(
+            eleven_api_key=values.get("eleven_api_key", ""),
+            elevenlabs_voice_id=values["elevenlabs_voice_id"] or "",
+            elevenlabs_stability=values['elevenlabs_stability'] or 0.5,
+            elevenlabs_similarity_boost=values['elevenlabs_similarity_boost'] or 0.75,
+            elevenlabs_style=values['elevenlabs_style'] or 0,
+            elevenlabs_use_speaker_boost=bool(use_speaker_boost),
+        )
+
+
+@dataclass(frozen=True)
+class AudioSettings:
+    """The optional `[audio]` section of the config"""
+    max_utterance_seconds: float = 120
+    sample_rate: int = 44100
+    in_memory: bool = True
+    upload_sample_rate: int = 16000
+    upload_codec: str = "wav"
+    save_recordings: bool = True
+    input_device_index: Optional[int] = None
+    preroll_ms: int = 300
+    streaming_transcription: bool = False
+    streaming_window_seconds: float = 3.0
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "AudioSettings":
+        return cls(
+            max_utterance_seconds=values.get("max_utterance_seconds", 120),
+            sample_rate=values.get("sample_rate", 44100),
+            in_memory=values.get("in_memory", True),
+            upload_sample_rate=values.get("upload_sample_rate", 16000),
+            upload_codec=values.get("upload_codec", "wav"),
+            save_recordings=values.get("save_recordings", True),
+            input_device_index=values.get("input_device_index"),
+            preroll_ms=values.get("preroll_ms", 300),
+            streaming_transcription=values.get("streaming_transcription", False),
+            streaming_window_seconds=values.get("streaming_window_seconds", 3.0),
+        )
+
+
+@dataclass(frozen=True)
+class VadSettings:
+    """The optional `[audio.vad]` section of the config"""
+    enabled: bool = True
+    frame_ms: int = 30
+    energy_threshold_db: float = -45.0
+    noise_margin_db: float = 10.0
+    zcr_threshold: float = 0.25
+    padding_ms: int = 200
+    min_speech_ms: int = 250
+    hangover_ms: int = 300
+    min_gap_ms: int = 700
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "VadSettings":
+        return cls(
+            enabled=values.get("enabled", True),
+            frame_ms=values.get("frame_ms", 30),
+            energy_threshold_db=values.get("energy_threshold_db", -45.0),
+            noise_margin_db=values.get("noise_margin_db", 10.0),
+            zcr_threshold=values.get("zcr_threshold", 0.25),
+            padding_ms=values.get("padding_ms", 200),
+            min_speech_ms=values.get("min_speech_ms", 250),
+            hangover_ms=values.get("hangover_ms", 300),
+            min_gap_ms=values.get("min_gap_ms", 700),
+        )
+
+
+@dataclass(frozen=True)
+class LocalSttSettings:
+    """The optional `[stt.local]` section of the config, used when `stt_engine` is `local`"""
+    model: str = "base.en"
+    device: str = "cpu"
+    compute_type: str = "int8"
+    cpu_threads: int = 0
+    beam_size: int = 1
+    language: str = "en"
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "LocalSttSettings":
+        return cls(
+            model=values.get("model", "base.en"),
+            device=values.get("device", "cpu"),
+            compute_type=values.get("compute_type", "int8"),
+            cpu_threads=values.get("cpu_threads", 0),
+            beam_size=values.get("beam_size", 1),
+            language=values.get("language", "en"),
+        )
+
+
+@dataclass(frozen=True)
+class OnboardIaSettings:
+    """The optional `[onboard_ia]` section of the config"""
+    fast_path: bool = True
+    fast_path_threshold: float = 0.85
+    keymap_retrieval: bool = True
+    keymap_top_k: int = 12
+    keymap_min_score: float = 0.5
+    single_call: bool = True
+    input_backend: str = "directinput"
+    hold_seconds: float = 3.0
+    plan_cache: bool = True
+    plan_cache_path: str = "plan_cache.sqlite3"
+    plan_cache_max_entries: int = 500
+    plan_cache_ttl_hours: float = 168.0
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "OnboardIaSettings":
+        return cls(
+            fast_path=values.get("fast_path", True),
+            fast_path_threshold=values.get("fast_path_threshold", 0.85),
+            keymap_retrieval=values.get("keymap_retrieval", True),
+            keymap_top_k=values.get("keymap_top_k", 12),
+            keymap_min_score=values.get("keymap_min_score", 0.5),
+            single_call=values.get("single_call", True),
+            input_backend=values.get("input_backend", "directinput"),
+            hold_seconds=values.get("hold_seconds", 3.0),
+            plan_cache=values.get("plan_cache", True),
+            plan_cache_path=values.get("plan_cache_path", "plan_cache.sqlite3"),
+            plan_cache_max_entries=values.get("plan_cache_max_entries", 500),
+            plan_cache_ttl_hours=values.get("plan_cache_ttl_hours", 168.0),
+        )
+
+
+@dataclass(frozen=True)
+class MemorySettings:
+    """The optional `[memory]` section of the config"""
+    background_summary: bool = True
+    atc_token_budget: int = 2000
+    item_finder_token_budget: int = 2000
+    planetary_survey_token_budget: int = 2000
+    onboard_ia_token_budget: int = 1000
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "MemorySettings":
+        return cls(
+            background_summary=values.get("background_summary", True),
+            atc_token_budget=values.get("atc_token_budget", 2000),
+            item_finder_token_budget=values.get("item_finder_token_budget", 2000),
+            planetary_survey_token_budget=values.get("planetary_survey_token_budget", 2000),
+            onboard_ia_token_budget=values.get("onboard_ia_token_budget", 1000),
+        )
+
+
+@dataclass(frozen=True)
+class TtsSettings:
+    """The optional `[tts]` section of the config"""
+    stream_speech: bool = True
+    min_sentence_chars: int = 20
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "TtsSettings":
+        return cls(
+            stream_speech=values.get("stream_speech", True),
+            min_sentence_chars=values.get("min_sentence_chars", 20),
+        )
+
+
+@dataclass(frozen=True)
+class RuntimeSettings:
+    """The optional `[runtime]` section of the config"""
+    concurrency: int = 1
+    max_queued: int = 4
+    executor_threads: int = 8
+    barge_in: bool = True
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "RuntimeSettings":
+        return cls(
+            concurrency=values.get("concurrency", 1),
+            max_queued=values.get("max_queued", 4),
+            executor_threads=values.get("executor_threads", 8),
+            barge_in=values.get("barge_in", True),
+        )
+
+
+@dataclass(frozen=True)
+class RouterSettings:
+    """The optional `[router]` section of the config"""
+    enabled: bool = True
+    threshold: float = 0.6
+    margin: float = 0.2
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "RouterSettings":
+        return cls(
+            enabled=values.get("enabled", True),
+            threshold=values.get("threshold", 0.6),
+            margin=values.get("margin", 0.2),
+        )
+
+
+@dataclass
+class _ConfigSnapshot:
+    """A parsed config file, along with the typed sections built from it so far"""
+    mtime_ns: int
+    data: Dict[str, Any]
+    sections: Dict[str, Any] = field(default_factory=dict)
+
+
+class OpenJanusConfig:
+    """
+    A process-wide, cached view of config.toml
+
+    The file is parsed once, and only parsed again when its modification time changes. Reading any value costs a
+    single `stat` of the config file.
+    """
+    def __init__(self, config_path: str):
+        """
+        Initialises the OpenJanusConfig
+
+        :param config_path: The path to the config file
+        """
+        self.config_path = config_path
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_ConfigSnapshot] = None
+
+    def _current(self) -> _ConfigSnapshot:
+        """Return the parsed config, reloading it first if the file has changed on disk"""
+        try:
+            mtime_ns = stat(self.config_path).st_mtime_ns
+        except FileNotFoundError:
+            LOGGER.error(f"Config file not found at {self.config_path}")
+            raise ConfigFileNotFound(self.config_path)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.mtime_ns == mtime_ns:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.mtime_ns != mtime_ns:
+                if snapshot is not None:
+                    LOGGER.info(f"{self.config_path} changed on disk, reloading config")
+                LOGGER.debug(f"Loading config from {self.config_path}")
+                try:
+                    data = toml.load(self.config_path)
+                except FileNotFoundError:
+                    LOGGER.error(f"Config file not found at {self.config_path}")
+                    raise ConfigFileNotFound(self.config_path)
+                snapshot = _ConfigSnapshot(mtime_ns=mtime_ns, data=data)
+                self._snapshot = snapshot
+            return snapshot
+
+    def _section(self, name: str, builder: Callable[[Dict[str, Any]], SectionT]) -> SectionT:
+        snapshot = self._current()
+        try:
+            return snapshot.sections[name]
+        except KeyError:
+            pass
+        try:
+            section = builder(snapshot.data)
+        except KeyError:
+            LOGGER.error(f"The config section {name} was not found in the config file")
+            raise ConfigKeyNotFound(name)
+        snapshot.sections[name] = section
+        return section
+
+    def resolve(self, name: str, resolver: Callable[[], SectionT]) -> SectionT:
+        """
+        Get a value derived from the config, e.g. a path looked up on the PATH, resolving it once per version of the file
+
+        :param name: The name to keep the value under
+        :param resolver: Resolves the value, it is only called again once the file has changed on disk
+        :return: The value
+        """
+        return self._section(name, lambda data: resolver())
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """The raw parsed config. Treat this as read-only, it is shared across the process"""
+        return self._current().data
+
+    @property
+    def openjanus(self) -> OpenJanusSettings:
+        return self._section("openjanus", lambda data: OpenJanusSettings.from_dict(data["openjanus"]))
+
+    @property
+    def openai(self) -> OpenAISettings:
+        return self._section("openai", lambda data: OpenAISettings.from_dict(data["openai"]))
+
+    @property
+    def openai_whisper(self) -> OpenAIWhisperSettings:
+        return self._section("openai/whisper", lambda data: OpenAIWhisperSettings.from_dict(data["openai"]["whisper"]))
+
+    @property
+    def elevenlabs(self) -> ElevenLabsSettings:
+        return self._section("elevenlabs", lambda data: ElevenLabsSettings.from_dict(data["elevenlabs"]))
+
+    @property
+    def audio(self) -> AudioSettings:
+        return self._section("audio", lambda data: AudioSettings.from_dict(data.get("audio", {})))
+
+    @property
+    def vad(self) -> VadSettings:
+        return self._section("audio/vad", lambda data: VadSettings.from_dict(data.get("audio", {}).get("vad", {})))
+
+    @property
+    def local_stt(self) -> LocalSttSettings:
+        return self._section("stt/local", lambda data: LocalSttSettings.from_dict(data.get("stt", {}).get("local", {})))
+
+    @property
+    def onboard_ia(self) -> OnboardIaSettings:
+        return self._section("onboard_ia", lambda data: OnboardIaSettings.from_dict(data.get("onboard_ia", {})))
+
+    @property
+    def router(self) -> RouterSettings:
+        return self._section("router", lambda data: RouterSettings.from_dict(data.get("router", {})))
+
+    @property
+    def memory(self) -> MemorySettings:
+        return self._section("memory", lambda data: MemorySettings.from_dict(data.get("memory", {})))
+
+    @property
+    def tts(self) -> TtsSettings:
+        return self._section("tts", lambda data: TtsSettings.from_dict(data.get("tts", {})))
+
+    @property
+    def runtime(self) -> RuntimeSettings:
+        return self._section("runtime", lambda data: RuntimeSettings.from_dict(data.get("runtime", {})))
+
+
+_CONFIG: Optional[OpenJanusConfig] = None
+_CONFIG_LOCK = threading.Lock()
+
+
+def get_config() -> OpenJanusConfig:
+    """
+    Get the process-wide config object
+
+    :return: The config, loaded from `OPENJANUS_CONFIG_PATH` if set, otherwise `config.toml`
+    """
+    global _CONFIG
+    if _CONFIG is None:
+        with _CONFIG_LOCK:
+            if _CONFIG is None:
+                _CONFIG = OpenJanusConfig(getenv("OPENJANUS_CONFIG_PATH") or "config.toml")
+    return _CONFIG
 
-# TODO: While all of these helper functions are slick and whatnot, the config probably needs to be it's own class that importing modules can easily add their own config grabbing functions to. Only base helper functions, like those related to engines can use.
 
 def load_config() -> Dict[str, Any]:
-    """Load the config file"""
-    try:
-        if getenv("OPENJANUS_CONFIG_PATH"):
-            LOGGER.debug(f"Loading config from {getenv('OPENJANUS_CONFIG_PATH')}")
-            config = toml.load(getenv("OPENJANUS_CONFIG_PATH"))  # type: ignore
-        LOGGER.debug("Loading config from config.toml")
-        config = toml.load("config.toml")
-        return config
-    except FileNotFoundError:
-        if getenv("OPENJANUS_CONFIG_PATH"):
-            LOGGER.error(f"Config file not found at {getenv('OPENJANUS_CONFIG_PATH')}")
-            raise ConfigFileNotFound(getenv("OPENJANUS_CONFIG_PATH")) # type: ignore
-        else:
-            LOGGER.error("Config file not found at config.toml")
-            raise ConfigFileNotFound("config.toml")
-        
+    """Load the config file. The returned dict is cached and shared, do not modify it"""
+    return get_config().data
+
 
 def set_openai_api_key() -> str:
     """Set the openai API Key, first by checking the environment variable, then by checking the config file"""
@@ -44,85 +475,107 @@ def set_openai_api_key() -> str:
             return getenv("OPENAI_API_KEY")  # type: ignore
         else:
             LOGGER.debug("Setting openai API key from config file")
-            config = load_config()
-            environ["OPENAI_API_KEY"] = config["openai"]["openai_api_key"]
-            return config["openai"]["openai_api_key"]
-    except KeyError:
+            openai_api_key = get_config().openai.openai_api_key
+            environ["OPENAI_API_KEY"] = openai_api_key
+            return openai_api_key
+    except ConfigKeyNotFound:
         LOGGER.error("The openai API key was not found in the environment variable or the config file")
         raise ApiKeyNotSetException("OpenAI")
-    
+
 
 def set_eleven_api_key() -> str:
     """Set the eleven API Key, first by checking the environment variable, then by checking the config file"""
-    try:
-        if getenv("ELEVEN_API_KEY"):
-            LOGGER.debug("Setting elevenlabs API key from environment variable")
-            return getenv("ELEVEN_API_KEY")  # type: ignore
-        else:
-            LOGGER.debug("Setting elevenlabs API key from config file")
-            config = load_config()
-            environ["ELEVEN_API_KEY"] = config["elevenlabs"]["eleven_api_key"]
-            return config["elevenlabs"]["eleven_api_key"]
-    except KeyError:
-        LOGGER.error("The elevenlabs API key was not found in the environment variable or the config file")
-        raise ApiKeyNotSetException("Elevenlabs")
-    
+    if getenv("ELEVEN_API_KEY"):
+        LOGGER.debug("Setting elevenlabs API key from environment variable")
+        return getenv("ELEVEN_API_KEY")  # type: ignore
+    else:
+        LOGGER.debug("Setting elevenlabs API key from config file")
+        try:
+            eleven_api_key = get_config().data["elevenlabs"]["eleven_api_key"]
+        except KeyError:
+            LOGGER.error("The elevenlabs API key was not found in the environment variable or the config file")
+            raise ApiKeyNotSetException("Elevenlabs")
+        environ["ELEVEN_API_KEY"] = eleven_api_key
+        return eleven_api_key
+
 
 def check_mpv_path() -> str:
     """Check the mpv path, first by checking the environment variable, then by checking the config file"""
+    # Looking mpv up scans the PATH, so it is only done again once the config file has changed
+    return get_config().resolve("mpv_path", _find_mpv_path)
+
+
+def _find_mpv_path() -> str:
     import shutil
     lib = shutil.which("mpv")
     if lib is None:
+        LOGGER.debug("Setting mpv path from config file")
         try:
-            LOGGER.debug("Setting mpv path from config file")
-            config = load_config()
-            if not path.isfile(config["openai"]["whisper"]["mpv_path"]):
-                LOGGER.error("mpv.exe was not found")
-                raise TtsMpvNotFoundException()
-            else:
-                return config["openai"]["whisper"]["mpv_path"]
-        except KeyError:
+            mpv_path = get_config().openai_whisper.mpv_path
+        except ConfigKeyNotFound:
+            mpv_path = None
+        if not mpv_path:
             LOGGER.error("The mpv path was not found in the environment variable or the config file")
             raise ConfigKeyNotFound("openai/whisper/mpv_path")
-        except FileNotFoundError:
+        if not path.isfile(mpv_path):
             LOGGER.error("mpv.exe was not found")
             raise TtsMpvNotFoundException()
+        return mpv_path
     else:
         return lib
-    
+
 
 def get_tts_engine() -> str:
     """Get the TTS engine, first by checking the environment variable, then by checking the config file"""
-    try:
-        if getenv("TTS_ENGINE"):
-            LOGGER.debug("Setting TTS engine from environment variable")
-            if getenv("TTS_ENGINE") not in ["elevenlabs", "whisper"]:
-                LOGGER.error("The TTS engine is not valid")
-                raise TtsNotImplementedException(getenv("TTS_ENGINE", "NOT_SET"))
-            return getenv("TTS_ENGINE")  # type: ignore
-        else:
-            LOGGER.debug("Setting TTS engine from config file")
-            config = load_config()
-            if config["openjanus"]["tts_engine"] not in ["elevenlabs", "whisper"]:
-                LOGGER.error("The TTS engine is not valid")
-                raise TtsNotImplementedException(config["openjanus"]["tts_engine"])
-            if config["openjanus"]["tts_engine"] == "whisper":
-                _ = set_openai_api_key()  # This is actually a safe way to check if the API key is set for us to use
-                check_mpv_path()
-            return config["openjanus"]["tts_engine"]
-    except KeyError:
-        LOGGER.error("The TTS engine was not found in the environment variable or the config file")
-        raise ConfigKeyNotFound("openjanus/tts_engine")
-    
+    # Resolved, and checked, once per version of the config file rather than on every call
+    return get_config().resolve(f"tts_engine/{getenv('TTS_ENGINE', '')}", _resolve_tts_engine)
+
+
+def _resolve_tts_engine() -> str:
+    if getenv("TTS_ENGINE"):
+        LOGGER.debug("Setting TTS engine from environment variable")
+        if getenv("TTS_ENGINE") not in ["elevenlabs", "whisper"]:
+            LOGGER.error("The TTS engine is not valid")
+            raise TtsNotImplementedException(getenv("TTS_ENGINE", "NOT_SET"))
+        return getenv("TTS_ENGINE")  # type: ignore
+    else:
+        LOGGER.debug("Setting TTS engine from config file")
+        try:
+            tts_engine = get_config().openjanus.tts_engine
+        except ConfigKeyNotFound:
+            LOGGER.error("The TTS engine was not found in the environment variable or the config file")
+            raise ConfigKeyNotFound("openjanus/tts_engine")
+        if tts_engine not in ["elevenlabs", "whisper"]:
+            LOGGER.error("The TTS engine is not valid")
+            raise TtsNotImplementedException(tts_engine)
+        if tts_engine == "whisper":
+            _ = set_openai_api_key()  # This is actually a safe way to check if the API key is set for us to use
+            check_mpv_path()
+        return tts_engine
+
+
+def get_stt_engine() -> str:
+    """Get the STT engine, first by checking the environment variable, then by checking the config file"""
+    if getenv("STT_ENGINE"):
+        LOGGER.debug("Setting STT engine from environment variable")
+        stt_engine = getenv("STT_ENGINE", "NOT_SET")
+    else:
+        LOGGER.debug("Setting STT engine from config file")
+        stt_engine = get_config().openjanus.stt_engine
+    if stt_engine not in ["openai", "local"]:
+        LOGGER.error("The STT engine is not valid")
+        raise SttNotImplementedException(stt_engine)
+    if stt_engine == "openai":
+        _ = set_openai_api_key()
+    return stt_engine
+
 
 def get_recordings_dir() -> str:
     """Get the recordings directory by checking the config file"""
     try:
-        LOGGER.debug("Getting recordings directory from config file")
-        config = load_config()
-        recordings_dir = config["openjanus"]["recordings_directory"]
+        recordings_dir = get_config().openjanus.recordings_directory
         return path.relpath(recordings_dir) + "/"
-    except KeyError:
+    except ConfigKeyNotFound:
         LOGGER.error("The recordings directory was not found in the environment variable or the config file")
         raise ConfigKeyNotFound("openjanus/recordings_directory")
 
@@ -136,63 +589,52 @@ def ensure_recordings_dir_exists():
         except Exception as e:
             LOGGER.error(f"Failed to create the {recordings_dir} directory", exc_info=e)
             raise DirectoryCreationException(f"Failed to create the {recordings_dir} directory") from e
-        
+
 def get_elevenlabs_config() -> Dict[str, Any]:
     """Get the elevenlabs config"""
     try:
-        LOGGER.debug("Getting elevenlabs config from config file")
-        config = load_config()
-        set_eleven_api_key()
-        if not config["elevenlabs"]["elevenlabs_voice_id"]:
-            LOGGER.warning("The elevenlabs voice was not set, using the default voice")
-            from openjanus.tts.elevenlabs.async_patch import DEFAULT_VOICE
-            config["elevenlabs"]["elevenlabs_voice_id"] = DEFAULT_VOICE
-        if not config["elevenlabs"]['elevenlabs_stability']:
-            LOGGER.warning("The elevenlabs stability was not set, using the default stability")
-            config["elevenlabs"]["elevenlabs_stability"] = 0.5
-        if not config["elevenlabs"]['elevenlabs_similarity_boost']:
-            LOGGER.warning("The elevenlabs similarity boost was not set, using the default similarity boost")
-            config["elevenlabs"]["elevenlabs_similarity_boost"] = 0.75
-        if not config["elevenlabs"]['elevenlabs_style']:
-            LOGGER.warning("The elevenlabs style was not set, using the default style")
-            config["elevenlabs"]["elevenlabs_style"] = 0
-        if not config["elevenlabs"]['elevenlabs_use_speaker_boost'] or config["elevenlabs"]['elevenlabs_use_speaker_boost'].lower() != "true":
-            config["elevenlabs"]["elevenlabs_use_speaker_boost"] = False
-        elif config["elevenlabs"]['elevenlabs_use_speaker_boost'].lower() == "true":
-            config["elevenlabs"]["elevenlabs_use_speaker_boost"] = True
-        else:
-            LOGGER.warning("The elevenlabs use speaker boost was misconfigured, using the default use speaker boost")
-            config["elevenlabs"]["elevenlabs_use_speaker_boost"] = False
-        return config["elevenlabs"]
-            
-    except KeyError:
+        elevenlabs_config = get_config().elevenlabs
+    except ConfigKeyNotFound:
         LOGGER.error("The elevenlabs config was not found in the environment variable or the config file")
         raise ConfigKeyNotFound("elevenlabs")
-    
+    set_eleven_api_key()
+    voice_id = elevenlabs_config.elevenlabs_voice_id
+    if not voice_id:
+        from openjanus.tts.elevenlabs.async_patch import DEFAULT_VOICE
+        voice_id = DEFAULT_VOICE.voice_id
+    return {
+        "eleven_api_key": elevenlabs_config.eleven_api_key,
+        "elevenlabs_voice_id": voice_id,
+        "elevenlabs_stability": elevenlabs_config.elevenlabs_stability,
+        "elevenlabs_similarity_boost": elevenlabs_config.elevenlabs_similarity_boost,
+        "elevenlabs_style": elevenlabs_config.elevenlabs_style,
+        "elevenlabs_use_speaker_boost": elevenlabs_config.elevenlabs_use_speaker_boost,
+    }
+
 def get_openai_whisper_config() -> Dict[str, Any]:
     """Get the openai whisper config"""
     try:
-        LOGGER.debug("Getting openai whisper config from config file")
-        config = load_config()
-        if not config["openai"]["whisper"]["whisper_voice_id"]:
-            LOGGER.warning("The openai whisper voice id was not set, using the default voice id")
-            config["openai"]["whisper"]["whisper_voice_id"] = "nova"
-        if not config["openai"]["whisper"]["whisper_voice_model"]:
-            LOGGER.warning("The openai whisper voice model was not set, using the default voice model")
-            config["openai"]["whisper"]["whisper_voice_model"] = "tts-1"
-        if not config["openai"]["whisper"]["whisper_engine"]:
-            LOGGER.warning("The openai whisper engine was not set, using the default engine")
-            config["openai"]["whisper"]["whisper_engine"] = "whisper-1"
-        return config["openai"]["whisper"]
-    except KeyError:
+        return get_config().openai_whisper.as_dict()
+    except ConfigKeyNotFound:
         LOGGER.error("The openai whisper config was not found in the environment variable or the config file")
         raise ConfigKeyNotFound("openai/whisper")
 
 
+def get_listen_mode() -> str:
+    """Get the listen mode, either `push_to_talk` or `continuous`"""
+    listen_mode = get_config().openjanus.listen_mode
+    if listen_mode not in ["push_to_talk", "continuous"]:
+        LOGGER.error("The listen mode is not valid")
+        raise ListenModeNotSupportedException(listen_mode)
+    return listen_mode
+
+
 def startup_checks() -> bool:
     """Perform startup checks
-    
+
     :returns: True if all checks pass"""
     _ = get_tts_engine()
+    _ = get_stt_engine()
+    _ = get_listen_mode()
     _ = ensure_recordings_dir_exists()
-    return True  # Otherwise it'll error anyways
\ No newline at end of file
+    return True  # Otherwise it'll error anyways
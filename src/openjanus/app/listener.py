@@ -0,0 +1,134 @@
+import logging
+from pynput import keyboard
+import queue
+import threading
+from typing import Optional, Union
+
+from langchain.agents import AgentExecutor
+
+from openjanus.app.config import get_config
+from openjanus.app.runtime import barge_in, get_runtime
+from openjanus.stt.audio import AudioClip
+from openjanus.stt.streaming import StreamingTranscription
+from openjanus.stt.vad import VadSegmenter
+from openjanus.stt.whisper.recorder import Recorder
+from openjanus.utils.exceptions import ListenKeyNotSupportedException
+from openjanus.utils.text_coloring import YELLOW_TEXT, RESET_TEXT
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def dispatch_recording(recorder: Recorder, agent_chain: AgentExecutor, recording: Union[str, AudioClip, StreamingTranscription]):
+    """
+    Queue a recording to be transcribed and handed to the agent, on the runtime's event loop
+
+    :param recorder: The recorder that made the recording
+    :param agent_chain: The agent to hand the transcription to
+    :param recording: The recording, see `Recorder.stop_recording`
+    """
+    async def interact():
+        output = await recorder.transcribe_and_invoke(agent_chain, recording)
+        print(YELLOW_TEXT + "Ready to record next interaction" + RESET_TEXT)
+        return output
+
+    if isinstance(recording, (AudioClip, StreamingTranscription)) or recording:
+        get_runtime().submit(interact)
+
+
+class KeyListener:
+        def __init__(self, recorder: Recorder, agent_chain: AgentExecutor, listen_key: str):
+            self.recorder = recorder
+            self.agent_chain = agent_chain
+            self.record_key_pressed = False
+            self.listen_key = self.get_key(listen_key)
+            self.barge_in = get_config().runtime.barge_in
+
+        def get_key(self, key: str):
+            try:
+                # Try to get a key for special keys
+                return keyboard.Key[key]
+            except KeyError:
+                try:
+                    # If that fails, the key is not a special key, then it must be a character
+                    return keyboard.KeyCode.from_char(key)
+                except KeyError:
+                    LOGGER.error(f"The key {key} is not a valid key that can be used")
+                    raise ListenKeyNotSupportedException(key)
+
+        def on_press(self, key):
+            try:
+                if key == self.listen_key and not self.recorder.is_recording:
+                    self.record_key_pressed = True
+                    LOGGER.info("Record button pressed")
+                    if self.barge_in:
+                        # Whatever is still being answered is stopped, the new command replaces it
+                        barge_in()
+                    self.recorder.start_recording()
+            except AttributeError:
+                pass
+
+        def on_release(self, key):
+            if key == self.listen_key and self.recorder.is_recording:
+                LOGGER.info("Recording button released")
+                self.record_key_pressed = False
+                recording = self.recorder.stop_recording()
+                dispatch_recording(self.recorder, self.agent_chain, recording)
+
+
+class ContinuousListener:
+        """
+        Listens hands-free. Captured audio is segmented into utterances as it arrives, and each utterance is
+        transcribed and handed to the agent
+        """
+        def __init__(self, recorder: Recorder, agent_chain: AgentExecutor, max_queued_chunks: int = 64):
+            """
+            Initialises the ContinuousListener
+
+            :param recorder: The recorder whose input stream to listen to
+            :param agent_chain: The agent to hand utterances to
+            :param max_queued_chunks: How many chunks of audio may wait to be segmented before new ones are dropped,
+                defaults to 64
+            """
+            self.recorder = recorder
+            self.agent_chain = agent_chain
+            self.segmenter = VadSegmenter(rate=recorder.rate)
+            self._chunks: queue.Queue = queue.Queue(maxsize=max_queued_chunks)
+            self._stopping = threading.Event()
+            self._thread: Optional[threading.Thread] = None
+
+        def _on_audio(self, in_data: bytes):
+            # Called from the audio thread, segmenting happens on our own thread
+            try:
+                self._chunks.put_nowait(in_data)
+            except queue.Full:
+                LOGGER.warning("Segmenting is falling behind, dropping captured audio")
+
+        def _run(self):
+            while not self._stopping.is_set():
+                try:
+                    in_data = self._chunks.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                for clip in self.segmenter.feed(AudioClip.from_pcm16(in_data, self.recorder.rate, self.recorder.channels).samples):
+                    LOGGER.info(f"Heard a {clip.duration:.1f}s utterance")
+                    dispatch_recording(self.recorder, self.agent_chain, clip)
+            clip = self.segmenter.flush()
+            if clip is not None:
+                dispatch_recording(self.recorder, self.agent_chain, clip)
+
+        def start(self):
+            self.recorder.open()
+            self._thread = threading.Thread(target=self._run, name="openjanus-vad-segmenter", daemon=True)
+            self._thread.start()
+            self.recorder.capture.add_consumer(self._on_audio)
+
+        def stop(self):
+            self.recorder.capture.remove_consumer(self._on_audio)
+            self._stopping.set()
+            if self._thread is not None and self._thread is not threading.current_thread():
+                self._thread.join()
+
+        def join(self):
+            if self._thread is not None:
+                self._thread.join()
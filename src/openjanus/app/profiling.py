@@ -0,0 +1,200 @@
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+import importlib.abc
+import json
+import logging
+import sys
+import threading
+from time import perf_counter
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Wraps a module loader to time how long executing the module takes"""
+    def __init__(self, loader: Any, timer: "ImportTimer", module_name: str):
+        self._loader = loader
+        self._timer = timer
+        self._module_name = module_name
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._timer._enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer._exit(self._module_name)
+
+    def __getattr__(self, name: str) -> Any:
+        # Anything else (get_data, get_resource_reader, is_package...) goes to the real loader
+        return getattr(self._loader, name)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    Records how long each module takes to import, like `python -X importtime`, but in-process so it also works for
+    frozen builds
+    """
+    def __init__(self):
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self._local = threading.local()
+
+    def _stack(self) -> List[List[float]]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _enter(self):
+        # [start time, time spent importing children]
+        self._stack().append([perf_counter(), 0.0])
+
+    def _exit(self, module_name: str):
+        stack = self._stack()
+        started, children = stack.pop()
+        cumulative = perf_counter() - started
+        if stack:
+            stack[-1][1] += cumulative
+        self.timings[module_name] = {
+            "self_ms": round((cumulative - children) * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        }
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, self, fullname)
+                    return spec
+            return None
+        finally:
+            self._local.finding = False
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+
+class StartupProfiler:
+    """Records the wall time of each startup phase, and optionally the import time of every module"""
+    def __init__(self, record_imports: bool = True):
+        """
+        Initialises the StartupProfiler, and starts the clock
+
+        :param record_imports: Whether to record the import time of each module, defaults to True
+        """
+        self.started_at = datetime.now()
+        self._origin = perf_counter()
+        self._depth = 0
+        self._lock = threading.Lock()
+        self.phases: List[Dict[str, Any]] = []
+        self.import_timer: Optional[ImportTimer] = None
+        if record_imports:
+            self.import_timer = ImportTimer()
+            self.import_timer.install()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time a phase of startup. Phases may be nested
+
+        :param name: The name of the phase
+        """
+        started = perf_counter()
+        with self._lock:
+            depth = self._depth
+            self._depth += 1
+        try:
+            yield
+        finally:
+            finished = perf_counter()
+            with self._lock:
+                self._depth -= 1
+                self.phases.append({
+                    "name": name,
+                    "depth": depth,
+                    "start_ms": round((started - self._origin) * 1000, 3),
+                    "duration_ms": round((finished - started) * 1000, 3),
+                })
+            LOGGER.debug(f"Startup phase {name} took {(finished - started) * 1000:.1f}ms")
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Build the startup report
+
+        :return: The report, with phases in the order they started and imports sorted by cumulative time
+        """
+        imports = []
+        if self.import_timer is not None:
+            imports = sorted(
+                ({"module": module_name, **timing} for module_name, timing in self.import_timer.timings.items()),
+                key=lambda timing: timing["cumulative_ms"],
+                reverse=True,
+            )
+        return {
+            "started_at": self.started_at.isoformat(),
+            "time_to_ready_ms": round((perf_counter() - self._origin) * 1000, 3),
+            "python": sys.version,
+            "phases": sorted(self.phases, key=lambda phase: phase["start_ms"]),
+            "imports": imports,
+        }
+
+    def write_report(self, report_path: str) -> Dict[str, Any]:
+        """
+        Write the startup report as JSON, and stop recording imports
+
+        :param report_path: The path to write the report to
+        :return: The report that was written
+        """
+        if self.import_timer is not None:
+            self.import_timer.uninstall()
+        report = self.report()
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        LOGGER.info(f"Wrote startup profile to {report_path}")
+        return report
+
+
+_PROFILER: Optional[StartupProfiler] = None
+
+
+def start_profiler(record_imports: bool = True) -> StartupProfiler:
+    """
+    Start profiling startup. Phases recorded anywhere through `profile_phase` are added to this profiler
+
+    :param record_imports: Whether to record the import time of each module, defaults to True
+    :return: The active profiler
+    """
+    global _PROFILER
+    _PROFILER = StartupProfiler(record_imports=record_imports)
+    return _PROFILER
+
+
+def get_profiler() -> Optional[StartupProfiler]:
+    """Get the active profiler, if startup is being profiled"""
+    return _PROFILER
+
+
+def profile_phase(name: str) -> ContextManager[None]:
+    """
+    Time a phase of startup if startup is being profiled, otherwise do nothing
+
+    :param name: The name of the phase
+    """
+    if _PROFILER is None:
+        return nullcontext()
+    return _PROFILER.phase(name)
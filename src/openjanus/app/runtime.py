@@ -0,0 +1,208 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Set
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class InteractionInterrupted(Exception):
+    """Raised by the future of an interaction that was interrupted, e.g. by pressing the listen key again"""
+    def __init__(self, name: str):
+        self.name = name
+        super().__init__(f"{name} was interrupted")
+
+
+@dataclass
+class InteractionJob:
+    """One interaction to run, e.g. transcribing an utterance and answering it"""
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    future: Future = field(default_factory=Future)
+    queued: float = field(default_factory=time.perf_counter)
+
+
+class InteractionRuntime:
+    """
+    The one event loop that every interaction runs on, on its own thread
+
+    Listeners only `submit` jobs. Up to `concurrency` jobs run at once, in the order they were submitted, and at most
+    `max_queued` wait for their turn, any more are dropped. Blocking work that the jobs hand off with
+    `run_in_executor` shares one bounded thread pool.
+    """
+    def __init__(self, concurrency: int = 1, max_queued: int = 4, executor_threads: int = 8):
+        """
+        Initialises the InteractionRuntime
+
+        :param concurrency: How many interactions can run at once, defaults to 1
+        :param max_queued: How many interactions can wait for their turn, defaults to 4
+        :param executor_threads: How many threads blocking work is run on, defaults to 8
+        """
+        self.concurrency = max(1, concurrency)
+        self.max_queued = max_queued
+        self.executor_threads = executor_threads
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Set[asyncio.Task] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._sequence = itertools.count(1)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stopping
+
+    def start(self):
+        """Start the event loop thread, and wait until it is ready to take jobs"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="openjanus-runtime", daemon=True)
+            self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.executor_threads, thread_name_prefix="openjanus-io"))
+        self.loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._workers = [loop.create_task(self._work(index)) for index in range(self.concurrency)]
+        self._started.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+            LOGGER.debug("Runtime stopped")
+
+    async def _work(self, index: int):
+        while True:
+            job: InteractionJob = await self._queue.get()
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    LOGGER.debug(f"Running {job.name} on worker {index}, after {(time.perf_counter() - job.queued) * 1000:.0f}ms in the queue")
+                    await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: InteractionJob):
+        # The job runs in its own task, so `interrupt` can cancel it without cancelling the worker
+        task = asyncio.ensure_future(job.run())
+        self._running.add(task)
+        try:
+            await asyncio.wait([task])
+        except asyncio.CancelledError:
+            task.cancel()
+            await asyncio.wait([task])
+            raise
+        finally:
+            self._running.discard(task)
+            if task.cancelled():
+                LOGGER.info(f"{job.name} was interrupted")
+                job.future.set_exception(InteractionInterrupted(job.name))
+            elif task.exception() is not None:
+                LOGGER.error(f"{job.name} failed", exc_info=task.exception())
+                job.future.set_exception(task.exception())
+            else:
+                job.future.set_result(task.result())
+
+    def _cancel_all(self):
+        while not self._queue.empty():
+            job: InteractionJob = self._queue.get_nowait()
+            job.future.cancel()
+            self._queue.task_done()
+        for task in list(self._running):
+            task.cancel()
+
+    def interrupt(self):
+        """Cancel the running interactions, and drop the queued ones, from any thread"""
+        if self.running:
+            self.loop.call_soon_threadsafe(self._cancel_all)
+
+    def _enqueue(self, job: InteractionJob):
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            LOGGER.warning(f"Too many interactions are waiting, dropping {job.name}")
+            job.future.cancel()
+
+    def submit(self, run: Callable[[], Awaitable[Any]], name: Optional[str] = None) -> Future:
+        """
+        Queue an interaction, from any thread
+
+        :param run: A function returning the coroutine to run, it is called on the event loop
+        :param name: What to call the interaction in the logs, defaults to a sequence number
+        :return: A future that resolves to the result of the coroutine, or is cancelled if it was dropped
+        """
+        job = InteractionJob(name=name or f"interaction {next(self._sequence)}", run=run)
+        if not self.running:
+            LOGGER.warning(f"The runtime is not running, dropping {job.name}")
+            job.future.cancel()
+            return job.future
+        self.loop.call_soon_threadsafe(self._enqueue, job)
+        return job.future
+
+    async def _drain(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            LOGGER.warning("Interactions were still running on shutdown, cancelling them")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        # Nothing takes jobs any more, so the futures of those still queued are cancelled rather than left pending
+        self._cancel_all()
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """
+        Stop taking jobs, let the queued ones finish, then stop the event loop and its threads
+
+        :param timeout: How long to wait for queued interactions, in seconds, before cancelling them, defaults to 10
+        """
+        with self._lock:
+            if self._thread is None or self._stopping:
+                return
+            self._stopping = True
+        asyncio.run_coroutine_threadsafe(self._drain(timeout), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+def barge_in():
+    """
+    Stop everything OpenJanus is doing for the user, because they started talking again
+
+    Speech stops first, by killing the audio players, then the running interactions are cancelled along with any
+    generation and synthesis they are waiting on.
+    """
+    from openjanus.tts.playback import get_speech_interrupter
+
+    started = time.perf_counter()
+    players = get_speech_interrupter().interrupt()
+    get_runtime().interrupt()
+    LOGGER.info(f"Barged in, stopped {players} audio players in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+
+@lru_cache(maxsize=None)
+def get_runtime() -> InteractionRuntime:
+    """Get the process-wide runtime, configured from `[runtime]`. It still needs to be started"""
+    from openjanus.app.config import get_config
+
+    settings = get_config().runtime
+    return InteractionRuntime(
+        concurrency=settings.concurrency,
+        max_queued=settings.max_queued,
+        executor_threads=settings.executor_threads,
+    )
@@ -15,21 +15,20 @@ from langchain.schema.runnable.utils import (
 )
 from langchain.schema.runnable.config import RunnableConfig
 from langchain.tools import Tool
-
-import openjanus.app.config as openjanus_config
-from openjanus.utils.exceptions import TtsNotImplementedException
+from langchain.tools.base import BaseTool
 
 
 LOGGER = logging.getLogger(__name__)
 
-config = openjanus_config.load_config()
-tts_engine = openjanus_config.get_tts_engine()
-if tts_engine.lower() == "elevenlabs":
-    from openjanus.tts.elevenlabs.chat import get_tool
-elif tts_engine.lower() == "whisper":
-    from openjanus.tts.whisper.chat import get_tool
-else:
-    raise openjanus_config.TtsNotImplementedException(tts_engine)
+
+def get_tool() -> BaseTool:
+    """
+    Get the text to speech tool for the configured TTS engine, shared by every chain and callback
+
+    :return: A text to speech tool
+    """
+    from openjanus.tts.service import get_tts_service
+    return get_tts_service().tool
 
 
 class AsyncOpenJanusOpenAIFunctionsAgentCallbackHandler(AsyncCallbackHandler):
@@ -132,6 +131,9 @@ class BaseOpenJanusOpenAIFunctionsAgent(OpenAIMultiFunctionsAgent, ABC):
 
 
 class BaseOpenJanusConversationChain(ConversationChain):
+    speak_output: bool = True
+    """Speak the whole output once it is complete. Turned off when the LLM speaks it as it is generated"""
+
     def process(
         self,
         input: Dict,
@@ -143,6 +145,8 @@ class BaseOpenJanusConversationChain(ConversationChain):
         Subclasses should override this method if they support streaming output.
         """ 
         stream = self.invoke(input, config, **kwargs)
+        if not self.speak_output:
+            return [{self.output_key: stream['response']}]
         tts = get_tool()
         response = tts.run({"query": stream['response']})
         return [{self.output_key: response}]
@@ -157,6 +161,9 @@ class BaseOpenJanusConversationChain(ConversationChain):
         Default implementation of astream, which calls ainvoke.
         Subclasses should override this method if they support streaming output.
         """
+        if not self.speak_output:
+            output = await self.ainvoke(input, config, **kwargs)
+            return [{self.output_key: output['response']}]
         stream = self.stream(input, config, **kwargs)
         tts = get_tool()
         response = await tts.arun({"stream": stream})
@@ -0,0 +1,214 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import threading
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.pydantic_v1 import PrivateAttr
+from langchain.schema.messages import BaseMessage, get_buffer_string
+
+from openjanus.utils.tokens import count_message_tokens
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Every memory summarizes on this one thread, so summaries never compete with each other for the LLM
+_SUMMARIZER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="openjanus-summarizer")
+
+
+class MessageTokenCounts:
+    """
+    The token count of each message of a buffer, counted once when the message is added, and their running total
+
+    Messages are only ever added at the end of a buffer and removed from its front, so the counts are kept in the
+    same order, and the total is updated in constant time.
+    """
+    def __init__(self):
+        self._counts: Deque[int] = deque()
+        self.total = 0
+
+    def append(self, message: BaseMessage):
+        count = count_message_tokens(message)
+        self._counts.append(count)
+        self.total += count
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._counts)
+
+    def popleft(self) -> int:
+        """Forget the count of the first message, returning it"""
+        count = self._counts.popleft()
+        self.total -= count
+        return count
+
+    def sync(self, messages: List[BaseMessage]):
+        """Count the buffer again if it was changed by something else, e.g. messages added to the chat history directly"""
+        if len(self._counts) != len(messages):
+            self.clear()
+            for message in messages:
+                self.append(message)
+
+    def clear(self):
+        self._counts.clear()
+        self.total = 0
+
+
+def _render(memory: BaseChatMemory, buffer: List[BaseMessage], memory_key: str) -> Dict[str, Any]:
+    if memory.return_messages:
+        return {memory_key: buffer}
+    return {memory_key: get_buffer_string(buffer, human_prefix=memory.human_prefix, ai_prefix=memory.ai_prefix)}
+
+
+class TokenBufferMemory(BaseChatMemory):
+    """
+    A buffer memory bounded by its size in tokens, rather than by a number of messages
+
+    Once the buffer is over `max_token_limit`, its oldest messages are dropped. Each message is counted once, when it
+    is saved, so keeping to the budget costs the same however long the conversation gets.
+    """
+    max_token_limit: int = 1000
+    memory_key: str = "history"
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _counts: MessageTokenCounts = PrivateAttr(default_factory=MessageTokenCounts)
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    @property
+    def token_count(self) -> int:
+        """The size of the buffer, in tokens"""
+        return self._counts.total
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            buffer = list(self.chat_memory.messages)
+        return _render(self, buffer, self.memory_key)
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        """Save a turn to the buffer, and drop the oldest messages if it has grown over the budget"""
+        input_str, output_str = self._get_input_output(inputs, outputs)
+        with self._lock:
+            messages = self.chat_memory.messages
+            self._counts.sync(messages)
+            self.chat_memory.add_user_message(input_str)
+            self._counts.append(messages[-1])
+            self.chat_memory.add_ai_message(output_str)
+            self._counts.append(messages[-1])
+            # The latest turn is always kept, even if it is over the budget on its own
+            while len(messages) > 2 and self._counts.total > self.max_token_limit:
+                del messages[0]
+                self._counts.popleft()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.chat_memory.clear()
+            self._counts.clear()
+
+
+class BackgroundSummaryBufferMemory(ConversationSummaryBufferMemory):
+    """
+    A summary buffer memory that summarizes in the background
+
+    Saving a turn only appends it to the buffer. Each message is counted once, when it is saved, and only once the
+    buffer is over `max_token_limit` are the messages that overflow it summarized, on a background thread so they
+    never delay a response. Until the new summary is ready, the buffer is returned as it is, including the messages
+    being summarized. The new summary then replaces the old one and those messages in one step.
+    """
+    background: bool = True
+    """Summarize on a background thread, rather than while the turn is saved"""
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _counts: MessageTokenCounts = PrivateAttr(default_factory=MessageTokenCounts)
+    _pending: Optional[Future] = PrivateAttr(default=None)
+    # Bumped by `clear`, so a summary of a conversation that has since been cleared is thrown away
+    _generation: int = PrivateAttr(default=0)
+
+    @property
+    def token_count(self) -> int:
+        """The size of the buffer, in tokens, not counting the summary"""
+        return self._counts.total
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the summary and the buffer as they are now, without waiting for a summary in progress"""
+        with self._lock:
+            summary = self.moving_summary_buffer
+            buffer: List[BaseMessage] = list(self.chat_memory.messages)
+        if summary:
+            buffer = [self.summary_message_cls(content=summary)] + buffer
+        return _render(self, buffer, self.memory_key)
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        """Save a turn to the buffer, and summarize the buffer if it has grown over the budget"""
+        input_str, output_str = self._get_input_output(inputs, outputs)
+        with self._lock:
+            messages = self.chat_memory.messages
+            self._counts.sync(messages)
+            self.chat_memory.add_user_message(input_str)
+            self._counts.append(messages[-1])
+            self.chat_memory.add_ai_message(output_str)
+            self._counts.append(messages[-1])
+            if self._counts.total <= self.max_token_limit:
+                return
+            if self.background:
+                # A prune that has not started yet will see this turn too, so there is no need to queue another
+                if self._pending is None or self._pending.running() or self._pending.done():
+                    self._pending = _SUMMARIZER.submit(self._prune_in_background)
+                return
+        self.prune()
+
+    def _prune_in_background(self):
+        try:
+            self.prune()
+        except Exception as e:
+            LOGGER.error("Failed to summarize the conversation", exc_info=e)
+
+    def prune(self) -> None:
+        """Summarize the oldest messages until the buffer fits in `max_token_limit`, then swap the summary in"""
+        with self._lock:
+            messages = self.chat_memory.messages
+            self._counts.sync(messages)
+            generation = self._generation
+            summary = self.moving_summary_buffer
+            # Take the oldest messages off the running total, without counting anything again
+            length = self._counts.total
+            pruned: List[BaseMessage] = []
+            for message, count in zip(messages, self._counts):
+                if length <= self.max_token_limit:
+                    break
+                pruned.append(message)
+                length -= count
+        if not pruned:
+            return
+        new_summary = self.predict_new_summary(pruned, summary)
+        with self._lock:
+            messages = self.chat_memory.messages
+            # Only messages are appended meanwhile, so the pruned ones are still at the front unless it was cleared
+            if self._generation != generation or messages[:len(pruned)] != pruned:
+                LOGGER.debug("The conversation changed while it was summarized, discarding the summary")
+                return
+            del messages[:len(pruned)]
+            for _ in pruned:
+                self._counts.popleft()
+            self.moving_summary_buffer = new_summary
+        LOGGER.debug(f"Summarized {len(pruned)} messages, the buffer is now {self._counts.total} tokens")
+
+    def flush(self, timeout: Optional[float] = None):
+        """
+        Wait for a summary in progress, e.g. before exiting
+
+        :param timeout: How long to wait at most, in seconds, defaults to waiting until it is done
+        """
+        with self._lock:
+            pending = self._pending
+        if pending is not None:
+            pending.exception(timeout=timeout)
+
+    def clear(self) -> None:
+        """Clear the summary and the buffer, discarding any summary in progress"""
+        with self._lock:
+            self._generation += 1
+            self.chat_memory.clear()
+            self._counts.clear()
+            self.moving_summary_buffer = ""
@@ -0,0 +1,209 @@
+import asyncio
+from concurrent.futures import Future
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from openjanus.chains.onboardia.executor import ActionExecutor, get_action_executor
+
+
+LOGGER = logging.getLogger(__name__)
+
+_ACTIONS_KEY = re.compile(r'"actions"\s*:\s*([\[{])')
+# The LLM sometimes leaves out the comma between two lines, e.g. `"hold": false` followed by `"action_name": ...`
+_MISSING_COMMA = re.compile(r'(true|false|null|\d|"|}|])(\s*\n\s*)(?=")')
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+def _loads(text: str) -> Any:
+    """Parse JSON the way the LLM writes it"""
+    try:
+        # `strict=False` accepts the unescaped newlines and tabs the LLM sometimes puts in strings
+        return json.loads(text, strict=False)
+    except ValueError:
+        repaired = _TRAILING_COMMA.sub(r"\1", _MISSING_COMMA.sub(r"\1,\2", text))
+        return json.loads(repaired, strict=False)
+
+
+class StreamingActionParser:
+    """
+    Finds the actions in an LLM response while it is being streamed
+
+    The response is scanned once, as it arrives, and each element of the `actions` list is parsed as soon as its
+    closing brace arrives. A bare list of actions, or a single action object in place of the list, are accepted too.
+    """
+    def __init__(self):
+        self._text = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._element_start: Optional[int] = None
+        # The depth the elements of the list are at: 1 inside a list, 0 for a single action object
+        self._element_depth: Optional[int] = None
+        self.done = False
+
+    def _find_start(self) -> bool:
+        match = _ACTIONS_KEY.search(self._text)
+        if match is None:
+            stripped = re.sub(r"^\s*(```(json)?)?\s*", "", self._text)
+            if not stripped.startswith("["):
+                return False
+            start = self._text.index("[")
+            self._element_depth = 1
+        else:
+            start = match.start(1)
+            self._element_depth = 1 if match.group(1) == "[" else 0
+            if self._element_depth == 0:
+                self._element_start = start
+        self._position = start
+        return True
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add the next chunk of the response
+
+        :param chunk: The text streamed since the last call
+        :return: The actions that were completed by this chunk, in order
+        """
+        self._text += chunk
+        if self.done or (self._element_depth is None and not self._find_start()):
+            return []
+        actions = []
+        text = self._text
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if char == "{" and self._depth == self._element_depth:
+                    self._element_start = index
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if char == "}" and self._depth == self._element_depth and self._element_start is not None:
+                    action = self._parse_element(text[self._element_start:index + 1])
+                    if action is not None:
+                        actions.append(action)
+                    self._element_start = None
+                if self._depth == 0:
+                    self.done = True
+                    self._position = index + 1
+                    return actions
+        self._position = len(text)
+        return actions
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        End the response
+
+        :return: The actions of a response that never had an `actions` list, e.g. a single bare action object
+        """
+        if self._element_depth is not None:
+            return []
+        start = self._text.find("{")
+        end = self._text.rfind("}")
+        if start == -1 or end < start:
+            return []
+        action = self._parse_element(self._text[start:end + 1])
+        if action is None or "actions" in action:
+            return []
+        self.done = True
+        return [action]
+
+    @staticmethod
+    def _parse_element(element: str) -> Optional[Dict[str, Any]]:
+        try:
+            action = _loads(element)
+        except ValueError as e:
+            LOGGER.error(f"Could not parse the action {element!r}", exc_info=e)
+            return None
+        if not isinstance(action, dict):
+            return None
+        return action
+
+
+class ActionDispatcher:
+    """Performs actions in the background as they are parsed, in the order they were parsed"""
+    def __init__(self, executor: Optional[ActionExecutor] = None):
+        """
+        Initialises the ActionDispatcher
+
+        :param executor: The executor to perform actions with, defaults to the shared one
+        """
+        self.executor = executor if executor is not None else get_action_executor()
+        self.actions: List[Dict[str, Any]] = []
+        self._futures: List[Future] = []
+
+    def dispatch(self, actions: List[Dict[str, Any]]):
+        """
+        Start performing actions, after any that were dispatched before them
+
+        :param actions: The actions to perform
+        """
+        for action in actions:
+            LOGGER.debug(f"Dispatching {action.get('action_name')}")
+            self.actions.append(action)
+            self._futures.append(self.executor.submit([action]))
+
+    @property
+    def summary(self) -> str:
+        """What was performed and what failed, in the words of `keypress.run`"""
+        if not self.actions:
+            return "No actions performed"
+        completed, failed = [], []
+        for action, future in zip(self.actions, self._futures):
+            (failed if self._failed(future) else completed).append(action.get("action_name"))
+        parts = []
+        if completed:
+            parts.append(f"Actions {completed} Completed Successfully")
+        if failed:
+            parts.append(f"Actions {failed} Failed")
+        return ", ".join(parts)
+
+    @property
+    def succeeded(self) -> bool:
+        """Whether actions were performed and none of them failed, once they have been waited for"""
+        return bool(self.actions) and not any(self._failed(future) for future in self._futures)
+
+    @staticmethod
+    def _failed(future: Future) -> bool:
+        # An action that is not done yet has not succeeded either
+        return not future.done() or future.cancelled() or future.exception() is not None
+
+    def wait(self) -> str:
+        """
+        Wait for every dispatched action to be performed
+
+        :return: A summary of what was performed
+        """
+        for future in self._futures:
+            self._log_failure(future)
+        return self.summary
+
+    async def await_all(self) -> str:
+        """Wait for every dispatched action to be performed, without blocking the event loop"""
+        if self._futures:
+            await asyncio.wait([asyncio.wrap_future(future) for future in self._futures])
+        for future in self._futures:
+            self._log_failure(future)
+        return self.summary
+
+    @staticmethod
+    def _log_failure(future: Future):
+        # A failed action is logged rather than raised, the response should still be spoken
+        if future.cancelled():
+            LOGGER.error("An action was cancelled before it was performed")
+            return
+        exception = future.exception()
+        if exception is not None:
+            LOGGER.error("Failed to perform an action", exc_info=exception)
@@ -1,22 +1,19 @@
-import json
-import re
-from typing import Any, Callable
+from typing import Any, Dict, List, Optional
 
-# from langchain.output_parsers.json import SimpleJsonOutputParser
-import langchain.output_parsers.json as langchain_json_parser
 from langchain.prompts import SystemMessagePromptTemplate, ChatPromptTemplate, BasePromptTemplate, HumanMessagePromptTemplate
+from langchain.callbacks.manager import AsyncCallbackManagerForChainRun, CallbackManagerForChainRun
+from langchain.chains.base import Chain
 from langchain.pydantic_v1 import BaseModel
 from langchain.schema import BasePromptTemplate
+from langchain.schema.language_model import BaseLanguageModel
 
 from openjanus.chains.base import BaseOpenJanusConversationChain
+from openjanus.chains.onboardia.actions import ActionDispatcher, StreamingActionParser
+from openjanus.chains.onboardia.plan_cache import is_cacheable
 from openjanus.chains.onboardia.prompt import (
     ONBOARD_IA_SYSTEM_PROMPT,
     ONBOARD_IA_USER_PROMPT,
 )
-from openjanus.chains.onboardia.keypress import(
-    run as keypress_run,
-    arun as keypress_arun
-)
 
 
 
@@ -32,70 +29,83 @@ class OnboardIaChain(BaseOpenJanusConversationChain):
     return_final_only = True
 
 
-class testModel(BaseModel):
-    input: str
-
-
-def _replace_new_line(match: re.Match[str]) -> str:
-    value = match.group(2)
-    value = re.sub(r"\n", r"\\n", value)
-    value = re.sub(r"\r", r"\\r", value)
-    value = re.sub(r"\t", r"\\t", value)
-    value = re.sub(r'(?<!\\)"', r"\"", value)
-
-    return match.group(1) + value + match.group(3)
-
-
-def _custom_parser(multiline_string: str) -> str:
-    """
-    The LLM response for `action_input` may be a multiline
-    string containing unescaped newlines, tabs or quotes. This function
-    replaces those characters with their escaped counterparts.
-    (newlines in JSON must be double-escaped: `\\n`)
-    """
-    if isinstance(multiline_string, (bytes, bytearray)):
-        multiline_string = multiline_string.decode()
-
-    multiline_string = re.sub(
-        r'{\s*("actions"\:\s*)(({.*},\s*)({.*"\n\s*})*\s}$)',
-        _replace_new_line,
-        multiline_string,
-        flags=re.DOTALL,
-    )
-
-    return multiline_string
-
-
-def _parse_json_markdown(
-    json_string: str, *, parser: Callable[[str], Any] = json.loads
-) -> str | None:
+class KeypressChain(Chain):
     """
-    Parse a JSON string from a Markdown string.
-
-    Args:
-        json_string: The Markdown string.
+    A chain that asks the LLM which keys to press, and presses them while the response is still being streamed
 
-    Returns:
-        The parsed JSON object as a Python dictionary.
+    Each action is performed as soon as it has been generated, rather than once the whole response is in, so the
+    first of several actions starts straight away. With a plan cache, a command that was performed before is
+    performed again from the cache, without asking the LLM.
     """
-    # Try to find JSON string within triple backticks - patched
-    match = re.search(r"```(?:json)?\n(.*)```", json_string, re.DOTALL)
+    llm: BaseLanguageModel
+    prompt: BasePromptTemplate
+    plan_cache: Optional[Any] = None
+    """A `PlanCache` of the actions picked for previous commands"""
+    input_key: str = "input"
+    output_key: str = "text"
+
+    @property
+    def input_keys(self) -> List[str]:
+        return self.prompt.input_variables
+
+    @property
+    def output_keys(self) -> List[str]:
+        return [self.output_key]
+
+    def _cached_plan(self, inputs: Dict[str, Any]) -> Optional[Any]:
+        if self.plan_cache is None or not is_cacheable(str(inputs[self.input_key])):
+            return None
+        return self.plan_cache.get(str(inputs[self.input_key]))
+
+    def _store_plan(self, inputs: Dict[str, Any], dispatcher: ActionDispatcher):
+        # Only plans that were performed without an error are worth replaying
+        if self.plan_cache is not None and is_cacheable(str(inputs[self.input_key])) and dispatcher.succeeded:
+            self.plan_cache.put(str(inputs[self.input_key]), dispatcher.actions)
+
+    def _call(
+            self,
+            inputs: Dict[str, Any],
+            run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        dispatcher = ActionDispatcher()
+        plan = self._cached_plan(inputs)
+        if plan is not None:
+            dispatcher.dispatch(plan.actions)
+            return {self.output_key: dispatcher.wait()}
+        callbacks = run_manager.get_child() if run_manager else None
+        parser = StreamingActionParser()
+        messages = self.prompt.format_prompt(**{key: inputs[key] for key in self.input_keys})
+        for chunk in self.llm.stream(messages, config={"callbacks": callbacks}):
+            dispatcher.dispatch(parser.feed(chunk.content))
+        dispatcher.dispatch(parser.close())
+        summary = dispatcher.wait()
+        self._store_plan(inputs, dispatcher)
+        return {self.output_key: summary}
+
+    async def _acall(
+            self,
+            inputs: Dict[str, Any],
+            run_manager: Optional[AsyncCallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        dispatcher = ActionDispatcher()
+        plan = self._cached_plan(inputs)
+        if plan is not None:
+            dispatcher.dispatch(plan.actions)
+            return {self.output_key: await dispatcher.await_all()}
+        callbacks = run_manager.get_child() if run_manager else None
+        parser = StreamingActionParser()
+        messages = self.prompt.format_prompt(**{key: inputs[key] for key in self.input_keys})
+        async for chunk in self.llm.astream(messages, config={"callbacks": callbacks}):
+            dispatcher.dispatch(parser.feed(chunk.content))
+        dispatcher.dispatch(parser.close())
+        summary = await dispatcher.await_all()
+        self._store_plan(inputs, dispatcher)
+        return {self.output_key: summary}
+
+    @property
+    def _chain_type(self) -> str:
+        return "openjanus_keypress"
 
-    # If no match found, assume the entire string is a JSON string
-    if match is None:
-        json_str = json_string
-    else:
-        # If match found, use the content within the backticks
-        json_str = match.group(1)
 
-    # Strip whitespace and newlines from the start and end
-    json_str = json_str.strip()
-
-    # handle newlines and other special characters inside the returned value
-    json_str = _custom_parser(json_str)
-
-    # Parse the JSON string into a Python dictionary
-    parsed = parser(json_str)
-
-    output = keypress_run(parsed)
-    return output
+class testModel(BaseModel):
+    input: str
@@ -0,0 +1,387 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import lru_cache
+import ctypes
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+LOGGER = logging.getLogger(__name__)
+
+MOUSE_BUTTONS = {
+    "left": "left",
+    "left mouse button": "left",
+    "right": "right",
+    "right mouse button": "right",
+    "middle": "middle",
+    "middle mouse button": "middle",
+}
+
+
+# DirectInput scan codes, which is what the game reads. Codes above 0xFF are extended keys, sent with the extended flag
+SCAN_CODES: Dict[str, int] = {
+    **{key: 0x02 + index for index, key in enumerate("1234567890-=")},
+    **{key: 0x10 + index for index, key in enumerate("qwertyuiop[]")},
+    **{key: 0x1E + index for index, key in enumerate("asdfghjkl;'`")},
+    "\\": 0x2B,
+    **{key: 0x2C + index for index, key in enumerate("zxcvbnm,./")},
+    **{f"f{index + 1}": 0x3B + index for index in range(10)},
+    "f11": 0x57,
+    "f12": 0x58,
+    # Not in pydirectinput's own mapping, so they are always sent as scan codes here
+    **{f"numpad {digit}": code for digit, code in zip("7894561230", (0x47, 0x48, 0x49, 0x4B, 0x4C, 0x4D, 0x4F, 0x50, 0x51, 0x52))},
+    "escape": 0x01,
+    "backspace": 0x0E,
+    "tab": 0x0F,
+    "enter": 0x1C,
+    "space": 0x39,
+    "left control": 0x1D,
+    "left shift": 0x2A,
+    "right shift": 0x36,
+    "left alt": 0x38,
+    "right control": 0xE01D,
+    "right alt": 0xE038,
+}
+
+
+@dataclass(frozen=True)
+class InputEvent:
+    """One press or release sent to an input backend"""
+    time: float
+    kind: str
+    code: Any
+
+
+class InputBackend(ABC):
+    """Sends key and mouse button presses to the game"""
+    name: str = ""
+
+    @abstractmethod
+    def compile_key(self, key_name: str) -> Any:
+        """
+        Turn a key name from the keymap into whatever `key_down` and `key_up` take
+
+        :param key_name: The key name, lower case, e.g. `left alt` or `numpad 8`
+        :return: The key code
+        """
+
+    def compile_button(self, button_name: str) -> Any:
+        """
+        Turn a mouse button name into whatever `mouse_down` and `mouse_up` take
+
+        :param button_name: The button name, lower case, e.g. `left mouse button`
+        :return: The button code
+        """
+        if button_name not in MOUSE_BUTTONS:
+            raise ValueError(f"Unknown mouse button {button_name!r}")
+        return MOUSE_BUTTONS[button_name]
+
+    @abstractmethod
+    def key_down(self, code: Any):
+        pass
+
+    @abstractmethod
+    def key_up(self, code: Any):
+        pass
+
+    @abstractmethod
+    def mouse_down(self, code: Any):
+        pass
+
+    @abstractmethod
+    def mouse_up(self, code: Any):
+        pass
+
+
+class DirectInputBackend(InputBackend):
+    """
+    Sends DirectInput scan codes with `SendInput`, which is what the game reads, and mouse buttons with
+    `pydirectinput`. Windows only
+    """
+    name = "directinput"
+
+    def __init__(self):
+        try:
+            import pydirectinput
+        except ImportError:
+            raise ImportError(
+                "pydirectinput package not found, please install it with "
+                "`pip install pydirectinput`"
+            )
+        self._pydirectinput = pydirectinput
+
+    def compile_key(self, key_name: str) -> Any:
+        if key_name not in SCAN_CODES:
+            raise ValueError(f"Unknown key {key_name!r}")
+        return SCAN_CODES[key_name]
+
+    def _send_key(self, code: int, release: bool):
+        # The same input pydirectinput builds for its own keys, which leaves out the numpad
+        api = self._pydirectinput
+        flags = api.KEYEVENTF_SCANCODE
+        if code > 0xFF:
+            flags |= api.KEYEVENTF_EXTENDEDKEY
+        if release:
+            flags |= api.KEYEVENTF_KEYUP
+        extra = ctypes.c_ulong(0)
+        union = api.Input_I()
+        union.ki = api.KeyBdInput(0, code & 0xFF, flags, 0, ctypes.pointer(extra))
+        event = api.Input(ctypes.c_ulong(1), union)
+        api.SendInput(1, ctypes.pointer(event), ctypes.sizeof(event))
+
+    def key_down(self, code: Any):
+        self._send_key(code, release=False)
+
+    def key_up(self, code: Any):
+        self._send_key(code, release=True)
+
+    # `_pause=False` skips the pause pydirectinput adds after every call, the timeline does its own timing
+    def mouse_down(self, code: Any):
+        self._pydirectinput.mouseDown(button=code, _pause=False)
+
+    def mouse_up(self, code: Any):
+        self._pydirectinput.mouseUp(button=code, _pause=False)
+
+
+class VirtualInputBackend(InputBackend):
+    """Records the input that would have been sent instead of sending it, to measure and test actions without the game"""
+    name = "virtual"
+
+    def __init__(self):
+        self._events: List[InputEvent] = []
+        self._lock = threading.Lock()
+
+    @property
+    def events(self) -> List[InputEvent]:
+        """Every recorded event, in the order it was sent"""
+        with self._lock:
+            return list(self._events)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+    def _record(self, kind: str, code: Any):
+        with self._lock:
+            self._events.append(InputEvent(time=time.perf_counter(), kind=kind, code=code))
+
+    def compile_key(self, key_name: str) -> Any:
+        # Only the keys the game can be sent, so a keymap that works here works with DirectInput
+        if key_name not in SCAN_CODES:
+            raise ValueError(f"Unknown key {key_name!r}")
+        return key_name
+
+    def key_down(self, code: Any):
+        self._record("key_down", code)
+
+    def key_up(self, code: Any):
+        self._record("key_up", code)
+
+    def mouse_down(self, code: Any):
+        self._record("mouse_down", code)
+
+    def mouse_up(self, code: Any):
+        self._record("mouse_up", code)
+
+
+class _Job:
+    """The events of one submission still to be sent, and the future to resolve once they have been"""
+    def __init__(self, names: List[str], future: Future, submitted: float):
+        self.names = names
+        self.future = future
+        self.submitted = submitted
+        self.remaining = 0
+        self.first_input: Optional[float] = None
+        self.error: Optional[Exception] = None
+
+
+class ActionExecutor:
+    """
+    Performs actions on a timeline, on its own thread
+
+    Each action is turned into presses and releases at given times: a tap is released after `tap_seconds`, a hold
+    after `hold_seconds`. Actions start `gap_seconds` after each other rather than after the previous one has been
+    released, so holds of different keys overlap. An action that uses a key that is still held waits for its release.
+    Key names are compiled into the backend's key codes once, and cached.
+    """
+    def __init__(
+            self,
+            backend: InputBackend,
+            tap_seconds: float = 0.05,
+            hold_seconds: float = 3.0,
+            gap_seconds: float = 0.05,
+    ):
+        """
+        Initialises the ActionExecutor
+
+        :param backend: The backend to send input with
+        :param tap_seconds: How long a key is pressed for when it is not held, defaults to 0.05
+        :param hold_seconds: How long a key is pressed for when it is held, defaults to 3
+        :param gap_seconds: How long to wait between starting consecutive actions, defaults to 0.05
+        """
+        self.backend = backend
+        self.tap_seconds = tap_seconds
+        self.hold_seconds = hold_seconds
+        self.gap_seconds = gap_seconds
+        self._codes: Dict[Tuple[str, str], Any] = {}
+        self._timeline: List[Tuple[float, int, Callable[[Any], None], Any, _Job]] = []
+        self._sequence = itertools.count()
+        # When each key or button is next free, and when the next action can start
+        self._released_at: Dict[Any, float] = {}
+        self._cursor = 0.0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def _compile(self, kind: str, name: str) -> Any:
+        key = (kind, name)
+        if key not in self._codes:
+            compile_code = self.backend.compile_key if kind == "key" else self.backend.compile_button
+            self._codes[key] = compile_code(name)
+        return self._codes[key]
+
+    @staticmethod
+    def _key_names(action: Dict[str, Any]) -> Tuple[List[str], bool]:
+        """The keys of an action, and whether they are held, in any of the ways the LLM writes them"""
+        keys = action.get("keys") or []
+        if isinstance(keys, str):
+            keys = [keys]
+        hold = bool(action.get("hold", False))
+        names = []
+        for key in keys:
+            key = " ".join(str(key).lower().split())
+            if key.startswith("hold "):
+                hold = True
+                key = key[len("hold "):]
+            names.append(key)
+        return names, hold
+
+    def _schedule(self, action: Dict[str, Any], job: _Job):
+        """Put the presses and releases of an action on the timeline"""
+        events: List[Tuple[float, Callable[[Any], None], Any]] = []
+        names, hold = self._key_names(action)
+        keys = [self._compile("key", name) for name in names]
+        buttons = []
+        clicks = 1
+        mouse_hold = False
+        if action.get("mouse"):
+            mouse = action["mouse"]
+            buttons = [self._compile("button", " ".join(str(mouse.get("button", "left")).lower().split()))]
+            clicks = max(1, int(mouse.get("clicks", 1)))
+            mouse_hold = bool(mouse.get("hold", False)) or (hold and not keys)
+
+        start = max([self._cursor, time.perf_counter()] + [self._released_at.get(code, 0.0) for code in keys + buttons])
+        end = start
+        for button in buttons:
+            # With a modifier, e.g. `Left ALT + Right Mouse Button`, the button is clicked while the keys are down
+            button_start = start + (self.tap_seconds if keys else 0.0)
+            for click in range(clicks):
+                click_start = button_start + click * 2 * self.tap_seconds
+                click_end = click_start + (self.hold_seconds if mouse_hold else self.tap_seconds)
+                events.append((click_start, self.backend.mouse_down, button))
+                events.append((click_end, self.backend.mouse_up, button))
+                self._released_at[button] = click_end
+                end = max(end, click_end)
+        if keys:
+            release = max(start + (self.hold_seconds if hold else self.tap_seconds), end + (self.tap_seconds if buttons else 0.0))
+            # Modifiers are pressed in order, and released in reverse order
+            for key in keys:
+                events.append((start, self.backend.key_down, key))
+            for key in reversed(keys):
+                events.append((release, self.backend.key_up, key))
+                self._released_at[key] = release
+        self._cursor = start + self.gap_seconds
+        for at, send, code in events:
+            heapq.heappush(self._timeline, (at, next(self._sequence), send, code, job))
+        job.remaining += len(events)
+
+    def submit(self, actions: List[Dict[str, Any]]) -> Future:
+        """
+        Perform actions, after any that were submitted before them
+
+        :param actions: The actions to perform, see `keymap.KeymapEntry.to_action`
+        :return: A future that resolves to a summary once the last key has been released, or to the first error
+        """
+        names = [str(action.get("action_name")) for action in actions]
+        job = _Job(names=names, future=Future(), submitted=time.perf_counter())
+        with self._condition:
+            try:
+                for action in actions:
+                    self._schedule(action, job)
+            except Exception as e:
+                LOGGER.error(f"Could not schedule {names}", exc_info=e)
+                job.future.set_exception(e)
+                # Anything already scheduled for this job is still sent, so no key is left pressed
+                if job.remaining == 0:
+                    return job.future
+            if job.remaining == 0:
+                job.future.set_result(self._summary(job))
+                return job.future
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="openjanus-actions", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return job.future
+
+    @staticmethod
+    def _summary(job: _Job) -> str:
+        return f"Actions {job.names} Completed Successfully"
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._timeline:
+                    self._condition.wait()
+                at = self._timeline[0][0]
+                delay = at - time.perf_counter()
+                if delay > 0:
+                    # Woken early if something is scheduled before the next event
+                    self._condition.wait(delay)
+                    continue
+                _, _, send, code, job = heapq.heappop(self._timeline)
+            try:
+                send(code)
+            except Exception as e:
+                LOGGER.error(f"Failed to send {send.__name__} {code!r}", exc_info=e)
+                job.error = job.error or e
+            now = time.perf_counter()
+            if job.first_input is None:
+                job.first_input = now
+                LOGGER.debug(f"First input for {job.names} sent {(now - job.submitted) * 1000:.1f}ms after submission")
+            with self._condition:
+                job.remaining -= 1
+                done = job.remaining == 0
+            if done and not job.future.done():
+                if job.error is not None:
+                    job.future.set_exception(job.error)
+                    continue
+                LOGGER.info(f"Onboard IA: {job.names} completed in {(now - job.submitted) * 1000:.0f}ms")
+                job.future.set_result(self._summary(job))
+
+
+def create_input_backend(name: str) -> InputBackend:
+    """
+    Create an input backend by name
+
+    :param name: `directinput` or `virtual`
+    :return: The backend
+    """
+    if name == DirectInputBackend.name:
+        return DirectInputBackend()
+    if name == VirtualInputBackend.name:
+        return VirtualInputBackend()
+    raise ValueError(f"Unknown input backend {name!r}, expected directinput or virtual")
+
+
+@lru_cache(maxsize=None)
+def get_action_executor() -> ActionExecutor:
+    """Get the executor every action is performed with, using the configured input backend"""
+    from openjanus.app.config import get_config
+
+    settings = get_config().onboard_ia
+    LOGGER.debug(f"Performing actions with the {settings.input_backend} input backend")
+    return ActionExecutor(create_input_backend(settings.input_backend), hold_seconds=settings.hold_seconds)
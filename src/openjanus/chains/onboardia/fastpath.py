@@ -0,0 +1,311 @@
+import asyncio
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+import logging
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from langchain.schema import BaseMemory
+
+from openjanus.chains.onboardia.keymap import KeymapEntry, get_keymap
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Words that say nothing about which control is meant. They are removed from both the transcript and the action names.
+# `toggle` is kept, "power to shields" must not match "Toggle Power - Shields"
+FILLER_WORDS = frozenset({
+    "a", "ahead", "an", "can", "computer", "could", "do", "for", "go", "it", "me", "my", "now", "off", "on", "our",
+    "please", "put", "s", "set", "ship", "ships", "switch", "the", "to", "turn", "us", "will", "would", "you",
+})
+
+# Transcripts are split into one command per clause
+CLAUSE_SEPARATORS = re.compile(r"\b(?:and then|and|then)\b|[,;]")
+
+# Ways of asking for an action that are not close enough to its name to be matched
+ALIASES: Dict[str, str] = {
+    "lights": "Toogle Ship Lights",
+    "gear": "Landing Gear",
+    "gear up": "Landing Gear",
+    "gear down": "Landing Gear",
+    "request landing": "Request landing/take off",
+    "request take off": "Request landing/take off",
+    "request takeoff": "Request landing/take off",
+    "landing permission": "Request landing/take off",
+    "power up": "Flight Ready",
+    "quantum": "Toggle Quantum Travel Mode (spool quantum drive)",
+    "spool quantum": "Toggle Quantum Travel Mode (spool quantum drive)",
+    "engage quantum drive": "Activate Quantum Travel (Fire drive)",
+    "vtol": "Toggle VTOL mode",
+    "decoy": "Deploy Decoy",
+    "decoys": "Deploy Decoy",
+    "flares": "Deploy Decoy",
+    "noise": "Deploy Noise",
+    "chaff": "Deploy Noise",
+}
+
+# Controls whose effect cannot be taken back, e.g. firing weapons or countermeasures, or dumping the cargo
+GUARDED_SECTIONS = frozenset({"Weapons Controls"})
+GUARDED_ACTIONS = frozenset({"Deploy Noise", "Deploy Decoy", "Jettison Cargo", "Exit Seat"})
+
+# Spelling mistakes in the keymap, so that they do not count against a match
+TYPOS = {
+    "toogle": "toggle",
+}
+
+
+def normalize(text: str) -> Tuple[str, FrozenSet[str]]:
+    """
+    Reduce a command or an action name to the words that identify it
+
+    :param text: The text to normalize
+    :return: The identifying words, as a string and as a set
+    """
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    words = [TYPOS.get(word, word) for word in words]
+    words = [word for word in words if word not in FILLER_WORDS]
+    return " ".join(words), frozenset(words)
+
+
+@dataclass(frozen=True)
+class _Phrase:
+    text: str
+    words: FrozenSet[str]
+    entry: KeymapEntry
+
+
+@dataclass(frozen=True)
+class FastPathMatch:
+    """The actions a command was matched to, and how confident the match is"""
+    entries: Tuple[KeymapEntry, ...]
+    score: float
+
+    @property
+    def actions(self) -> List[Dict[str, Any]]:
+        return [entry.to_action() for entry in self.entries]
+
+    @property
+    def confirmation(self) -> str:
+        return f"{', '.join(_spoken_name(entry) for entry in self.entries)}, done."
+
+
+class KeymapMatcher:
+    """
+    Matches commands to keymap entries without the LLM
+
+    Every name and alias of each executable entry is normalized once into a phrase index. A command is split into
+    clauses, and each clause is scored against every phrase by both character similarity (to tolerate transcription
+    mistakes) and word overlap. Every clause must match one action confidently, and clearly better than any action
+    bound to something else, or the command is left to the LLM. A match that is not exact must still name every word
+    of the action, give or take a spelling mistake, so "toggle power" does not match "Toggle Power - All". Guarded
+    controls, e.g. weapons and countermeasures, must be named exactly, or match nearly exactly and far ahead of
+    anything else.
+    """
+    def __init__(
+            self,
+            entries: Optional[Iterable[KeymapEntry]] = None,
+            threshold: float = 0.85,
+            margin: float = 0.05,
+            executable_only: bool = True,
+            guarded_threshold: float = 0.95,
+            guarded_margin: float = 0.2,
+            word_similarity: float = 0.8,
+    ):
+        """
+        Initialises the KeymapMatcher
+
+        :param entries: The entries to match against, defaults to the Onboard IA keymap
+        :param threshold: The lowest score a clause can match with, from 0 to 1, defaults to 0.85
+        :param margin: How much better the best match must be than a match bound to something else, defaults to 0.05
+        :param executable_only: Whether to skip entries that can only be performed through the LLM, defaults to True
+        :param guarded_threshold: The lowest score a weapon or countermeasure can match with, unless it is named
+            exactly, defaults to 0.95
+        :param guarded_margin: How much better a weapon or countermeasure match must be than a match bound to something
+            else, unless it is named exactly, defaults to 0.2
+        :param word_similarity: How alike a word of the command must be to a word of the action to count as naming it,
+            from 0 to 1, defaults to 0.8
+        """
+        self.threshold = threshold
+        self.margin = margin
+        self.guarded_threshold = guarded_threshold
+        self.guarded_margin = guarded_margin
+        self.word_similarity = word_similarity
+        entries = [
+            entry for entry in (get_keymap() if entries is None else entries)
+            if entry.is_executable or not executable_only
+        ]
+        by_name = {entry.action_name: entry for entry in entries}
+        phrases: Dict[str, _Phrase] = {}
+        for entry in entries:
+            for name in entry.aliases:
+                text, words = normalize(name)
+                if text and text not in phrases:
+                    phrases[text] = _Phrase(text=text, words=words, entry=entry)
+        for alias, action_name in ALIASES.items():
+            if action_name in by_name:
+                text, words = normalize(alias)
+                phrases.setdefault(text, _Phrase(text=text, words=words, entry=by_name[action_name]))
+        self.phrases = list(phrases.values())
+        LOGGER.debug(f"Indexed {len(self.phrases)} phrases for {len(entries)} actions")
+
+    @staticmethod
+    def _score(text: str, words: FrozenSet[str], phrase: _Phrase) -> float:
+        if text == phrase.text:
+            return 1.0
+        overlap = len(words & phrase.words) / len(words | phrase.words)
+        return max(overlap, SequenceMatcher(None, text, phrase.text).ratio())
+
+    def _names_every_word(self, words: FrozenSet[str], phrase: _Phrase) -> bool:
+        """Whether every word of the phrase is in the command, allowing for transcription mistakes"""
+        return all(
+            word in words or any(SequenceMatcher(None, word, said).ratio() >= self.word_similarity for said in words)
+            for word in phrase.words
+        )
+
+    def match_clause(self, clause: str) -> Optional[Tuple[KeymapEntry, float]]:
+        """
+        Match one command to an action
+
+        :param clause: The command
+        :return: The action and the score it matched with, or None if there was no confident match
+        """
+        text, words = normalize(clause)
+        if not text:
+            return None
+        scored = [(self._score(text, words, phrase), phrase) for phrase in self.phrases]
+        best_score, best_phrase = max(scored, key=lambda scored_phrase: scored_phrase[0])
+        best_entry = best_phrase.entry
+        # Other names for the same control do not make a match ambiguous
+        runner_up = max((score for score, phrase in scored if _binding(phrase.entry) != _binding(best_entry)), default=0.0)
+        if best_score < self.threshold or best_score - runner_up < self.margin:
+            LOGGER.debug(f"No confident match for {clause!r}, best was {best_entry.action_name} ({best_score:.2f} vs {runner_up:.2f})")
+            return None
+        if best_score < 1.0 and not self._names_every_word(words, best_phrase):
+            LOGGER.debug(f"Not matching {clause!r} to {best_entry.action_name}, it leaves out part of the name")
+            return None
+        if _is_guarded(best_entry) and best_score < 1.0 and (
+                best_score < self.guarded_threshold or best_score - runner_up < self.guarded_margin
+        ):
+            LOGGER.debug(f"Not firing {best_entry.action_name} for {clause!r} without an exact match ({best_score:.2f} vs {runner_up:.2f})")
+            return None
+        return best_entry, best_score
+
+    def match(self, command: str) -> Optional[FastPathMatch]:
+        """
+        Match a command, which may ask for several actions, e.g. "flight ready and lights on"
+
+        :param command: The transcribed command
+        :return: The match, or None if any part of the command could not be matched confidently
+        """
+        clauses = [clause for clause in CLAUSE_SEPARATORS.split(command) if clause and normalize(clause)[0]]
+        if not clauses:
+            return None
+        entries = []
+        scores = []
+        for clause in clauses:
+            matched = self.match_clause(clause)
+            if matched is None:
+                return None
+            entries.append(matched[0])
+            scores.append(matched[1])
+        return FastPathMatch(entries=tuple(dict.fromkeys(entries)), score=min(scores))
+
+    def rank(self, command: str, limit: int) -> List[Tuple[KeymapEntry, float]]:
+        """
+        Rank actions by how well they match any part of a command, however weakly
+
+        :param command: The transcribed command
+        :param limit: How many actions to return at most
+        :return: The best matching actions and their scores, best first
+        """
+        best: Dict[KeymapEntry, float] = {}
+        for clause in [command, *CLAUSE_SEPARATORS.split(command)]:
+            text, words = normalize(clause or "")
+            if not text:
+                continue
+            stems = _stems(words)
+            for phrase in self.phrases:
+                # Plurals are ignored here, "front shields" should rank "shield power level front" highly
+                phrase_stems = _stems(phrase.words)
+                dice = 2 * len(stems & phrase_stems) / (len(stems) + len(phrase_stems))
+                score = max(self._score(text, words, phrase), dice)
+                if score > best.get(phrase.entry, -1.0):
+                    best[phrase.entry] = score
+        return sorted(best.items(), key=lambda ranked: ranked[1], reverse=True)[:limit]
+
+
+def _stems(words: FrozenSet[str]) -> FrozenSet[str]:
+    return frozenset(word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words)
+
+
+def _is_guarded(entry: KeymapEntry) -> bool:
+    return entry.section in GUARDED_SECTIONS or entry.action_name in GUARDED_ACTIONS
+
+
+def _binding(entry: KeymapEntry) -> Tuple[Any, ...]:
+    return entry.keys, entry.mouse, entry.hold
+
+
+def _spoken_name(entry: KeymapEntry) -> str:
+    """e.g. `Launch missiles` for `Fire weapon group 1 / Launch missile(s)`"""
+    name = re.sub(r"\((s|es)\)", r"\1", entry.action_name).split(" / ")[-1]
+    name = re.sub(r"\s*\([^)]*\)", "", name)
+    return " ".join(TYPOS[word.lower()].capitalize() if word.lower() in TYPOS else word for word in name.split())
+
+
+def perform_actions(actions: List[Dict[str, Any]]) -> str:
+    """Perform actions with the shared action executor, waiting until they are done"""
+    from openjanus.chains.onboardia.executor import get_action_executor
+    return get_action_executor().submit(actions).result()
+
+
+class OnboardIaFastPath:
+    """
+    Sits in front of the agent, and performs commands that clearly name ship controls straight away, without any LLM
+    calls. Everything else is passed through to the agent
+    """
+    def __init__(
+            self,
+            agent_chain: Any,
+            matcher: Optional[KeymapMatcher] = None,
+            speak: bool = True,
+            memory: Optional[BaseMemory] = None,
+    ):
+        """
+        Initialises the OnboardIaFastPath
+
+        :param agent_chain: The agent to pass unmatched commands to
+        :param matcher: The matcher to use, defaults to matching against the Onboard IA keymap
+        :param speak: Whether to speak a confirmation of the performed actions, defaults to True
+        :param memory: The Onboard IA's memory, every performed command is saved to it so later LLM turns know about
+            it, defaults to not saving them
+        """
+        self.agent_chain = agent_chain
+        self.matcher = matcher if matcher is not None else KeymapMatcher()
+        self.speak = speak
+        self.memory = memory
+
+    def _respond(self, command: str, fast_path_match: FastPathMatch) -> str:
+        LOGGER.info(f"Onboard IA fast path: {[entry.action_name for entry in fast_path_match.entries]} (score {fast_path_match.score:.2f})")
+        perform_actions(fast_path_match.actions)
+        confirmation = fast_path_match.confirmation
+        if self.memory is not None:
+            self.memory.save_context({"input": command}, {"response": confirmation})
+        if self.speak:
+            from openjanus.chains.base import get_tool as get_tts_tool
+            get_tts_tool().run({"query": confirmation})
+        return confirmation
+
+    def invoke(self, inputs: Dict[str, Any], *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        fast_path_match = self.matcher.match(inputs["input"])
+        if fast_path_match is None:
+            return self.agent_chain.invoke(inputs, *args, **kwargs)
+        return {**inputs, "output": self._respond(inputs["input"], fast_path_match)}
+
+    async def ainvoke(self, inputs: Dict[str, Any], *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        fast_path_match = self.matcher.match(inputs["input"])
+        if fast_path_match is None:
+            return await self.agent_chain.ainvoke(inputs, *args, **kwargs)
+        # Holding keys and speaking both block, so they run off the event loop
+        output = await asyncio.get_running_loop().run_in_executor(None, self._respond, inputs["input"], fast_path_match)
+        return {**inputs, "output": output}
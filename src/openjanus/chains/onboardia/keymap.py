@@ -0,0 +1,144 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from openjanus.chains.onboardia.prompt import ONBOARD_IA_KEYMAP_TABLES
+
+
+LOGGER = logging.getLogger(__name__)
+
+MOUSE_BUTTONS = {
+    "left mouse button",
+    "right mouse button",
+    "middle mouse button",
+}
+
+
+@dataclass(frozen=True)
+class KeymapEntry:
+    """One row of a control table in the keymap"""
+    section: str
+    action_name: str
+    binding: str
+    keys: Tuple[str, ...] = ()
+    mouse: Optional[str] = None
+    hold: bool = False
+    aliases: Tuple[str, ...] = field(default=(), compare=False)
+
+    @property
+    def is_executable(self) -> bool:
+        """Whether the binding could be understood, so the action can be performed without the LLM"""
+        return bool(self.keys) or self.mouse is not None
+
+    def to_action(self) -> Dict[str, Any]:
+        """
+        Get this entry as an action, in the same format the keypress chain produces
+
+        :return: An action for `keypress.perform_action`
+        """
+        action: Dict[str, Any] = {
+            "keys": list(self.keys),
+            "hold": self.hold,
+            "action_name": self.action_name,
+        }
+        if self.mouse is not None:
+            action["mouse"] = {"button": self.mouse, "clicks": 1, "hold": self.hold and not self.keys}
+        return action
+
+
+def _parse_binding(binding: str) -> Tuple[Tuple[str, ...], Optional[str], bool]:
+    """Parse a binding like `Hold B` or `Left ALT + N` into keys, a mouse button, and whether it is held"""
+    binding = " ".join(binding.lower().split())
+    hold = False
+    if binding.startswith("hold "):
+        hold = True
+        binding = binding[len("hold "):]
+    keys: List[str] = []
+    mouse = None
+    for part in (part.strip() for part in binding.split("+")):
+        if part in MOUSE_BUTTONS:
+            mouse = part
+        elif len(part) == 1 or re.fullmatch(r"(left|right) (alt|control|shift)|numpad \d|f\d{1,2}", part):
+            keys.append(part)
+        else:
+            # e.g. `Mouse Wheel Up/Down` or `Toggle Right Shift`, which can only be performed through the LLM
+            return (), None, False
+    return tuple(keys), mouse, hold
+
+
+def _aliases(action_name: str) -> Tuple[str, ...]:
+    """The names an action goes by, e.g. `Fire weapon group 1 / Launch missile(s)` is also `Launch missiles`"""
+    name = re.sub(r"\((s|es)\)", r"\1", action_name)
+    base = re.sub(r"\s*\([^)]*\)", "", name).strip()
+    names = [action_name, base]
+    names.extend(parenthesised for parenthesised in re.findall(r"\(([^)]*)\)", name) if " " in parenthesised)
+    names.extend(part.strip() for part in base.split(" / "))
+    return tuple(dict.fromkeys(name for name in names if name))
+
+
+def parse_keymap(keymap: str) -> List[KeymapEntry]:
+    """
+    Parse the markdown control tables of a keymap prompt
+
+    :param keymap: The keymap, e.g. `ONBOARD_IA_KEYMAP_TABLES`
+    :return: An entry per table row, in order
+    """
+    entries = []
+    section = ""
+    for line in keymap.splitlines():
+        line = line.strip()
+        if line.startswith("# "):
+            section = line[2:].strip()
+            continue
+        if not line.startswith("|") or line.count("|") < 3:
+            continue
+        cells = [cell.strip() for cell in line.strip("|").split("|")]
+        if len(cells) < 2 or not cells[0] or set(cells[0]) <= {"-", " "} or cells[0].lower() == "action":
+            continue
+        action_name, binding = cells[0], cells[1]
+        keys, mouse, hold = _parse_binding(binding)
+        entries.append(KeymapEntry(
+            section=section,
+            action_name=action_name,
+            binding=binding,
+            keys=keys,
+            mouse=mouse,
+            hold=hold,
+            aliases=_aliases(action_name),
+        ))
+    return entries
+
+
+def parse_keymap_notes(keymap: str) -> Dict[str, str]:
+    """
+    Parse the text around the control tables of a keymap prompt, e.g. how a quantum jump has to be performed
+
+    :param keymap: The keymap, e.g. `ONBOARD_IA_KEYMAP_TABLES`
+    :return: The text of each section, without its table, by section name
+    """
+    notes: Dict[str, List[str]] = {}
+    section = ""
+    for line in keymap.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("# "):
+            section = stripped[2:].strip()
+            notes[section] = []
+        elif section and not stripped.startswith("|"):
+            notes[section].append(line)
+    return {section: "\n".join(lines).strip() for section, lines in notes.items()}
+
+
+@lru_cache(maxsize=None)
+def get_keymap() -> Tuple[KeymapEntry, ...]:
+    """Get the entries of the Onboard IA keymap, parsed once"""
+    entries = tuple(parse_keymap(ONBOARD_IA_KEYMAP_TABLES))
+    LOGGER.debug(f"Parsed {len(entries)} keymap entries, {sum(entry.is_executable for entry in entries)} executable")
+    return entries
+
+
+@lru_cache(maxsize=None)
+def get_keymap_notes() -> Dict[str, str]:
+    """Get the text of each section of the Onboard IA keymap, parsed once"""
+    return parse_keymap_notes(ONBOARD_IA_KEYMAP_TABLES)
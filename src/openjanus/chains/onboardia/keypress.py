@@ -1,7 +1,8 @@
+import asyncio
 from collections.abc import Mapping
 import logging
 from time import sleep
-from typing import List
+from typing import Any, List
 
 import keyboard
 import pydirectinput
@@ -9,6 +10,8 @@ from pynput.keyboard import Key, Controller as KeyboardController
 from pynput.mouse import Button, Controller as MouseController
 from pynput.keyboard import KeyCode
 
+from openjanus.chains.onboardia.executor import get_action_executor
+
 
 LOGGER = logging.getLogger(__name__)
 keyboard = KeyboardController()
@@ -56,39 +59,42 @@ def get_button(button_name: str):
         raise InvalidKeyError(button=button_name, message="Unknown mouse button name")
 
 
+# Built once, rather than on every key press
+SPECIAL_KEYS = {
+    'left alt': Key.alt_l,
+    'numpad 8': KeyCode.from_vk(104),
+    'numpad 2': KeyCode.from_vk(98),
+    'numpad 4': KeyCode.from_vk(100),
+    'numpad 6': KeyCode.from_vk(102),
+    'numpad 7': KeyCode.from_vk(103),
+    'numpad 1': KeyCode.from_vk(97),
+    'numpad 5': KeyCode.from_vk(101),
+    'left control': Key.ctrl_l,
+    'left shift': Key.shift_l,
+    'right shift': Key.shift_r,
+    'f1': Key.f1,
+    'f2': Key.f2,
+    'f3': Key.f3,
+    'f4': Key.f4,
+    'f5': Key.f5,
+    'f6': Key.f6,
+    'f7': Key.f7,
+    'f8': Key.f8,
+    'f9': Key.f9,
+    'f10': Key.f10,
+    'f11': Key.f11,
+    'f12': Key.f12,
+}
+
+
 # Function to perform key press or release
 def handle_keys(keys: List[str], hold: bool):
-    special_keys = {
-        'left alt': Key.alt_l,
-        'numpad 8': KeyCode.from_vk(104),
-        'numpad 2': KeyCode.from_vk(98),
-        'numpad 4': KeyCode.from_vk(100),
-        'numpad 6': KeyCode.from_vk(102),
-        'numpad 7': KeyCode.from_vk(103),
-        'numpad 1': KeyCode.from_vk(97),
-        'numpad 5': KeyCode.from_vk(101),
-        'left control': Key.ctrl_l,
-        'left shift': Key.shift_l,
-        'right shift': Key.shift_r,
-        'f1': Key.f1,
-        'f2': Key.f2,
-        'f3': Key.f3,
-        'f4': Key.f4,
-        'f5': Key.f5,
-        'f6': Key.f6,
-        'f7': Key.f7,
-        'f8': Key.f8,
-        'f9': Key.f9,
-        'f10': Key.f10,
-        'f11': Key.f11,
-        'f12': Key.f12,
-    }
     for key_name in keys:
         # Convert the key name to lowercase for consistent mapping
         key_name_lower = key_name.lower()
         # Check if the key is in the special keys mapping
-        if key_name_lower in special_keys:
-            key = special_keys[key_name_lower]
+        if key_name_lower in SPECIAL_KEYS:
+            key = SPECIAL_KEYS[key_name_lower]
         else:
             # Assume the key is a single character and get a KeyCode for it
             key = KeyCode.from_char(key_name_lower)
@@ -140,52 +146,27 @@ def perform_action(action: dict):
                 handle_keys([key_name], hold)
 
 
-def run(keypresses: dict):
-    if isinstance(keypresses, List):  # This is a list
-        for action in keypresses:
-            LOGGER.info(f"Onboard IA: Performing {action['action_name']}")
-            perform_action(action)
-            LOGGER.info(f"Onboard IA: {action['action_name']} completed")
-            return f"Actions {[action['action_name'] for action in keypresses]} Completed Successfully"
-    if isinstance(keypresses, Mapping):  # This is a dict
-        if not "actions" in keypresses:
-            LOGGER.info(f"Onboard IA: Performing {keypresses['action_name']}")
-            perform_action(keypresses)
-            LOGGER.info(f"Onboard IA: {keypresses['action_name']} completed")
-            return f"Actions {keypresses['action_name']} completed."
-        if "actions" in keypresses:
-            if isinstance(keypresses['actions'], list):
-                for action in keypresses['actions']:
-                    LOGGER.info(f"Onboard IA: Performing {action['action_name']}")
-                    perform_action(action)
-                    LOGGER.info(f"Onboard IA: {action['action_name']} completed")
-                return f"Actions {[action['action_name'] for action in keypresses['actions']]} Completed Successfully"
-            LOGGER.info(f"Onboard IA: Performing {keypresses['actions']['action_name']}")
-            perform_action(keypresses['actions'])
-            LOGGER.info(f"Onboard IA: {keypresses['actions']['action_name']} completed")
-            return f"Actions {keypresses['actions']['action_name']} Completed Successfully."
-
-
-
-async def arun(keypresses: dict):
-    if not isinstance(keypresses, list):  # This is a list
-        for action in keypresses:
-            LOGGER.info(f"Onboard IA: Performing {action['action_name']}")
-            perform_action(action)
-            LOGGER.info(f"Onboard IA: {action['action_name']} completed")
-            return f"Actions {[action['action_name'] for action in keypresses]} Completed Successfully"
-    if isinstance(keypresses, Mapping):  # This is a dict
-        if not "actions" in keypresses:
-            LOGGER.info(f"Onboard IA: Performing {keypresses['action_name']}")
-            perform_action(keypresses)
-            LOGGER.info(f"Onboard IA: {keypresses['action_name']} completed")
-            return f"Actions {keypresses['action_name']} completed."
-        if "actions" in keypresses:
-            LOGGER.info(f"Onboard IA: Performing {keypresses['actions']['action_name']}")
-            perform_action(keypresses['actions'])
-            LOGGER.info(f"Onboard IA: {keypresses['actions']['action_name']} completed")
-            return f"Actions {keypresses['actions']['action_name']} Completed Successfully."
-    
+def _as_actions(keypresses: Any) -> List[dict]:
+    """Get the list of actions from any of the shapes the keypress chain produces"""
+    if isinstance(keypresses, list):
+        return keypresses
+    if isinstance(keypresses, Mapping):
+        if "actions" not in keypresses:
+            return [keypresses]
+        actions = keypresses["actions"]
+        return actions if isinstance(actions, list) else [actions]
+    return []
+
+
+def run(keypresses: dict) -> str:
+    """Perform actions with the shared action executor, waiting until they are done"""
+    return get_action_executor().submit(_as_actions(keypresses)).result()
+
+
+async def arun(keypresses: dict) -> str:
+    """Perform actions with the shared action executor, without blocking the event loop"""
+    return await asyncio.wrap_future(get_action_executor().submit(_as_actions(keypresses)))
+
 
 # # Example usage
 # sample_input = {
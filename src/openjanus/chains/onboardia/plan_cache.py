@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+from functools import lru_cache
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from openjanus.chains.onboardia.prompt import ONBOARD_IA_KEYMAP_PROMPT, ONBOARD_IA_SINGLE_CALL_PROMPT
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Words that do not change what a command asks for. Unlike the fast path, `on` and `off` are kept, a cached plan
+# must only be replayed for the same request
+POLITE_WORDS = frozenset({"computer", "could", "can", "kindly", "please", "would", "you"})
+
+# Words that refer back to earlier turns, so the same command can ask for something different each time
+REFERRING_WORDS = frozenset({
+    "again", "another", "back", "before", "instead", "it", "last", "previous", "redo", "repeat", "revert", "same",
+    "that", "them", "these", "this", "those", "undo",
+})
+
+
+def normalize_utterance(utterance: str) -> str:
+    """
+    Reduce a transcribed command to a cache key, so that "Computer, lights on please." and "lights on" share a plan
+
+    :param utterance: The transcribed command
+    :return: The cache key
+    """
+    words = re.findall(r"[a-z0-9']+", utterance.lower())
+    return " ".join(word for word in words if word not in POLITE_WORDS)
+
+
+def keymap_fingerprint() -> str:
+    """A hash of everything a plan was produced from, so plans are dropped when the keymap or prompts change"""
+    digest = hashlib.sha256()
+    for prompt in (ONBOARD_IA_KEYMAP_PROMPT, ONBOARD_IA_SINGLE_CALL_PROMPT):
+        digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_cacheable(utterance: str) -> bool:
+    """
+    Whether a command can be answered from, and stored in, the plan cache
+
+    Plans are keyed by the command alone, so a command that refers back to earlier turns, e.g. "do that again", always
+    goes to the LLM. Any other command means the same whatever was said before it
+
+    :param utterance: The transcribed command
+    :return: True if the command stands on its own
+    """
+    return not REFERRING_WORDS.intersection(normalize_utterance(utterance).split())
+
+
+@dataclass(frozen=True)
+class CachedPlan:
+    """The actions a command was turned into, and the response that was spoken for it, if any"""
+    actions: List[Dict[str, Any]]
+    response: Optional[str] = None
+
+
+class PlanCache:
+    """
+    A persistent cache of the actions the LLM picked for each command, so repeated commands skip the LLM
+
+    Plans are kept in SQLite, keyed by the normalized command. They expire `ttl_seconds` after they were stored, the
+    least recently used plans are evicted beyond `max_entries`, and every plan is dropped when the keymap or the
+    prompts change.
+    """
+    def __init__(self, path: str, max_entries: int = 500, ttl_seconds: float = 7 * 24 * 3600, fingerprint: Optional[str] = None):
+        """
+        Initialises the PlanCache, and opens (or creates) its database
+
+        :param path: The SQLite database file, or `:memory:`
+        :param max_entries: How many plans to keep at most, defaults to 500
+        :param ttl_seconds: How long a plan can be replayed for, defaults to a week
+        :param fingerprint: Identifies the keymap the plans were made for, defaults to `keymap_fingerprint()`
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fingerprint = fingerprint if fingerprint is not None else keymap_fingerprint()
+        self._lock = threading.Lock()
+        # Used from the event loop and from executor threads, always under the lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                "utterance TEXT PRIMARY KEY, actions TEXT NOT NULL, response TEXT, "
+                "created REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS plans_last_used ON plans (last_used)")
+            row = self._connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            if row is None or row[0] != self.fingerprint:
+                if row is not None:
+                    LOGGER.info("The keymap changed, dropping every cached plan")
+                self._connection.execute("DELETE FROM plans")
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)", (self.fingerprint,)
+                )
+
+    def get(self, utterance: str) -> Optional[CachedPlan]:
+        """
+        Look up the plan for a command
+
+        :param utterance: The transcribed command
+        :return: The plan, or None if there is no plan that is still fresh
+        """
+        key = normalize_utterance(utterance)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT actions, response, created FROM plans WHERE utterance = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            actions, response, created = row
+            if now - created > self.ttl_seconds:
+                self._connection.execute("DELETE FROM plans WHERE utterance = ?", (key,))
+                return None
+            self._connection.execute(
+                "UPDATE plans SET last_used = ?, hits = hits + 1 WHERE utterance = ?", (now, key)
+            )
+        LOGGER.debug(f"Replaying the cached plan for {key!r}")
+        return CachedPlan(actions=json.loads(actions), response=response)
+
+    def put(self, utterance: str, actions: List[Dict[str, Any]], response: Optional[str] = None):
+        """
+        Store the plan for a command, replacing any previous one
+
+        :param utterance: The transcribed command
+        :param actions: The actions that were performed for it, all of which succeeded
+        :param response: The response that was spoken for it, if it should be replayed too
+        """
+        key = normalize_utterance(utterance)
+        if not key or not actions:
+            return
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO plans (utterance, actions, response, created, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, json.dumps(actions), response, now, now),
+            )
+            self._connection.execute(
+                "DELETE FROM plans WHERE utterance NOT IN "
+                "(SELECT utterance FROM plans ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        """Drop every plan"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM plans")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+
+@lru_cache(maxsize=None)
+def get_plan_cache() -> Optional[PlanCache]:
+    """Get the plan cache configured in `[onboard_ia]`, or None if it is disabled"""
+    from openjanus.app.config import get_config
+
+    settings = get_config().onboard_ia
+    if not settings.plan_cache:
+        return None
+    return PlanCache(
+        settings.plan_cache_path,
+        max_entries=settings.plan_cache_max_entries,
+        ttl_seconds=settings.plan_cache_ttl_hours * 3600,
+    )
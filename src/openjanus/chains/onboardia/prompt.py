@@ -10,8 +10,10 @@ AI:"""
 ONBOARD_IA_KEYMAP_USER_PROMPT = """Desired action: {input}
 AI:"""
 
-ONBOARD_IA_KEYMAP_PROMPT = """The following tables show available controls and actions. You will receive an input action, and should return with the appropriate key mappings
-# Flight Controls
+ONBOARD_IA_KEYMAP_PROMPT_HEADER = """The following tables show available controls and actions. You will receive an input action, and should return with the appropriate key mappings
+"""
+
+ONBOARD_IA_KEYMAP_TABLES = """# Flight Controls
 These controls are related to Flight Systems
 
 Performing a quantum jump is a series of actions that you cannot perform in tandem. This is the only action that you should prompt the user for in sequence.
@@ -124,7 +126,9 @@ These controls are related to salvage systems
 | Relative Beam Spacing | Left ALT + Mouse Wheel Click |
 | Toggle Salvage Beam Axis | Left ALT + Right Mouse Button |
 
-Your output should be a JSON dictionary of dictionaries wrapped in a markdown language block in the following format:
+"""
+
+ONBOARD_IA_KEYMAP_OUTPUT_FORMAT = """Your output should be a JSON dictionary of dictionaries wrapped in a markdown language block in the following format:
 ```json
 {{
      "actions":
@@ -160,4 +164,34 @@ For example, here are two separate actions (combining a user's request into mult
 ```
 
 
-"""
\ No newline at end of file
+"""
+
+ONBOARD_IA_KEYMAP_PROMPT = ONBOARD_IA_KEYMAP_PROMPT_HEADER + ONBOARD_IA_KEYMAP_TABLES + ONBOARD_IA_KEYMAP_OUTPUT_FORMAT
+
+# Only the controls that are relevant to the input are rendered into `{keymap}`, see `openjanus.chains.onboardia.retrieval`
+ONBOARD_IA_KEYMAP_RETRIEVED_PROMPT = ONBOARD_IA_KEYMAP_PROMPT_HEADER + "{keymap}\n" + ONBOARD_IA_KEYMAP_OUTPUT_FORMAT
+
+ONBOARD_IA_SINGLE_CALL_OUTPUT_FORMAT = """Your output should be a single JSON dictionary wrapped in a markdown language block. "actions" holds the key mappings to perform, and must come first. "response" is what you say back to the player once the actions are performed, in character, in one or two short sentences:
+```json
+{{
+      "actions":
+      [
+        {{
+          "keys": ["n"],
+          "hold": false,
+          "action_name": "Landing Gear"
+        }},
+        {{
+          "keys": ["l"],
+          "hold": false,
+          "action_name": "Toogle Ship Lights"
+        }}
+      ],
+      "response": "Landing gear deployed and lights on, we're ready to set down."
+}}
+```
+If there is nothing to perform, "actions" is an empty list.
+"""
+
+# Picks the actions and phrases the spoken response in one call, see `openjanus.chains.onboardia.single_call`
+ONBOARD_IA_SINGLE_CALL_PROMPT = ONBOARD_IA_SYSTEM_PROMPT + "\n" + ONBOARD_IA_KEYMAP_PROMPT_HEADER + "{keymap}\n" + ONBOARD_IA_SINGLE_CALL_OUTPUT_FORMAT
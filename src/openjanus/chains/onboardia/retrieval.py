@@ -0,0 +1,101 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from openjanus.chains.onboardia.fastpath import KeymapMatcher
+from openjanus.chains.onboardia.keymap import KeymapEntry, get_keymap, get_keymap_notes
+from openjanus.chains.onboardia.prompt import ONBOARD_IA_KEYMAP_TABLES
+from openjanus.utils.tokens import count_tokens
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def render_keymap(entries: Iterable[KeymapEntry], notes: Optional[Dict[str, str]] = None) -> str:
+    """
+    Render keymap entries back into markdown control tables, one per section, in the order of the keymap
+
+    :param entries: The entries to render
+    :param notes: The text of each section to render above its table, defaults to none
+    :return: The control tables
+    """
+    sections: Dict[str, List[KeymapEntry]] = {}
+    for entry in entries:
+        sections.setdefault(entry.section, []).append(entry)
+    rendered = []
+    for section, section_entries in sections.items():
+        lines = [f"# {section}"]
+        if notes and notes.get(section):
+            lines.extend([notes[section], ""])
+        lines.extend(["| Action | Key |", "|---|---|"])
+        lines.extend(f"|{entry.action_name}|{entry.binding}|" for entry in section_entries)
+        rendered.append("\n".join(lines))
+    return "\n\n".join(rendered) + "\n"
+
+
+class KeymapRetriever:
+    """
+    Picks the keymap rows that are relevant to a command, so the keypress prompt does not carry the whole keymap
+
+    Rows are ranked with the fast path's `KeymapMatcher`, over every row including those only the LLM can perform,
+    and the best `top_k` are rendered along with the notes of their sections. When nothing matches well (e.g. "get
+    us out of here") the whole keymap is sent instead, so the LLM can still work out what was meant.
+    """
+    def __init__(
+            self,
+            top_k: int = 12,
+            min_score: float = 0.5,
+            entries: Optional[Iterable[KeymapEntry]] = None,
+    ):
+        """
+        Initialises the KeymapRetriever
+
+        :param top_k: How many rows to send at most, defaults to 12
+        :param min_score: The score the best row must reach for only the top rows to be sent, defaults to 0.5
+        :param entries: The rows to retrieve from, defaults to the Onboard IA keymap
+        """
+        self.top_k = top_k
+        self.min_score = min_score
+        self.entries = list(get_keymap() if entries is None else entries)
+        self.matcher = KeymapMatcher(entries=self.entries, executable_only=False)
+        self.notes = get_keymap_notes()
+        self.full_keymap = ONBOARD_IA_KEYMAP_TABLES if entries is None else render_keymap(self.entries, self.notes)
+        self._full_keymap_tokens: Optional[int] = None
+
+    def retrieve(self, command: str) -> str:
+        """
+        Render the rows relevant to a command
+
+        :param command: The transcribed command
+        :return: The control tables to put in the keypress prompt
+        """
+        ranked = self.matcher.rank(command, self.top_k)
+        if not ranked or ranked[0][1] < self.min_score:
+            LOGGER.debug(f"No keymap row matches {command!r} well, sending the whole keymap")
+            return self.full_keymap
+        selected = {entry for entry, _ in ranked}
+        # Keep the order of the keymap, related rows are next to each other
+        keymap = render_keymap([entry for entry in self.entries if entry in selected], self.notes)
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            self._log_tokens(command, len(selected), keymap)
+        return keymap
+
+    def _log_tokens(self, command: str, rows: int, keymap: str):
+        try:
+            if self._full_keymap_tokens is None:
+                self._full_keymap_tokens = count_tokens(self.full_keymap)
+            tokens = count_tokens(keymap)
+        except Exception as e:
+            # The encoding is downloaded on first use, which must not stop the command being performed
+            LOGGER.debug(f"Retrieved {rows} keymap rows for {command!r}, could not count their tokens: {e}")
+            return
+        LOGGER.debug(
+            f"Retrieved {rows} keymap rows for {command!r}: {tokens} tokens, instead of "
+            f"{self._full_keymap_tokens} for the whole keymap"
+        )
+
+    def transform(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        """Add the relevant keymap rows to a chain's inputs, for use in a `TransformChain`"""
+        return {"keymap": self.retrieve(str(inputs["input"]))}
+
+    async def atransform(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        return self.transform(inputs)
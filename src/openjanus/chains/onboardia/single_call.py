@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from langchain.callbacks.manager import AsyncCallbackManagerForChainRun, CallbackManagerForChainRun
+from langchain.chains.base import Chain
+from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder, SystemMessagePromptTemplate
+from langchain.schema import BasePromptTemplate
+from langchain.schema.language_model import BaseLanguageModel
+
+from openjanus.chains.onboardia.actions import ActionDispatcher, StreamingActionParser
+from openjanus.chains.onboardia.plan_cache import is_cacheable
+from openjanus.chains.onboardia.prompt import (
+    ONBOARD_IA_KEYMAP_TABLES,
+    ONBOARD_IA_KEYMAP_USER_PROMPT,
+    ONBOARD_IA_SINGLE_CALL_PROMPT,
+)
+from openjanus.tts.streaming import JsonFieldExtractor, SpeechStream
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _parse_response(text: str) -> str:
+    """Get the spoken response from a whole response, which may be wrapped in a markdown block"""
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        parsed = json.loads(text[start:end + 1], strict=False)
+    except ValueError as e:
+        LOGGER.error(f"Could not parse the Onboard IA response {text!r}", exc_info=e)
+        return ""
+    return parsed.get("response", "") if isinstance(parsed, dict) else ""
+
+
+def _speak(response: str):
+    if not response:
+        return
+    from openjanus.chains.base import get_tool as get_tts_tool
+    get_tts_tool().run({"query": response})
+
+
+class OnboardIaSingleCallChain(Chain):
+    """
+    Acts like an Onboard Ship IA with a single LLM call, which both picks the actions to perform and phrases the
+    spoken response
+
+    The response is streamed. Each action is performed as soon as it has been generated, while the rest of the
+    response is still being generated, and the spoken response is spoken a sentence at a time as it is generated,
+    while the actions are performed. With a plan cache, a command that was performed before is performed and
+    answered from the cache, without asking the LLM.
+    """
+    llm: BaseLanguageModel
+    prompt: BasePromptTemplate = ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(ONBOARD_IA_SINGLE_CALL_PROMPT),
+        MessagesPlaceholder(variable_name="chat_history", optional=True),
+        HumanMessagePromptTemplate.from_template(ONBOARD_IA_KEYMAP_USER_PROMPT),
+    ])
+    retriever: Optional[Any] = None
+    """A `KeymapRetriever` to pick the keymap rows to send, defaults to sending the whole keymap"""
+    plan_cache: Optional[Any] = None
+    """A `PlanCache` of the actions picked, and the responses given, for previous commands"""
+    speak: bool = True
+    stream_speech: bool = True
+    """Speak the response while it is generated, rather than once it is complete"""
+    min_sentence_chars: int = 20
+    """The shortest text to speak on its own, when streaming speech"""
+    input_key: str = "input"
+    output_key: str = "response"
+
+    @property
+    def input_keys(self) -> List[str]:
+        return [self.input_key]
+
+    @property
+    def output_keys(self) -> List[str]:
+        return [self.output_key]
+
+    def _messages(self, inputs: Dict[str, Any]) -> Any:
+        command = str(inputs[self.input_key])
+        keymap = ONBOARD_IA_KEYMAP_TABLES if self.retriever is None else self.retriever.retrieve(command)
+        return self.prompt.format_messages(
+            input=command,
+            keymap=keymap,
+            chat_history=inputs.get("chat_history", []),
+        )
+
+    def _cached_plan(self, inputs: Dict[str, Any]) -> Optional[Any]:
+        if self.plan_cache is None or not is_cacheable(str(inputs[self.input_key])):
+            return None
+        plan = self.plan_cache.get(str(inputs[self.input_key]))
+        return plan if plan is not None and plan.response else None
+
+    def _store_plan(self, inputs: Dict[str, Any], dispatcher: ActionDispatcher, response: str):
+        # Only plans that were performed without an error are worth replaying
+        if self.plan_cache is not None and response and is_cacheable(str(inputs[self.input_key])) and dispatcher.succeeded:
+            self.plan_cache.put(str(inputs[self.input_key]), dispatcher.actions, response)
+
+    def _speech_stream(self) -> Optional[SpeechStream]:
+        if not (self.speak and self.stream_speech):
+            return None
+        return SpeechStream(extractor=JsonFieldExtractor("response"), min_chars=self.min_sentence_chars)
+
+    def _finish_speech(self, speech: Optional[SpeechStream], response: str):
+        """Speak what is left of the response, or all of it if it could not be streamed"""
+        if speech is not None and speech.started:
+            speech.finish()
+        elif self.speak:
+            _speak(response)
+
+    def _call(
+            self,
+            inputs: Dict[str, Any],
+            run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        dispatcher = ActionDispatcher()
+        plan = self._cached_plan(inputs)
+        if plan is not None:
+            dispatcher.dispatch(plan.actions)
+            if self.speak:
+                _speak(plan.response)
+            LOGGER.debug(dispatcher.wait())
+            return {self.output_key: plan.response}
+        callbacks = run_manager.get_child() if run_manager else None
+        text = ""
+        parser = StreamingActionParser()
+        speech = self._speech_stream()
+        try:
+            for chunk in self.llm.stream(self._messages(inputs), config={"callbacks": callbacks}):
+                text += chunk.content
+                dispatcher.dispatch(parser.feed(chunk.content))
+                if speech is not None:
+                    speech.feed(chunk.content)
+        except BaseException:
+            # The rest of the response never arrives, whatever was already queued is still spoken
+            if speech is not None:
+                speech.abort()
+            raise
+        dispatcher.dispatch(parser.close())
+        response = _parse_response(text)
+        self._finish_speech(speech, response)
+        LOGGER.debug(dispatcher.wait())
+        self._store_plan(inputs, dispatcher, response)
+        return {self.output_key: response}
+
+    async def _acall(
+            self,
+            inputs: Dict[str, Any],
+            run_manager: Optional[AsyncCallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        dispatcher = ActionDispatcher()
+        plan = self._cached_plan(inputs)
+        if plan is not None:
+            dispatcher.dispatch(plan.actions)
+            if self.speak:
+                await asyncio.get_running_loop().run_in_executor(None, _speak, plan.response)
+            LOGGER.debug(await dispatcher.await_all())
+            return {self.output_key: plan.response}
+        callbacks = run_manager.get_child() if run_manager else None
+        text = ""
+        parser = StreamingActionParser()
+        speech = self._speech_stream()
+        try:
+            async for chunk in self.llm.astream(self._messages(inputs), config={"callbacks": callbacks}):
+                text += chunk.content
+                dispatcher.dispatch(parser.feed(chunk.content))
+                if speech is not None:
+                    speech.feed(chunk.content)
+        except BaseException:
+            # Failed, or interrupted by the listen key, so the rest of the response never arrives
+            if speech is not None:
+                speech.abort()
+            raise
+        dispatcher.dispatch(parser.close())
+        response = _parse_response(text)
+        await asyncio.get_running_loop().run_in_executor(None, self._finish_speech, speech, response)
+        LOGGER.debug(await dispatcher.await_all())
+        self._store_plan(inputs, dispatcher, response)
+        return {self.output_key: response}
+
+    @property
+    def _chain_type(self) -> str:
+        return "openjanus_onboard_ia_single_call"
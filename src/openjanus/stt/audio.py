@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from functools import lru_cache
+import io
+import logging
+from math import gcd
+import wave
+
+import numpy as np
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Whisper resamples everything to 16kHz mono, so there is no point uploading more than that
+WHISPER_SAMPLE_RATE = 16000
+
+MIME_TYPES = {
+    "wav": "audio/wav",
+    "flac": "audio/flac",
+}
+
+
+@lru_cache(maxsize=8)
+def _lowpass_taps(source_rate: int, target_rate: int, num_taps: int = 63) -> np.ndarray:
+    """A windowed-sinc low-pass filter that removes everything the target rate cannot represent"""
+    cutoff = 0.5 * target_rate / source_rate * 0.95  # As a fraction of the source sample rate, with some headroom
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(num_taps)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+def resample_pcm16(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Resample mono 16 bit PCM audio
+
+    :param samples: The samples to resample
+    :param source_rate: The sample rate of `samples`
+    :param target_rate: The sample rate to resample to
+    :return: The resampled samples
+    """
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    signal = samples.astype(np.float32)
+    if target_rate < source_rate:
+        signal = np.convolve(signal, _lowpass_taps(source_rate, target_rate), mode="same")
+    divisor = gcd(source_rate, target_rate)
+    num_samples = len(samples) * (target_rate // divisor) // (source_rate // divisor)
+    positions = np.arange(num_samples, dtype=np.float64) * (source_rate / target_rate)
+    resampled = np.interp(positions, np.arange(len(signal)), signal)
+    return np.clip(np.rint(resampled), -32768, 32767).astype(np.int16)
+
+
+def encode_pcm16(samples: np.ndarray, rate: int, codec: str = "wav") -> bytes:
+    """
+    Encode mono 16 bit PCM audio in-process
+
+    :param samples: The samples to encode
+    :param rate: The sample rate of `samples`
+    :param codec: Either `wav` or `flac`, defaults to `wav`. `flac` requires `soundfile`
+    :return: The encoded audio
+    """
+    output = io.BytesIO()
+    if codec == "wav":
+        with wave.open(output, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(rate)
+            wav_file.writeframes(samples.tobytes())
+    elif codec == "flac":
+        try:
+            import soundfile
+        except ImportError:
+            raise ImportError(
+                "soundfile package not found, please install it with `pip install soundfile`, or set "
+                "`upload_codec` to `wav`"
+            )
+        soundfile.write(output, samples, rate, format="FLAC", subtype="PCM_16")
+    else:
+        raise ValueError(f"Unsupported upload codec {codec}")
+    return output.getvalue()
+
+
+@dataclass
+class AudioClip:
+    """A captured utterance, as mono 16 bit PCM samples held in memory"""
+    samples: np.ndarray
+    rate: int
+
+    @classmethod
+    def from_pcm16(cls, data, rate: int, channels: int = 1) -> "AudioClip":
+        """
+        Wrap raw 16 bit PCM audio, without copying it if it is already mono
+
+        :param data: A bytes-like object of interleaved 16 bit PCM audio
+        :param rate: The sample rate of the audio
+        :param channels: The number of interleaved channels, defaults to 1
+        :return: The clip
+        """
+        samples = np.frombuffer(data, dtype=np.int16)
+        if channels > 1:
+            samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1).astype(np.int16)
+        return cls(samples=samples, rate=rate)
+
+    @property
+    def duration(self) -> float:
+        """The duration of the clip, in seconds"""
+        return len(self.samples) / self.rate
+
+    def resample(self, rate: int) -> "AudioClip":
+        """
+        Resample the clip
+
+        :param rate: The sample rate to resample to
+        :return: The resampled clip, or this clip if it is already at that rate
+        """
+        if rate == self.rate:
+            return self
+        return AudioClip(samples=resample_pcm16(self.samples, self.rate, rate), rate=rate)
+
+    def encode(self, codec: str = "wav") -> bytes:
+        """
+        Encode the clip
+
+        :param codec: Either `wav` or `flac`, defaults to `wav`
+        :return: The encoded clip
+        """
+        return encode_pcm16(self.samples, self.rate, codec)
@@ -0,0 +1,56 @@
+from abc import ABC, abstractmethod
+import asyncio
+from functools import lru_cache
+import logging
+from typing import Union
+
+import openjanus.app.config as openjanus_config
+from openjanus.stt.audio import AudioClip
+from openjanus.utils.exceptions import SttNotImplementedException
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SttBackend(ABC):
+    """Turns a recording into text"""
+    name: str = ""
+
+    @abstractmethod
+    def transcribe(self, recording: Union[str, AudioClip]) -> str:
+        """
+        Transcribe a recording
+
+        :param recording: Either a recording in memory, or the path of an audio file
+        :return: The transcription, an empty string if nothing could be transcribed
+        """
+
+    async def atranscribe(self, recording: Union[str, AudioClip]) -> str:
+        """
+        Transcribe a recording without blocking the event loop. Runs `transcribe` in the default executor unless the
+        backend is natively async
+
+        :param recording: Either a recording in memory, or the path of an audio file
+        :return: The transcription, an empty string if nothing could be transcribed
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self.transcribe, recording)
+
+
+@lru_cache(maxsize=None)
+def get_stt_backend() -> SttBackend:
+    """
+    Get the backend for the configured STT engine. It is created once, so local models stay loaded between utterances
+
+    :return: The STT backend
+    """
+    stt_engine = openjanus_config.get_stt_engine()
+    if stt_engine.lower() == "openai":
+        from openjanus.stt.whisper.backend import OpenAIWhisperBackend
+        backend: SttBackend = OpenAIWhisperBackend()
+    elif stt_engine.lower() == "local":
+        from openjanus.stt.faster_whisper.backend import FasterWhisperBackend
+        backend = FasterWhisperBackend()
+    else:
+        raise SttNotImplementedException(stt_engine)
+    LOGGER.info(f"Using the {backend.name} STT backend")
+    return backend
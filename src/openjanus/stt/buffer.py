@@ -0,0 +1,128 @@
+import logging
+from typing import Optional
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AudioRingBuffer:
+    """
+    A fixed size, pre-allocated buffer of raw PCM audio
+
+    Writing never allocates, so it is safe to call from an audio callback. When the buffer is full it either drops
+    new audio (the default, for capping the length of an utterance) or overwrites the oldest audio (`overwrite=True`,
+    for keeping a rolling window of the most recent audio).
+    """
+    def __init__(self, capacity: int, rate: int, channels: int = 1, sample_width: int = 2, overwrite: bool = False):
+        """
+        Initialises the AudioRingBuffer
+
+        :param capacity: The size of the buffer in bytes, rounded down to a whole number of frames
+        :param rate: The sample rate of the audio
+        :param channels: The number of interleaved channels, defaults to 1
+        :param sample_width: The size of a sample in bytes, defaults to 2 (16 bit PCM)
+        :param overwrite: Whether to overwrite the oldest audio once full, defaults to False
+        """
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frame_size = channels * sample_width
+        self.capacity = capacity - capacity % self.frame_size
+        self.overwrite = overwrite
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+        self._scratch: Optional[bytearray] = None
+        self._position = 0
+        self._wrapped = False
+        self.truncated = False
+
+    @classmethod
+    def for_duration(cls, seconds: float, rate: int, channels: int = 1, sample_width: int = 2, overwrite: bool = False) -> "AudioRingBuffer":
+        """
+        Create a buffer that holds a given duration of audio
+
+        :param seconds: How many seconds of audio the buffer holds
+        :param rate: The sample rate of the audio
+        :param channels: The number of interleaved channels, defaults to 1
+        :param sample_width: The size of a sample in bytes, defaults to 2 (16 bit PCM)
+        :param overwrite: Whether to overwrite the oldest audio once full, defaults to False
+        :return: The buffer
+        """
+        return cls(int(seconds * rate) * channels * sample_width, rate, channels, sample_width, overwrite)
+
+    def __len__(self) -> int:
+        """The number of bytes of audio held"""
+        return self.capacity if self._wrapped else self._position
+
+    @property
+    def duration(self) -> float:
+        """The duration of the audio held, in seconds"""
+        return len(self) / (self.frame_size * self.rate)
+
+    def clear(self):
+        """Forget all audio held, without releasing the memory"""
+        self._position = 0
+        self._wrapped = False
+        self.truncated = False
+
+    def write(self, data) -> int:
+        """
+        Write audio into the buffer
+
+        :param data: A bytes-like object of raw PCM audio
+        :return: The number of bytes that were kept
+        """
+        data = memoryview(data).cast('B')
+        size = len(data)
+        if not self.overwrite:
+            size = min(size, self.capacity - self._position)
+            if size < len(data) and not self.truncated:
+                self.truncated = True
+                LOGGER.warning(f"Audio buffer is full, dropping audio after {self.capacity / (self.frame_size * self.rate):.1f}s")
+            self._view[self._position:self._position + size] = data[:size]
+            self._position += size
+            return size
+
+        if size >= self.capacity:
+            # Only the most recent audio fits
+            self._view[:] = data[size - self.capacity:]
+            self._position = 0
+            self._wrapped = True
+            return self.capacity
+        tail = min(size, self.capacity - self._position)
+        self._view[self._position:self._position + tail] = data[:tail]
+        if tail < size:
+            self._view[:size - tail] = data[tail:]
+            self._wrapped = True
+        self._position = (self._position + size) % self.capacity
+        if self._position == 0 and size:
+            self._wrapped = True
+        return size
+
+    def view(self) -> memoryview:
+        """
+        Get the audio held, oldest first
+
+        This is zero-copy unless the buffer has wrapped around, in which case the audio is laid out into a second,
+        pre-allocated buffer. The view is only valid until the next write.
+
+        :return: A read-only byte view of the audio
+        """
+        if not self._wrapped:
+            return self._view[:self._position].toreadonly()
+        if self._position == 0:
+            return self._view.toreadonly()
+        if self._scratch is None:
+            self._scratch = bytearray(self.capacity)
+        head = self.capacity - self._position
+        self._scratch[:head] = self._view[self._position:]
+        self._scratch[head:] = self._view[:self._position]
+        return memoryview(self._scratch).toreadonly()
+
+    def samples(self) -> memoryview:
+        """
+        Get the audio held as 16 bit samples, oldest first. See `view`
+
+        :return: A read-only view of signed 16 bit samples
+        """
+        return self.view().cast('h')
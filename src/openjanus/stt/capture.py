@@ -0,0 +1,197 @@
+import logging
+import threading
+from typing import Callable, List, Optional
+
+import pyaudio
+
+from openjanus.stt.audio import AudioClip
+from openjanus.stt.buffer import AudioRingBuffer
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AudioCaptureWorker:
+    """
+    Keeps one input stream open for the lifetime of the application
+
+    The stream always fills a short pre-roll, so speech that starts just before the listen key goes down is kept.
+    Marking the start and end of an utterance only swaps buffers under a lock, so it is cheap enough to do from an OS
+    input hook. The worker thread owns the PyAudio instance, and pre-allocates the buffer for the next utterance so
+    that `mark_start` does not have to.
+    """
+    def __init__(
+            self,
+            rate: int,
+            channels: int = 1,
+            format: int = pyaudio.paInt16,
+            chunk: int = 2048,
+            input_device_index: Optional[int] = None,
+            preroll_ms: int = 300,
+            max_utterance_seconds: float = 120,
+    ):
+        """
+        Initialises the AudioCaptureWorker. Nothing is opened until `start` is called
+
+        :param rate: The sample rate to capture at
+        :param channels: The number of channels to capture, defaults to 1
+        :param format: The PyAudio sample format, defaults to 16 bit PCM
+        :param chunk: The number of frames per buffer the stream delivers, defaults to 2048
+        :param input_device_index: The input device to capture from, defaults to the system default
+        :param preroll_ms: How much audio from before `mark_start` to keep, in milliseconds, defaults to 300
+        :param max_utterance_seconds: The longest utterance to capture, defaults to 120
+        """
+        self.rate = rate
+        self.channels = channels
+        self.format = format
+        self.chunk = chunk
+        self.input_device_index = input_device_index
+        self.sample_width = pyaudio.get_sample_size(format)
+        self.max_utterance_seconds = max_utterance_seconds
+        self.preroll = AudioRingBuffer.for_duration(
+            seconds=preroll_ms / 1000,
+            rate=rate,
+            channels=channels,
+            sample_width=self.sample_width,
+            overwrite=True,
+        )
+        self._lock = threading.Lock()
+        self._utterance: Optional[AudioRingBuffer] = None
+        self._spare: Optional[AudioRingBuffer] = None
+        self._replenish = threading.Event()
+        self._stopping = threading.Event()
+        self._ready = threading.Event()
+        self._error: Optional[Exception] = None
+        self._thread: Optional[threading.Thread] = None
+        self._consumers: List[Callable[[bytes], None]] = []
+
+    @property
+    def is_capturing(self) -> bool:
+        """Whether an utterance is being captured"""
+        return self._utterance is not None
+
+    def _allocate_buffer(self) -> AudioRingBuffer:
+        return AudioRingBuffer.for_duration(
+            seconds=self.max_utterance_seconds + self.preroll.capacity / (self.preroll.frame_size * self.rate),
+            rate=self.rate,
+            channels=self.channels,
+            sample_width=self.sample_width,
+        )
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        with self._lock:
+            self.preroll.write(in_data)
+            if self._utterance is not None:
+                self._utterance.write(in_data)
+        for consumer in self._consumers:
+            consumer(in_data)
+        return (None, pyaudio.paContinue)
+
+    def _run(self):
+        audio = None
+        stream = None
+        try:
+            audio = pyaudio.PyAudio()
+            stream = audio.open(
+                format=self.format,
+                channels=self.channels,
+                rate=self.rate,
+                input=True,
+                frames_per_buffer=self.chunk,
+                input_device_index=self.input_device_index,
+                stream_callback=self._callback,
+            )
+            stream.start_stream()
+            self._spare = self._allocate_buffer()
+        except Exception as e:
+            self._error = e
+            LOGGER.error("Failed to open the audio input stream", exc_info=e)
+            return
+        finally:
+            self._ready.set()
+
+        LOGGER.info(f"Audio input stream open on {'the default device' if self.input_device_index is None else f'device {self.input_device_index}'}")
+        try:
+            while not self._stopping.is_set():
+                if self._replenish.wait(timeout=0.5):
+                    self._replenish.clear()
+                    if self._spare is None:
+                        self._spare = self._allocate_buffer()
+        finally:
+            stream.stop_stream()
+            stream.close()
+            audio.terminate()
+            LOGGER.debug("Audio input stream closed")
+
+    def start(self):
+        """Open the input stream on the worker thread, and wait until it is capturing"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="openjanus-audio-capture", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        """Close the input stream"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._replenish.set()
+        self._thread.join()
+        self._thread = None
+
+    def add_consumer(self, consumer: Callable[[bytes], None]):
+        """
+        Receive every chunk of captured audio. Consumers are called from the audio thread, so must return quickly
+
+        :param consumer: Called with each chunk of raw PCM audio
+        """
+        self._consumers.append(consumer)
+
+    def remove_consumer(self, consumer: Callable[[bytes], None]):
+        if consumer in self._consumers:
+            self._consumers.remove(consumer)
+
+    def mark_start(self):
+        """Start capturing an utterance, beginning with the pre-roll"""
+        buffer = self._spare
+        self._spare = None
+        if buffer is None:
+            # Only when utterances follow each other faster than the worker can replace the buffer
+            buffer = self._allocate_buffer()
+        else:
+            buffer.clear()
+        with self._lock:
+            buffer.write(self.preroll.view())
+            self._utterance = buffer
+        self._replenish.set()
+
+    def snapshot(self) -> Optional[AudioClip]:
+        """
+        Get the utterance captured so far, without stopping the capture
+
+        :return: The utterance so far, or None if no utterance is being captured
+        """
+        with self._lock:
+            buffer = self._utterance
+            if buffer is None:
+                return None
+            # Audio already in an utterance buffer is never overwritten, so this view stays valid as capture continues
+            view = buffer.view()
+        return AudioClip.from_pcm16(view, rate=self.rate, channels=self.channels)
+
+    def mark_end(self) -> Optional[AudioClip]:
+        """
+        Stop capturing the current utterance
+
+        :return: The utterance, including its pre-roll, or None if no utterance was being captured
+        """
+        with self._lock:
+            buffer = self._utterance
+            self._utterance = None
+        if buffer is None:
+            return None
+        # The clip keeps the buffer's memory, the next utterance goes into the spare buffer
+        return AudioClip.from_pcm16(buffer.view(), rate=self.rate, channels=self.channels)
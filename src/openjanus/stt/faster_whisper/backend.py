@@ -0,0 +1,60 @@
+import logging
+import threading
+from typing import Union
+
+import numpy as np
+
+from openjanus.app.config import LocalSttSettings, get_config
+from openjanus.stt.audio import AudioClip, WHISPER_SAMPLE_RATE
+from openjanus.stt.base import SttBackend
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class FasterWhisperBackend(SttBackend):
+    """
+    Transcribes locally with faster-whisper. The model is loaded once, when the backend is created, and kept in memory
+    """
+    name = "local"
+
+    def __init__(self, settings: Union[LocalSttSettings, None] = None):
+        """
+        Initialises the FasterWhisperBackend, and loads the model
+
+        :param settings: The local STT settings, defaults to the `[stt.local]` section of the config
+        """
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise ImportError(
+                "faster_whisper package not found, please install it with `pip install faster-whisper`, or set "
+                "`stt_engine` to `openai`"
+            )
+        self.settings = settings if settings is not None else get_config().local_stt
+        LOGGER.info(f"Loading the {self.settings.model} whisper model on {self.settings.device}")
+        self.model = WhisperModel(
+            self.settings.model,
+            device=self.settings.device,
+            compute_type=self.settings.compute_type,
+            cpu_threads=self.settings.cpu_threads,
+        )
+        # The model is not safe to run from several threads at once
+        self._lock = threading.Lock()
+
+    def transcribe(self, recording: Union[str, AudioClip]) -> str:
+        if isinstance(recording, AudioClip):
+            # faster-whisper takes 16kHz float samples as-is, so nothing needs to be encoded
+            audio = recording.resample(WHISPER_SAMPLE_RATE).samples.astype(np.float32) / 32768.0
+        else:
+            audio = recording
+        with self._lock:
+            segments, _ = self.model.transcribe(
+                audio,
+                language=self.settings.language or None,
+                beam_size=self.settings.beam_size,
+                condition_on_previous_text=False,
+            )
+            transcription = ''.join(segment.text for segment in segments).strip()
+        LOGGER.debug(f"Transcription: {transcription}")
+        return transcription
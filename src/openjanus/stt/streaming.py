@@ -0,0 +1,179 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from openjanus.stt.audio import AudioClip
+from openjanus.stt.base import SttBackend
+from openjanus.stt.capture import AudioCaptureWorker
+from openjanus.stt.vad import EnergyVad, frame_features
+
+
+LOGGER = logging.getLogger(__name__)
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_transcription_executor() -> ThreadPoolExecutor:
+    """Get the thread pool that streaming transcription runs on, shared by every utterance"""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="openjanus-stt")
+        return _EXECUTOR
+
+
+class StreamingTranscription:
+    """The transcription of an utterance that was streamed while it was being recorded"""
+    def __init__(self, clip: AudioClip, future: "Future[str]"):
+        """
+        :param clip: The whole utterance
+        :param future: Resolves to the transcription of the whole utterance
+        """
+        self.clip = clip
+        self.future = future
+
+
+class StreamingTranscriber:
+    """
+    Transcribes an utterance in windows while it is still being recorded
+
+    Every `window_seconds` of new audio is committed, cut at the quietest point near the end of the window so words
+    are not split, and transcribed in the background. Windows without speech are skipped. When the utterance ends
+    only the tail after the last committed window is left to transcribe.
+    """
+    def __init__(
+            self,
+            capture: AudioCaptureWorker,
+            backend: SttBackend,
+            upload_sample_rate: int,
+            window_seconds: float = 3.0,
+            vad: Optional[EnergyVad] = None,
+            poll_interval: float = 0.2,
+    ):
+        """
+        Initialises the StreamingTranscriber
+
+        :param capture: The capture worker recording the utterance
+        :param backend: The STT backend to transcribe windows with
+        :param upload_sample_rate: The sample rate to resample windows to before transcribing them
+        :param window_seconds: How much new audio to wait for before committing a window, defaults to 3
+        :param vad: Used to skip windows without any speech, defaults to transcribing every window
+        :param poll_interval: How often to check for new audio, in seconds, defaults to 0.2
+        """
+        self.capture = capture
+        self.backend = backend
+        self.upload_sample_rate = upload_sample_rate
+        self.window_seconds = window_seconds
+        self.vad = vad
+        self.poll_interval = poll_interval
+        self._committed = 0
+        self._futures: List["Future[str]"] = []
+        self._stopping = threading.Event()
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def partial_transcript(self) -> str:
+        """The transcription of the windows finished so far, up to the first one still in progress"""
+        texts = []
+        for future in list(self._futures):
+            if not future.done() or future.cancelled():
+                break
+            texts.append(future.result())
+        return self._join(texts)
+
+    @staticmethod
+    def _join(texts: List[str]) -> str:
+        return ' '.join(text.strip() for text in texts if text and text.strip())
+
+    def _transcribe_window(self, clip: AudioClip) -> str:
+        # Whisper tends to hallucinate words from silence, so windows that never get loud enough to be speech are
+        # skipped. A window can be all speech, so only the absolute threshold is used, not the noise floor
+        if self.vad is not None:
+            rms_db, _ = frame_features(clip.samples, self.vad.frame_length(clip.rate))
+            if not np.any(rms_db > self.vad.settings.energy_threshold_db):
+                return ""
+        try:
+            return self.backend.transcribe(clip.resample(self.upload_sample_rate))
+        except Exception as e:
+            LOGGER.error("Failed to transcribe a window of the utterance", exc_info=e)
+            return ""
+
+    def _find_cut(self, samples: np.ndarray, end: int) -> int:
+        """Find the quietest point in the last part of a window, so the cut does not land in the middle of a word"""
+        frame_length = max(1, self.capture.rate // 50)  # 20ms frames
+        search_start = max(self._committed, end - self.capture.rate // 2)
+        rms_db, _ = frame_features(samples[search_start:end], frame_length)
+        if len(rms_db) == 0:
+            return end
+        return search_start + int(np.argmin(rms_db)) * frame_length + frame_length // 2
+
+    def _commit(self, clip: AudioClip, end: int):
+        window = AudioClip(samples=clip.samples[self._committed:end], rate=clip.rate)
+        LOGGER.debug(f"Committing a {window.duration:.2f}s window for transcription")
+        future = get_transcription_executor().submit(self._transcribe_window, window)
+        self._futures.append(future)
+        future.add_done_callback(self._log_partial_transcript)
+        self._committed = end
+
+    def _log_partial_transcript(self, future: "Future[str]"):
+        if not self._cancelled and not future.cancelled():
+            LOGGER.info(f"Heard so far: {self.partial_transcript!r}")
+
+    def _run(self):
+        window_samples = int(self.window_seconds * self.capture.rate)
+        while not self._stopping.wait(self.poll_interval):
+            clip = self.capture.snapshot()
+            if clip is None:
+                continue
+            with self._lock:
+                if self._stopping.is_set():
+                    break
+                if len(clip.samples) - self._committed >= window_samples:
+                    self._commit(clip, self._find_cut(clip.samples, self._committed + window_samples))
+
+    def start(self):
+        """Start committing windows of the utterance as they are recorded"""
+        self._thread = threading.Thread(target=self._run, name="openjanus-streaming-stt", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stop streaming, and throw away the utterance, e.g. because there was no speech in it"""
+        with self._lock:
+            self._stopping.set()
+            self._cancelled = True
+            for future in self._futures:
+                future.cancel()
+
+    def finish(self, clip: AudioClip) -> StreamingTranscription:
+        """
+        Stop streaming, and transcribe the rest of the utterance
+
+        :param clip: The whole utterance, see `AudioCaptureWorker.mark_end`
+        :return: The transcription of the whole utterance
+        """
+        # Called from the input hook, so this does not wait for the streaming thread, only for any commit in progress
+        with self._lock:
+            self._stopping.set()
+            if self._committed < len(clip.samples):
+                self._commit(clip, len(clip.samples))
+            futures = list(self._futures)
+        result: "Future[str]" = Future()
+        lock = threading.Lock()
+
+        def gather(_):
+            with lock:
+                if all(future.done() for future in futures) and not result.done():
+                    result.set_result(self._join([future.result() for future in futures]))
+
+        for future in futures:
+            future.add_done_callback(gather)
+        if not futures:
+            result.set_result("")
+        LOGGER.debug(f"Utterance finished, {len(futures)} window(s) committed")
+        return StreamingTranscription(clip=clip, future=result)
@@ -0,0 +1,252 @@
+from dataclasses import dataclass
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from openjanus.app.config import VadSettings, get_config
+from openjanus.stt.audio import AudioClip
+
+
+LOGGER = logging.getLogger(__name__)
+
+# The quietest level a frame is given, so that digital silence does not produce -inf
+SILENCE_FLOOR_DB = -100.0
+
+
+def frame_features(samples: np.ndarray, frame_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Measure the loudness and zero crossing rate of each whole frame of audio
+
+    :param samples: Mono 16 bit PCM samples. A trailing partial frame is ignored
+    :param frame_length: The number of samples per frame
+    :return: The RMS level of each frame in dBFS, and the fraction of samples in each frame that cross zero
+    """
+    num_frames = len(samples) // frame_length
+    if num_frames == 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+    frames = samples[:num_frames * frame_length].reshape(num_frames, frame_length).astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    rms_db = np.maximum(20 * np.log10(np.maximum(rms, 1e-10)), SILENCE_FLOOR_DB)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1)
+    return rms_db, zcr
+
+
+@dataclass
+class VadResult:
+    """The outcome of running the VAD over an utterance"""
+    clip: Optional[AudioClip]
+    original_ms: float
+    speech_ms: float
+
+    @property
+    def trimmed_ms(self) -> float:
+        """How much audio was removed, in milliseconds"""
+        kept_ms = 0.0 if self.clip is None else self.clip.duration * 1000
+        return self.original_ms - kept_ms
+
+    @property
+    def has_speech(self) -> bool:
+        return self.clip is not None
+
+
+class EnergyVad:
+    """
+    Finds speech in an utterance from the loudness of each frame, and trims the silence around it
+
+    A frame is speech when it is louder than both the absolute threshold and the utterance's own noise floor plus a
+    margin. Quieter frames with a high zero crossing rate (fricatives like "s" and "f") count as speech as long as they
+    are within half the margin of that threshold.
+    """
+    def __init__(self, settings: Optional[VadSettings] = None):
+        """
+        Initialises the EnergyVad
+
+        :param settings: The VAD settings, defaults to the `[audio.vad]` section of the config
+        """
+        self.settings = settings if settings is not None else get_config().vad
+
+    def frame_length(self, rate: int) -> int:
+        return max(1, rate * self.settings.frame_ms // 1000)
+
+    def speech_mask(self, rms_db: np.ndarray, zcr: np.ndarray, noise_floor_db: Optional[float] = None) -> np.ndarray:
+        """
+        Classify frames as speech or not
+
+        :param rms_db: The level of each frame, see `frame_features`
+        :param zcr: The zero crossing rate of each frame, see `frame_features`
+        :param noise_floor_db: The level of the background noise, defaults to estimating it from these frames
+        :return: A boolean mask of the frames that are speech
+        """
+        if len(rms_db) == 0:
+            return np.zeros(0, dtype=bool)
+        if noise_floor_db is None:
+            noise_floor_db = float(np.percentile(rms_db, 10))
+        threshold = max(self.settings.energy_threshold_db, noise_floor_db + self.settings.noise_margin_db)
+        voiced = rms_db > threshold
+        unvoiced = (zcr > self.settings.zcr_threshold) & (rms_db > threshold - self.settings.noise_margin_db / 2)
+        return voiced | unvoiced
+
+    def process(self, clip: AudioClip) -> VadResult:
+        """
+        Trim the silence around the speech in an utterance
+
+        :param clip: The utterance
+        :return: The trimmed utterance, or no clip if it had less speech than `min_speech_ms`
+        """
+        original_ms = clip.duration * 1000
+        frame_length = self.frame_length(clip.rate)
+        frame_ms = frame_length * 1000 / clip.rate
+        rms_db, zcr = frame_features(clip.samples, frame_length)
+        speech_frames = np.flatnonzero(self.speech_mask(rms_db, zcr))
+        speech_ms = len(speech_frames) * frame_ms
+        if speech_ms < self.settings.min_speech_ms:
+            return VadResult(clip=None, original_ms=original_ms, speech_ms=speech_ms)
+
+        padding_frames = int(round(self.settings.padding_ms / frame_ms))
+        start = max(0, speech_frames[0] - padding_frames) * frame_length
+        end = min(len(clip.samples), (speech_frames[-1] + 1 + padding_frames) * frame_length)
+        trimmed = AudioClip(samples=clip.samples[start:end], rate=clip.rate)
+        return VadResult(clip=trimmed, original_ms=original_ms, speech_ms=speech_ms)
+
+
+class VadSegmenter:
+    """
+    Splits a continuous stream of audio into utterances, in constant memory
+
+    Audio is fed in as it is captured. A segment starts at the first speech frame (plus up to `padding_ms` of the audio
+    before it), and ends once there has been `min_gap_ms` of silence, keeping `hangover_ms` of that silence. Segments
+    with less than `min_speech_ms` of speech are dropped, and segments longer than `max_utterance_seconds` are cut.
+    """
+    def __init__(self, rate: int, settings: Optional[VadSettings] = None, max_utterance_seconds: Optional[float] = None):
+        """
+        Initialises the VadSegmenter
+
+        :param rate: The sample rate of the audio that will be fed in
+        :param settings: The VAD settings, defaults to the `[audio.vad]` section of the config
+        :param max_utterance_seconds: The longest segment, defaults to `max_utterance_seconds` from the config
+        """
+        self.vad = EnergyVad(settings)
+        self.settings = self.vad.settings
+        self.rate = rate
+        if max_utterance_seconds is None:
+            max_utterance_seconds = get_config().audio.max_utterance_seconds
+        self.frame_length = self.vad.frame_length(rate)
+        frame_ms = self.frame_length * 1000 / rate
+        self.min_gap_frames = max(1, int(round(self.settings.min_gap_ms / frame_ms)))
+        self.hangover_frames = min(self.min_gap_frames, int(round(self.settings.hangover_ms / frame_ms)))
+        self.min_speech_frames = int(np.ceil(self.settings.min_speech_ms / frame_ms))
+        self.max_segment_frames = int(max_utterance_seconds * 1000 / frame_ms)
+        padding_frames = int(round(self.settings.padding_ms / frame_ms))
+
+        # Every buffer is allocated once, up front
+        self._preroll = np.zeros(padding_frames * self.frame_length, dtype=np.int16)
+        self._preroll_frames = 0
+        self._segment = np.zeros((self.max_segment_frames + padding_frames) * self.frame_length, dtype=np.int16)
+        self._remainder = np.zeros(self.frame_length, dtype=np.int16)
+        self._remainder_length = 0
+        # Start off assuming the quietest level that would not count as speech
+        self.noise_floor_db = self.settings.energy_threshold_db - self.settings.noise_margin_db
+        self._reset_segment()
+
+    def _reset_segment(self):
+        self.in_segment = False
+        self._segment_length = 0
+        self._segment_frames = 0
+        self._speech_frames = 0
+        self._silent_frames = 0
+        self._speech_end = 0
+
+    def _push_preroll(self, frame: np.ndarray):
+        if len(self._preroll) == 0:
+            return
+        self._preroll[:-self.frame_length] = self._preroll[self.frame_length:]
+        self._preroll[-self.frame_length:] = frame
+        self._preroll_frames = min(self._preroll_frames + 1, len(self._preroll) // self.frame_length)
+
+    def _append(self, frame: np.ndarray):
+        self._segment[self._segment_length:self._segment_length + len(frame)] = frame
+        self._segment_length += len(frame)
+        self._segment_frames += 1
+
+    def _finish_segment(self) -> Optional[AudioClip]:
+        clip = None
+        if self._speech_frames >= self.min_speech_frames:
+            end = min(self._segment_length, self._speech_end + self.hangover_frames * self.frame_length)
+            # Copied out, the segment buffer is reused for the next segment
+            clip = AudioClip(samples=self._segment[:end].copy(), rate=self.rate)
+        else:
+            LOGGER.debug(f"Dropping a segment with only {self._speech_frames} frames of speech")
+        self._reset_segment()
+        self._preroll_frames = 0
+        return clip
+
+    def feed(self, samples: np.ndarray) -> List[AudioClip]:
+        """
+        Feed captured audio into the segmenter
+
+        :param samples: Mono 16 bit PCM samples, following on from the last call
+        :return: Any segments that ended within this audio
+        """
+        if self._remainder_length:
+            needed = self.frame_length - self._remainder_length
+            self._remainder[self._remainder_length:self._remainder_length + min(needed, len(samples))] = samples[:needed]
+            self._remainder_length += min(needed, len(samples))
+            samples = samples[needed:]
+            if self._remainder_length < self.frame_length:
+                return []
+            segments = self._process(self._remainder)
+            self._remainder_length = 0
+        else:
+            segments = []
+        whole = len(samples) - len(samples) % self.frame_length
+        if whole:
+            segments.extend(self._process(samples[:whole]))
+        leftover = len(samples) - whole
+        if leftover:
+            self._remainder[:leftover] = samples[whole:]
+            self._remainder_length = leftover
+        return segments
+
+    def flush(self) -> Optional[AudioClip]:
+        """
+        End the current segment, if any, e.g. when capture is stopped
+
+        :return: The segment, if it had enough speech in it
+        """
+        if not self.in_segment:
+            return None
+        return self._finish_segment()
+
+    def _process(self, samples: np.ndarray) -> List[AudioClip]:
+        segments = []
+        rms_db, zcr = frame_features(samples, self.frame_length)
+        speech = self.vad.speech_mask(rms_db, zcr, noise_floor_db=self.noise_floor_db)
+        for index in range(len(rms_db)):
+            frame = samples[index * self.frame_length:(index + 1) * self.frame_length]
+            if not speech[index]:
+                # Track the background noise, slowly, so that a noisy cockpit does not count as speech
+                self.noise_floor_db += 0.05 * (float(rms_db[index]) - self.noise_floor_db)
+            if not self.in_segment:
+                if speech[index]:
+                    self.in_segment = True
+                    preroll_length = self._preroll_frames * self.frame_length
+                    if preroll_length:
+                        self._segment[:preroll_length] = self._preroll[len(self._preroll) - preroll_length:]
+                        self._segment_length = preroll_length
+                else:
+                    self._push_preroll(frame)
+                    continue
+            self._append(frame)
+            if speech[index]:
+                self._speech_frames += 1
+                self._silent_frames = 0
+                self._speech_end = self._segment_length
+            else:
+                self._silent_frames += 1
+            if self._silent_frames >= self.min_gap_frames or self._segment_frames >= self.max_segment_frames:
+                clip = self._finish_segment()
+                if clip is not None:
+                    segments.append(clip)
+        return segments
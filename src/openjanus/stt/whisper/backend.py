@@ -0,0 +1,50 @@
+import asyncio
+import logging
+from typing import Union
+
+from langchain.document_loaders.blob_loaders import Blob
+
+from openjanus.app.config import get_config
+from openjanus.stt.audio import AudioClip, MIME_TYPES
+from openjanus.stt.base import SttBackend
+from openjanus.stt.whisper.parser import OpenAIWhisperParser
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class OpenAIWhisperBackend(SttBackend):
+    """Transcribes with the OpenAI Whisper API"""
+    name = "openai"
+
+    def __init__(self):
+        self.parser = OpenAIWhisperParser()
+
+    def to_blob(self, recording: Union[str, AudioClip]) -> Blob:
+        """
+        Prepare a recording for upload. Recordings in memory are encoded with `[audio] upload_codec`
+
+        :param recording: Either a recording in memory, or the path of an audio file
+        :return: A blob of the encoded audio
+        """
+        if not isinstance(recording, AudioClip):
+            return Blob.from_path(recording)
+        codec = get_config().audio.upload_codec
+        data = recording.encode(codec)
+        LOGGER.debug(f"Encoded {recording.duration:.2f}s of audio to {len(data)} bytes of {codec}")
+        return Blob.from_data(data, mime_type=MIME_TYPES[codec], path=f"recording.{codec}")
+
+    def transcribe(self, recording: Union[str, AudioClip]) -> str:
+        combined_transcription = []
+        for document in self.parser.lazy_parse(self.to_blob(recording)):
+            LOGGER.debug(f"Transcription: {document.page_content}")
+            combined_transcription.append(document.page_content)
+        return ''.join(combined_transcription)
+
+    async def atranscribe(self, recording: Union[str, AudioClip]) -> str:
+        # Encoding is CPU bound, so it is kept off the event loop too
+        blob = await asyncio.get_running_loop().run_in_executor(None, self.to_blob, recording)
+        documents = await self.parser.aparse(blob)
+        for document in documents:
+            LOGGER.debug(f"Transcription: {document.page_content}")
+        return ''.join(document.page_content for document in documents)
@@ -1,6 +1,9 @@
+import asyncio
+import io
 import logging
+import random
 import time
-from typing import Dict, Iterator, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from langchain.document_loaders.base import BaseBlobParser
 from langchain.document_loaders.blob_loaders import Blob
@@ -11,6 +14,25 @@ from openjanus.app.config import get_openai_whisper_config
 
 LOGGER = logging.getLogger(__name__)
 
+# The Whisper API rejects uploads larger than 25MB
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+
+
+def _import_openai() -> Any:
+    try:
+        import openai
+    except ImportError:
+        raise ImportError(
+            "openai package not found, please install it with "
+            "`pip install openai`"
+        )
+    return openai
+
+
+def _backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Exponential backoff with full jitter, so that concurrent retries do not all land at once"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
 
 class OpenAIWhisperParser(BaseBlobParser):
     """Transcribe and parse audio files.
@@ -19,19 +41,18 @@ class OpenAIWhisperParser(BaseBlobParser):
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key
         self.config = get_openai_whisper_config()
-
-    def lazy_parse(self, blob: Blob) -> Iterator[Document]:
-        """Lazily parse the blob."""
-
-        import io
+        self.max_retries = self.config.get("transcription_retries", 3)
+        self._async_client: Optional[Any] = None
+
+    def _split(self, blob: Blob) -> List[io.BytesIO]:
+        """Split a blob into files small enough to upload, in order"""
+        # Audio that was already encoded in memory (see `OpenAIWhisperBackend`) is small enough to upload as-is,
+        # skipping the decode and re-encode below
+        if blob.data is not None and len(blob.as_bytes()) <= MAX_UPLOAD_BYTES:
+            file_obj = io.BytesIO(blob.as_bytes())
+            file_obj.name = blob.source or "recording.wav"
+            return [file_obj]
 
-        try:
-            import openai
-        except ImportError:
-            raise ImportError(
-                "openai package not found, please install it with "
-                "`pip install openai`"
-            )
         try:
             from pydub import AudioSegment
         except ImportError:
@@ -39,19 +60,19 @@ class OpenAIWhisperParser(BaseBlobParser):
                 "pydub package not found, please install it with " "`pip install pydub`"
             )
 
-        # Set the API key if provided
-        if self.api_key:
-            openai.api_key = self.api_key
-
-        # Audio file from disk
-        audio = AudioSegment.from_file(blob.path)
+        # Audio file from disk, or from memory if it was too large to upload in one go
+        if blob.data is None:
+            audio = AudioSegment.from_file(blob.path)
+        else:
+            audio = AudioSegment.from_file(io.BytesIO(blob.as_bytes()))
 
         # Define the duration of each chunk in minutes
         # Need to meet 25MB size limit for Whisper API
-        chunk_duration = 20
+        chunk_duration = self.config.get("transcription_chunk_minutes", 20)
         chunk_duration_ms = chunk_duration * 60 * 1000
 
         # Split the audio into chunk_duration_ms chunks
+        file_objs = []
         for split_number, i in enumerate(range(0, len(audio), chunk_duration_ms)):
             # Audio chunk
             chunk = audio[i : i + chunk_duration_ms]
@@ -60,23 +81,89 @@ class OpenAIWhisperParser(BaseBlobParser):
                 file_obj.name = blob.source + f"_part_{split_number}.mp3"
             else:
                 file_obj.name = f"part_{split_number}.mp3"
+            file_objs.append(file_obj)
+        return file_objs
+
+    def _transcribe(self, openai: Any, file_obj: io.BytesIO) -> Optional[Any]:
+        """Upload a file to Whisper, retrying with backoff"""
+        for attempt in range(self.max_retries):
+            try:
+                return openai.audio.transcriptions.create(model=self.config.get('whisper_engine', "whisper-1"), file=file_obj)
+            except Exception as e:
+                LOGGER.error(f"Attempt {attempt + 1} failed. Exception: {str(e)}")
+                file_obj.seek(0)
+                if attempt + 1 < self.max_retries:
+                    time.sleep(_backoff_delay(attempt))
+        LOGGER.error(f"Failed to transcribe after {self.max_retries} attempts.")
+        return None
 
+    def lazy_parse(self, blob: Blob) -> Iterator[Document]:
+        """Lazily parse the blob."""
+        openai = _import_openai()
+
+        # Set the API key if provided
+        if self.api_key:
+            openai.api_key = self.api_key
+
+        for split_number, file_obj in enumerate(self._split(blob)):
             # Transcribe
             LOGGER.debug(f"Transcribing part {split_number+1}!")
-            attempts = 0
-            while attempts < 3:
-                try:
-                    transcript = openai.audio.transcriptions.create(model=self.config.get('whisper_engine', "whisper-1"), file=file_obj)
-                    break
-                except Exception as e:
-                    attempts += 1
-                    LOGGER.error(f"Attempt {attempts} failed. Exception: {str(e)}")
-                    time.sleep(5)
-            else:
-                LOGGER.error("Failed to transcribe after 3 attempts.")
+            transcript = self._transcribe(openai, file_obj)
+            if transcript is None:
                 continue
 
             yield Document(
                 page_content=transcript.text,
                 metadata={"source": blob.source, "chunk": split_number},
-            )
\ No newline at end of file
+            )
+
+    def _get_async_client(self) -> Any:
+        if self._async_client is None:
+            openai = _import_openai()
+            # Retries are handled by `_atranscribe`, so they share the overall deadline
+            self._async_client = openai.AsyncOpenAI(api_key=self.api_key, max_retries=0)
+        return self._async_client
+
+    async def _atranscribe(self, client: Any, file_obj: io.BytesIO, semaphore: asyncio.Semaphore) -> Optional[Any]:
+        """Upload a file to Whisper, retrying with backoff, without blocking the event loop"""
+        for attempt in range(self.max_retries):
+            async with semaphore:
+                try:
+                    return await client.audio.transcriptions.create(model=self.config.get('whisper_engine', "whisper-1"), file=file_obj)
+                except Exception as e:
+                    LOGGER.error(f"Attempt {attempt + 1} on {file_obj.name} failed. Exception: {str(e)}")
+                    file_obj.seek(0)
+            # Back off without holding a slot, so other chunks can use it
+            if attempt + 1 < self.max_retries:
+                await asyncio.sleep(_backoff_delay(attempt))
+        LOGGER.error(f"Failed to transcribe {file_obj.name} after {self.max_retries} attempts.")
+        return None
+
+    async def aparse(self, blob: Blob) -> List[Document]:
+        """
+        Parse the blob, transcribing its chunks concurrently
+
+        At most `transcription_concurrency` chunks are uploaded at once, and the whole transcription is abandoned after
+        `transcription_timeout` seconds.
+
+        :param blob: The audio to transcribe
+        :return: A document per chunk that was transcribed, in order
+        """
+        client = self._get_async_client()
+        # Decoding and splitting long recordings is CPU bound
+        file_objs = await asyncio.get_running_loop().run_in_executor(None, self._split, blob)
+        semaphore = asyncio.Semaphore(self.config.get("transcription_concurrency", 4))
+        LOGGER.debug(f"Transcribing {len(file_objs)} part(s)")
+        try:
+            transcripts = await asyncio.wait_for(
+                asyncio.gather(*(self._atranscribe(client, file_obj, semaphore) for file_obj in file_objs)),
+                timeout=self.config.get("transcription_timeout", 120),
+            )
+        except asyncio.TimeoutError:
+            LOGGER.error(f"Transcription did not finish within {self.config.get('transcription_timeout', 120)}s")
+            return []
+        return [
+            Document(page_content=transcript.text, metadata={"source": blob.source, "chunk": split_number})
+            for split_number, transcript in enumerate(transcripts)
+            if transcript is not None
+        ]
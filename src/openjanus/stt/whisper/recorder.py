@@ -5,15 +5,17 @@ import pathlib
 import pyaudio
 import pydub
 import threading
+from typing import Optional, Union
 import wave
 
 from langchain.agents import AgentExecutor
-from langchain.document_loaders.blob_loaders import Blob
-from langchain.schema import Document
 
-# This is to support oai package >=1.0.0
-from openjanus.stt.whisper.parser import OpenAIWhisperParser
-from openjanus.app.config import get_recordings_dir
+from openjanus.stt.audio import AudioClip
+from openjanus.stt.base import get_stt_backend
+from openjanus.stt.capture import AudioCaptureWorker
+from openjanus.stt.streaming import StreamingTranscriber, StreamingTranscription
+from openjanus.stt.vad import EnergyVad
+from openjanus.app.config import get_config, get_recordings_dir
 
 
 LOGGER = logging.getLogger(__name__)
@@ -21,47 +23,58 @@ LOGGER = logging.getLogger(__name__)
 
 class Recorder:
     def __init__(self):
+        self.audio_config = get_config().audio
         self.chunk = 2048
         self.format = pyaudio.paInt16
         self.channels = 1
-        self.rate = 44100
+        self.rate = self.audio_config.sample_rate
         self.record_path = get_recordings_dir()
         self.recording_extension = "wav"
         self.output_naming_format = f"recording.{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}".replace(' ','_')
         self.is_recording = False
-        self.frames = []
+        # The input stream stays open between utterances, see `open`
+        self.capture = AudioCaptureWorker(
+            rate=self.rate,
+            channels=self.channels,
+            format=self.format,
+            chunk=self.chunk,
+            input_device_index=self.audio_config.input_device_index,
+            preroll_ms=self.audio_config.preroll_ms,
+            max_utterance_seconds=self.audio_config.max_utterance_seconds,
+        )
+        self.vad = EnergyVad() if get_config().vad.enabled else None
+        self.stt_backend = get_stt_backend()
+        self.streaming_transcriber: Optional[StreamingTranscriber] = None
         # self.record_event = threading.Event()
         self.finished_recording_path = ""
 
-    def callback(self,in_data, frame_count, time_info, status):
-        if self.is_recording == True:
-            self.frames.append(in_data)
-            return (in_data, pyaudio.paContinue)
+    def _recording_name(self) -> str:
+        return f"recording.{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}".replace(' ','_')
 
-        elif self.is_recording == False:
-            self.frames.append(in_data)
-            return (in_data, pyaudio.paComplete)
+    def open(self):
+        """Open the input stream, so that recording can start as soon as the listen key is pressed"""
+        self.capture.start()
 
-        else:
-            return (in_data,pyaudio.paContinue)
+    def close(self):
+        """Close the input stream"""
+        self.capture.stop()
 
     def start_recording(self):
         LOGGER.info("Started recording audio...")
-        self.frames = []
-        self.audio = pyaudio.PyAudio()
-
-        self.stream = self.audio.open(
-            format=self.format,
-            channels=self.channels,
-            rate=self.rate,
-            input=True,
-            frames_per_buffer=self.chunk,
-            stream_callback=self.callback
-            # input_device_index=13  # TODO: Get from config
-        )
+        # Normally already open, this only blocks if `open` was never called
+        self.capture.start()
+        self.capture.mark_start()
+        if self.audio_config.streaming_transcription:
+            self.streaming_transcriber = StreamingTranscriber(
+                capture=self.capture,
+                backend=self.stt_backend,
+                upload_sample_rate=self.audio_config.upload_sample_rate,
+                window_seconds=self.audio_config.streaming_window_seconds,
+                vad=self.vad,
+            )
+            self.streaming_transcriber.start()
         self.is_recording = True
         LOGGER.debug(f"self.is_recording: {self.is_recording}")
-        self.stream.start_stream()
         # self.record_event.set()
 
     # def convert_to_mp3(self):
@@ -70,48 +83,101 @@ class Recorder:
     #     sound.export(self.mp3_output_filepath, format="mp3")
     #     LOGGER.debug(f"Converted {self.record_path}{self.output_naming_format}.{self.recording_extension} to {self.record_path}{self.output_naming_format}.mp3")
     
-    def stop_recording(self) -> str:
+    def stop_recording(self) -> Union[str, AudioClip, StreamingTranscription]:
+        """
+        Stop recording
+
+        :return: The transcription in progress if `[audio] streaming_transcription` is set, otherwise the recorded
+            audio in memory if `[audio] in_memory` is set, otherwise the path of the WAV it was written to. An empty
+            string if nothing was recorded
+        """
         # self.record_event.clear()
         self.is_recording = False
         LOGGER.info("Stopped Recording audio...")
-        if self.recording_extension == "wav":
-            if self.stream.is_active():
-                self.stream.stop_stream()
-                self.stream.close()
-                self.audio.terminate()
-                self.finished_recording_path = str(pathlib.PurePath(f"{self.record_path}/{self.output_naming_format}.{self.recording_extension}"))
-                wav_file = wave.open(f=self.finished_recording_path, mode='wb')
-                wav_file.setnchannels(self.channels)
-                wav_file.setsampwidth(self.audio.get_sample_size(self.format))
-                wav_file.setframerate(self.rate)
-                wav_file.writeframes(b''.join(self.frames))
-                wav_file.close()
-                LOGGER.debug(f"Recording saved to {self.finished_recording_path}")
-                return self.finished_recording_path
-            else:
-                return ""
-        else:
+        clip = self.capture.mark_end()
+        streaming_transcriber, self.streaming_transcriber = self.streaming_transcriber, None
+        if clip is None or len(clip.samples) == 0:
+            # Nothing to finish, so the transcription thread is stopped rather than left polling
+            if streaming_transcriber is not None:
+                streaming_transcriber.cancel()
             return ""
-    async def transcribe_and_invoke(self, agent_chain: AgentExecutor, recording_path: str):
+        if streaming_transcriber is not None:
+            # The same check `prepare` makes, so an accidental tap of the listen key is not sent to the agent
+            if self.vad is not None:
+                vad_result = self.vad.process(clip)
+                if not vad_result.has_speech:
+                    LOGGER.info(f"Ignoring a {vad_result.original_ms:.0f}ms recording with only {vad_result.speech_ms:.0f}ms of speech")
+                    streaming_transcriber.cancel()
+                    return ""
+            # Most of the utterance is already being transcribed, only the tail is left
+            self._save_in_background(clip)
+            return streaming_transcriber.finish(clip)
+        if self.audio_config.in_memory:
+            return clip
+        self.finished_recording_path = str(pathlib.PurePath(f"{self.record_path}/{self._recording_name()}.{self.recording_extension}"))
+        wav_file = wave.open(f=self.finished_recording_path, mode='wb')
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(pyaudio.get_sample_size(self.format))
+        wav_file.setframerate(clip.rate)
+        wav_file.writeframes(clip.samples.tobytes())
+        wav_file.close()
+        LOGGER.debug(f"Recording saved to {self.finished_recording_path}")
+        return self.finished_recording_path
+
+    def _save_recording(self, clip: AudioClip, recording_path: str):
+        try:
+            data = clip.resample(self.audio_config.upload_sample_rate).encode(self.audio_config.upload_codec)
+            with open(recording_path, 'wb') as f:
+                f.write(data)
+            LOGGER.debug(f"Recording saved to {recording_path}")
+        except OSError as e:
+            LOGGER.error(f"Failed to save the recording to {recording_path}", exc_info=e)
+
+    def prepare(self, clip: AudioClip) -> Optional[AudioClip]:
+        """
+        Get a recording ready for transcription: trim its silence, downsample it, and save it in the background if
+        `[audio] save_recordings` is set
+
+        :param clip: The recorded audio
+        :return: The prepared audio, or None if there was no speech in it
+        """
+        if self.vad is not None:
+            vad_result = self.vad.process(clip)
+            if not vad_result.has_speech:
+                LOGGER.info(f"Ignoring a {vad_result.original_ms:.0f}ms recording with only {vad_result.speech_ms:.0f}ms of speech")
+                return None
+            LOGGER.debug(f"Trimmed {vad_result.trimmed_ms:.0f}ms of silence from a {vad_result.original_ms:.0f}ms recording")
+            clip = vad_result.clip
+        clip = clip.resample(self.audio_config.upload_sample_rate)
+        self._save_in_background(clip)
+        return clip
+
+    def _save_in_background(self, clip: AudioClip):
+        if self.audio_config.save_recordings:
+            recording_path = str(pathlib.PurePath(f"{self.record_path}/{self._recording_name()}.{self.audio_config.upload_codec}"))
+            threading.Thread(target=self._save_recording, args=(clip, recording_path), daemon=True).start()
+
+    async def transcribe_and_invoke(self, agent_chain: AgentExecutor, recording: Union[str, AudioClip, StreamingTranscription]):
         LOGGER.info("hit transcribe_and_invoke")
         try:
-            # Construct a Blob from the recording file
-            blob = Blob.from_path(recording_path)
-            whisper_parser = OpenAIWhisperParser()
-            # Generate document objects
-            documents = whisper_parser.lazy_parse(blob)
-            
-            combined_transcription = []
-            # Combine the documents
-            for document in documents:
-                LOGGER.debug(f"Transcription: {document.page_content}")
-                combined_transcription.append(document.page_content)
+            if isinstance(recording, StreamingTranscription):
+                transcription = await asyncio.wrap_future(recording.future)
+            else:
+                if isinstance(recording, AudioClip):
+                    # Trimming and resampling are CPU bound, so they run off the event loop
+                    recording = await asyncio.get_running_loop().run_in_executor(None, self.prepare, recording)
+                    if recording is None:
+                        return ""
+                transcription = await self.stt_backend.atranscribe(recording)
+            if not transcription.strip():
+                LOGGER.info("Nothing was transcribed, not invoking the agent")
+                return ""
             
             # These are just for testing
             # output = asyncio.run(agent_chain.ainvoke({"input": "Seraphim Station, this is john smith, requesting permission to land, over.", "chat_history": []}))
             # output = asyncio.run(agent_chain.ainvoke({"input": "Turn the ship's lights on", "chat_history": []}))
             
-            output = await agent_chain.ainvoke({"input": ''.join(combined_transcription), "chat_history": []})
+            output = await agent_chain.ainvoke({"input": transcription, "chat_history": []})
             if isinstance(output['output'], list):
                 return output['output'][0]['response']
             if isinstance(output['output'], str):
@@ -0,0 +1,88 @@
+ATC_TOOL_NAME = "Reply_ATC"
+ATC_TOOL_DESCRIPTION = "Use this tool to assume the role of an Air Traffic Controller. Pass the user's entire question unaltertered to this tool."
+
+ONBOARD_IA_TOOL_NAME = "Reply_Onboard_IA"
+ONBOARD_IA_TOOL_DESCRIPTION = "Use this tool to assume the role of an Onboard Ship-AI/Computer. This tool can be used to perform actions related to this ship. Pass the user's entire question unaltertered to this tool within the input schema."
+
+ITEM_FINDER_TOOL_NAME = "Reply_Item_Finder"
+ITEM_FINDER_TOOL_DESCRIPTION = "Use this tool to assume the role of an Item Finder to help the user find an item. Pass the user's entire question unaltertered to this tool."
+
+PLANETARY_SURVEY_TOOL_NAME = "Reply_Planetary_Survey"
+PLANETARY_SURVEY_TOOL_DESCRIPTION = "Use this tool to assume the role of a Planetary Surveyor to help the user find a location. Pass the user's entire question unaltertered to this tool."
+
+# Example utterances and keyword rules for each tool, used to route requests locally without asking the LLM. See
+# `openjanus.toolkits.router`
+ATC_TOOL_EXAMPLES = (
+    "Seraphim Station, this is John Smith, requesting permission to land, over.",
+    "Port Olisar tower, requesting clearance for takeoff",
+    "Area 18 traffic control, requesting a landing pad",
+    "Lorville ATC, this is the Constellation Andromeda requesting landing clearance",
+    "Everus Harbor, requesting a hangar, over",
+    "Control, we are inbound and need a pad assignment",
+    "Tower, requesting permission to depart",
+    "New Babbage traffic control, requesting clearance to land, over",
+    "Station control, this is Cutlass Black one requesting docking, over",
+    "Which pad have we been assigned, control?",
+)
+ATC_TOOL_KEYWORDS = (
+    r"\b(atc|tower|traffic control)\b",
+    r"\brequesting (permission|clearance|a (landing )?pad|a hangar|landing|takeoff|take off)\b",
+    r"\bover\W*$",
+)
+
+ONBOARD_IA_TOOL_EXAMPLES = (
+    "Turn on the ship's lights",
+    "Lower the landing gear",
+    "Get us flight ready",
+    "Spool up the quantum drive",
+    "Deploy a decoy",
+    "Divert power to shields",
+    "Raise the front shields",
+    "Engage cruise control",
+    "Launch a missile at the target",
+    "Toggle mining mode",
+    "Power up the weapons",
+    "Switch to VTOL mode",
+    "Cycle the gimbal assist",
+    "Jettison the cargo",
+    "Computer, lock onto the target",
+    "Exit the seat",
+    "What's our shield status?",
+)
+ONBOARD_IA_TOOL_KEYWORDS = (
+    r"^(computer|ship)\b",
+    r"\b(mode|shields?|gear|lights?|quantum drive|missiles?|decoys?|power)\b",
+)
+
+ITEM_FINDER_TOOL_EXAMPLES = (
+    "Where can I buy a P4-AR rifle?",
+    "Where can I find the Arrowhead sniper rifle?",
+    "Who sells medical pens?",
+    "Where do I buy ship components?",
+    "Which shop sells Pembroke armor?",
+    "How much does a Karna rifle cost and where can I get it?",
+    "Where can I purchase a multitool?",
+    "Where can I buy a quantum drive for my ship?",
+    "Find me a store that sells ammunition",
+    "Where is the cheapest place to buy a helmet?",
+)
+ITEM_FINDER_TOOL_KEYWORDS = (
+    r"\b(buy|purchase|sells?|shop|store|price|cost)\b",
+)
+
+PLANETARY_SURVEY_TOOL_EXAMPLES = (
+    "Where can I mine quantanium?",
+    "Which moons have hadanite deposits?",
+    "Where is the best place to find agricium?",
+    "What resources are on Daymar?",
+    "Where can I find laranite ore?",
+    "Which planet has the most titanium?",
+    "Where are the caves with gems on Aberdeen?",
+    "What minerals can I find on Lyria?",
+    "Where should I go mining for gold?",
+    "Which locations have aphorite?",
+)
+PLANETARY_SURVEY_TOOL_KEYWORDS = (
+    r"\b(mine|mining|ore|deposits?|minerals?|resources?|gems?|caves?)\b",
+    r"\b(quantanium|hadanite|aphorite|dolivine|janalite|laranite|agricium|bexalite|taranite|borase|titanium|gold|diamond|beryl)\b",
+)
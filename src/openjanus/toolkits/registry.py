@@ -0,0 +1,257 @@
+from dataclasses import dataclass
+import importlib
+from importlib.metadata import entry_points
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain.callbacks.manager import Callbacks
+from langchain.schema.language_model import BaseLanguageModel
+from langchain.tools import Tool
+
+from openjanus.toolkits.prompt import (
+    ATC_TOOL_NAME,
+    ATC_TOOL_DESCRIPTION,
+    ATC_TOOL_EXAMPLES,
+    ATC_TOOL_KEYWORDS,
+    ONBOARD_IA_TOOL_NAME,
+    ONBOARD_IA_TOOL_DESCRIPTION,
+    ONBOARD_IA_TOOL_EXAMPLES,
+    ONBOARD_IA_TOOL_KEYWORDS,
+    ITEM_FINDER_TOOL_NAME,
+    ITEM_FINDER_TOOL_DESCRIPTION,
+    ITEM_FINDER_TOOL_EXAMPLES,
+    ITEM_FINDER_TOOL_KEYWORDS,
+    PLANETARY_SURVEY_TOOL_NAME,
+    PLANETARY_SURVEY_TOOL_DESCRIPTION,
+    PLANETARY_SURVEY_TOOL_EXAMPLES,
+    PLANETARY_SURVEY_TOOL_KEYWORDS,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Third party packages can register their own tools by exposing an `OpenJanusToolSpec` (or a callable returning one)
+# under this entry point group
+TOOL_ENTRY_POINT_GROUP = "openjanus.tools"
+
+
+@dataclass(frozen=True)
+class OpenJanusToolSpec:
+    """
+    Declares a tool that the base agent can route to, without importing it
+
+    `builder` is an import path in the form `module:function`. The function is called as `builder(llm=llm)` the
+    first time the tool is invoked, and must return a langchain `Tool`.
+
+    `examples` (utterances the tool should receive) and `keywords` (regular expressions that point to the tool) let
+    the local router send requests straight to the tool, without asking the LLM.
+    """
+    name: str
+    description: str
+    builder: str
+    return_direct: bool = False
+    examples: Tuple[str, ...] = ()
+    keywords: Tuple[str, ...] = ()
+
+    def load_builder(self) -> Callable[..., Tool]:
+        """Import the builder for this tool"""
+        module_name, _, attribute = self.builder.partition(":")
+        return getattr(importlib.import_module(module_name), attribute)
+
+
+class LazyTool:
+    """Builds the tool behind a spec the first time it is invoked, and delegates every call to it afterwards"""
+    def __init__(self, spec: OpenJanusToolSpec, llm: BaseLanguageModel):
+        """
+        Initialises the LazyTool
+
+        :param spec: The spec of the tool to build
+        :param llm: The LLM to build the tool with
+        """
+        self.spec = spec
+        self.llm = llm
+        self._tool: Optional[Tool] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_built(self) -> bool:
+        return self._tool is not None
+
+    def get(self) -> Tool:
+        """Get the underlying tool, building it if it has not been built yet"""
+        if self._tool is None:
+            with self._lock:
+                if self._tool is None:
+                    LOGGER.debug(f"Building tool {self.spec.name}")
+                    self._tool = self.spec.load_builder()(llm=self.llm)
+        return self._tool
+
+    # Through the built tool's `run`, not its `func`, so its callbacks, verbosity and error handling still apply
+    def run(self, tool_input: str, callbacks: Callbacks = None) -> Any:
+        return self.get().run(tool_input, callbacks=callbacks)
+
+    async def arun(self, tool_input: str, callbacks: Callbacks = None) -> Any:
+        return await self.get().arun(tool_input, callbacks=callbacks)
+
+    def as_tool(self) -> Tool:
+        """Expose this as a langchain tool that only carries the spec's name and description until it is used"""
+        return Tool(
+            name=self.spec.name,
+            description=self.spec.description,
+            func=self.run,
+            coroutine=self.arun,
+            return_direct=self.spec.return_direct,
+            verbose=True,
+        )
+
+
+class OpenJanusToolRegistry:
+    """The tools that are available to the base agent, by name"""
+    def __init__(self):
+        self._specs: Dict[str, OpenJanusToolSpec] = {}
+        self._entry_points_loaded = False
+
+    def register(self, spec: OpenJanusToolSpec) -> OpenJanusToolSpec:
+        """
+        Register a tool
+
+        :param spec: The tool to register. A spec with the same name replaces the existing one
+        :return: The registered spec
+        """
+        if spec.name in self._specs:
+            LOGGER.warning(f"Replacing the registered tool {spec.name} with {spec.builder}")
+        self._specs[spec.name] = spec
+        return spec
+
+    def _load_entry_points(self):
+        """Register the tools exposed by installed packages"""
+        self._entry_points_loaded = True
+        for entry_point in entry_points(group=TOOL_ENTRY_POINT_GROUP):
+            try:
+                spec = entry_point.load()
+                if not isinstance(spec, OpenJanusToolSpec):
+                    spec = spec()
+                self.register(spec)
+            except Exception as e:
+                LOGGER.error(f"Failed to load the tool from entry point {entry_point.name}", exc_info=e)
+
+    def specs(self) -> List[OpenJanusToolSpec]:
+        """
+        Get every registered tool
+
+        :return: The registered specs, in registration order
+        """
+        if not self._entry_points_loaded:
+            self._load_entry_points()
+        return list(self._specs.values())
+
+
+TOOL_REGISTRY = OpenJanusToolRegistry()
+register_tool = TOOL_REGISTRY.register
+
+register_tool(OpenJanusToolSpec(
+    name=ATC_TOOL_NAME,
+    description=ATC_TOOL_DESCRIPTION,
+    builder="openjanus.toolkits.toolkit:atc_chain_tool",
+    return_direct=True,
+    examples=ATC_TOOL_EXAMPLES,
+    keywords=ATC_TOOL_KEYWORDS,
+))
+register_tool(OpenJanusToolSpec(
+    name=ONBOARD_IA_TOOL_NAME,
+    description=ONBOARD_IA_TOOL_DESCRIPTION,
+    builder="openjanus.toolkits.toolkit:onboard_ia_chain_tool",
+    examples=ONBOARD_IA_TOOL_EXAMPLES,
+    keywords=ONBOARD_IA_TOOL_KEYWORDS,
+))
+register_tool(OpenJanusToolSpec(
+    name=ITEM_FINDER_TOOL_NAME,
+    description=ITEM_FINDER_TOOL_DESCRIPTION,
+    builder="openjanus.toolkits.toolkit:item_finder_tool",
+    return_direct=True,
+    examples=ITEM_FINDER_TOOL_EXAMPLES,
+    keywords=ITEM_FINDER_TOOL_KEYWORDS,
+))
+register_tool(OpenJanusToolSpec(
+    name=PLANETARY_SURVEY_TOOL_NAME,
+    description=PLANETARY_SURVEY_TOOL_DESCRIPTION,
+    builder="openjanus.toolkits.toolkit:planetary_survey_tool",
+    return_direct=True,
+    examples=PLANETARY_SURVEY_TOOL_EXAMPLES,
+    keywords=PLANETARY_SURVEY_TOOL_KEYWORDS,
+))
+
+
+class OpenJanusToolkit:
+    """
+    The tools of one application. Each tool, along with its integrations and memory, is built at most once and shared
+    by everything that uses the toolkit (e.g. both the base agent and its executor)
+    """
+    def __init__(self, llm: BaseLanguageModel, registry: OpenJanusToolRegistry = TOOL_REGISTRY):
+        """
+        Initialises the OpenJanusToolkit
+
+        :param llm: The LLM to build the tools with
+        :param registry: The registry to take tools from, defaults to the global registry
+        """
+        self.llm = llm
+        self.registry = registry
+        self._lazy_tools: Dict[str, LazyTool] = {}
+        self._tools: Optional[List[Tool]] = None
+        self._lock = threading.Lock()
+
+    def get_tools(self) -> List[Tool]:
+        """
+        Get the tools of this toolkit. Repeated calls return the same tools
+
+        :return: A list object of tools
+        """
+        if self._tools is None:
+            with self._lock:
+                if self._tools is None:
+                    for spec in self.registry.specs():
+                        self._lazy_tools[spec.name] = LazyTool(spec, self.llm)
+                    self._tools = [lazy_tool.as_tool() for lazy_tool in self._lazy_tools.values()]
+        return list(self._tools)
+
+    def get_lazy_tool(self, name: str) -> LazyTool:
+        """
+        Get the lazily built tool with the given name
+
+        :param name: The name of the tool
+        :return: The lazy tool
+        """
+        self.get_tools()
+        return self._lazy_tools[name]
+
+
+_TOOLKITS: Dict[int, OpenJanusToolkit] = {}
+_TOOLKITS_LOCK = threading.Lock()
+
+
+def get_openjanus_toolkit(llm: BaseLanguageModel) -> OpenJanusToolkit:
+    """
+    Get the toolkit for an LLM, creating it on first use
+
+    :param llm: A chat llm with a context window
+    :return: The toolkit shared by every caller using this LLM
+    """
+    # The toolkit keeps a reference to the llm, so its id cannot be reused while the toolkit is cached
+    with _TOOLKITS_LOCK:
+        toolkit = _TOOLKITS.get(id(llm))
+        if toolkit is None:
+            toolkit = OpenJanusToolkit(llm)
+            _TOOLKITS[id(llm)] = toolkit
+        return toolkit
+
+
+def get_openjanus_tools(llm: BaseLanguageModel) -> List[Tool]:
+    """
+    Return a list of tools for the base chat agent to use. Each tool is only built on its first invocation, and
+    repeated calls with the same LLM share the same tools
+
+    :param llm: A chat llm with a context window
+    :return: A list object of tools (i.e. a toolkit)
+    """
+    return get_openjanus_toolkit(llm).get_tools()
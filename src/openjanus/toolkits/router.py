@@ -0,0 +1,201 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain.callbacks.manager import Callbacks
+import numpy as np
+
+from openjanus.toolkits.registry import OpenJanusToolSpec, OpenJanusToolkit
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    """Which tool a request should go to, and how sure the router is"""
+    tool_name: str
+    confidence: float
+    reason: str
+
+
+class BaseIntentRouter(ABC):
+    """Decides which tool should receive a request, without asking the LLM"""
+
+    @abstractmethod
+    def route(self, text: str) -> Optional[RouteDecision]:
+        """
+        Route a request
+
+        :param text: The transcribed request
+        :return: The decision, or None if the request should be left to the LLM agent
+        """
+
+
+# Words that appear in requests to every tool, and so say nothing about which tool is meant
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "can", "do", "for", "i", "is", "it", "me", "my", "of", "on", "please", "the", "this",
+    "to", "us", "we", "what", "you",
+})
+
+
+def _tokenize(text: str) -> List[str]:
+    words = [word for word in re.findall(r"[a-z0-9']+", text.lower()) if word not in STOP_WORDS]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class LocalIntentRouter(BaseIntentRouter):
+    """
+    Routes with keyword rules and a small TF-IDF nearest-centroid classifier, trained on the examples of each tool spec
+
+    Each tool's examples are turned into TF-IDF vectors of words and word pairs, and averaged into one centroid per
+    tool. A request is scored by its cosine similarity to each centroid, plus a bonus for every tool whose keyword
+    rules it matches, and the scores are turned into a confidence with a softmax. The request is only routed when the
+    best tool scores well enough on its own, is confident enough, and is clearly ahead of the next.
+    """
+    def __init__(
+            self,
+            specs: Iterable[OpenJanusToolSpec],
+            threshold: float = 0.6,
+            margin: float = 0.2,
+            keyword_weight: float = 0.3,
+            temperature: float = 10.0,
+            min_score: float = 0.3,
+    ):
+        """
+        Initialises the LocalIntentRouter, and trains it
+
+        :param specs: The tools to route to. Tools without examples or keywords are never routed to
+        :param threshold: The confidence needed to route a request, from 0 to 1, defaults to 0.6
+        :param margin: How far ahead of the next tool the best tool must be, defaults to 0.2
+        :param keyword_weight: How much matching a tool's keyword rule adds to its score, defaults to 0.3
+        :param temperature: How sharply scores are turned into confidences, defaults to 10
+        :param min_score: The lowest score the best tool can have, so that requests unlike any example are not
+            routed just because one tool is slightly less unlike them, defaults to 0.3
+        """
+        self.threshold = threshold
+        self.margin = margin
+        self.keyword_weight = keyword_weight
+        self.temperature = temperature
+        self.min_score = min_score
+        specs = [spec for spec in specs if spec.examples or spec.keywords]
+        self.tool_names = [spec.name for spec in specs]
+        self.keywords = [[re.compile(pattern, re.IGNORECASE) for pattern in spec.keywords] for spec in specs]
+        self._fit([list(spec.examples) for spec in specs])
+
+    def _fit(self, examples: Sequence[List[str]]):
+        documents = [_tokenize(example) for tool_examples in examples for example in tool_examples]
+        self.vocabulary: Dict[str, int] = {}
+        for tokens in documents:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+        document_frequency = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for tokens in documents:
+            document_frequency[[self.vocabulary[token] for token in set(tokens)]] += 1
+        self.idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+        self.centroids = np.zeros((len(examples), len(self.vocabulary)), dtype=np.float32)
+        for index, tool_examples in enumerate(examples):
+            if tool_examples:
+                centroid = np.mean([self._vectorize(example) for example in tool_examples], axis=0)
+                self.centroids[index] = centroid / max(np.linalg.norm(centroid), 1e-9)
+        LOGGER.debug(f"Trained the intent router on {len(documents)} examples, {len(self.vocabulary)} features")
+
+    def _vectorize(self, text: str) -> np.ndarray:
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for token in _tokenize(text):
+            index = self.vocabulary.get(token)
+            if index is not None:
+                vector[index] += 1
+        vector *= self.idf
+        return vector / max(np.linalg.norm(vector), 1e-9)
+
+    def scores(self, text: str) -> np.ndarray:
+        """
+        Score a request against every tool
+
+        :param text: The transcribed request
+        :return: The score for each tool, in the order of `tool_names`
+        """
+        similarity = self.centroids @ self._vectorize(text)
+        keyword_hits = np.array([any(pattern.search(text) for pattern in patterns) for patterns in self.keywords], dtype=np.float32)
+        return similarity + self.keyword_weight * keyword_hits
+
+    def confidences(self, scores: np.ndarray) -> np.ndarray:
+        """Turn the scores of every tool into confidences that add up to 1"""
+        logits = scores * self.temperature
+        exponentials = np.exp(logits - logits.max())
+        return exponentials / exponentials.sum()
+
+    def route(self, text: str) -> Optional[RouteDecision]:
+        if not self.tool_names:
+            return None
+        scores = self.scores(text)
+        confidences = self.confidences(scores)
+        ranked = np.argsort(confidences)[::-1]
+        best = int(ranked[0])
+        runner_up = float(confidences[ranked[1]]) if len(ranked) > 1 else 0.0
+        confidence = float(confidences[best])
+        reason = ", ".join(f"{self.tool_names[index]}={confidences[index]:.2f}" for index in ranked)
+        if scores[best] < self.min_score or confidence < self.threshold or confidence - runner_up < self.margin:
+            LOGGER.debug(f"Not routing locally, {reason}")
+            return None
+        return RouteDecision(tool_name=self.tool_names[best], confidence=confidence, reason=reason)
+
+
+class RoutingAgent:
+    """
+    Sits in front of the agent, and sends requests the router is confident about straight to their tool. Everything
+    else is passed through to the agent
+    """
+    def __init__(self, agent_chain: Any, toolkit: OpenJanusToolkit, router: Optional[BaseIntentRouter] = None):
+        """
+        Initialises the RoutingAgent
+
+        :param agent_chain: The agent to pass requests the router is not sure about to
+        :param toolkit: The toolkit to take tools from, shared with the agent
+        :param router: The router to use, defaults to a `LocalIntentRouter` over the toolkit's tools
+        """
+        self.agent_chain = agent_chain
+        self.toolkit = toolkit
+        self.router = router if router is not None else LocalIntentRouter(toolkit.registry.specs())
+
+    @staticmethod
+    def _to_output(result: Any) -> Any:
+        # The Onboard IA chain returns its outputs, rather than only its response
+        if isinstance(result, dict) and "response" in result:
+            return result["response"]
+        return result
+
+    @staticmethod
+    def _callbacks(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Callbacks:
+        """The callbacks of the `config` the agent would have been invoked with"""
+        config = args[0] if args else kwargs.get("config")
+        return (config or {}).get("callbacks")
+
+    def _remember(self, inputs: Dict[str, Any], outputs: Dict[str, Any]):
+        """Save a routed turn to the agent's memory, as if the agent had answered it"""
+        memory = getattr(self.agent_chain, "memory", None)
+        if memory is not None:
+            memory.save_context({"input": inputs["input"]}, {"output": outputs["output"]})
+
+    def invoke(self, inputs: Dict[str, Any], *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        decision = self.router.route(inputs["input"])
+        if decision is None:
+            return self.agent_chain.invoke(inputs, *args, **kwargs)
+        LOGGER.info(f"Routed to {decision.tool_name} locally ({decision.reason})")
+        result = self.toolkit.get_lazy_tool(decision.tool_name).run(inputs["input"], callbacks=self._callbacks(args, kwargs))
+        outputs = {**inputs, "output": self._to_output(result)}
+        self._remember(inputs, outputs)
+        return outputs
+
+    async def ainvoke(self, inputs: Dict[str, Any], *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        decision = self.router.route(inputs["input"])
+        if decision is None:
+            return await self.agent_chain.ainvoke(inputs, *args, **kwargs)
+        LOGGER.info(f"Routed to {decision.tool_name} locally ({decision.reason})")
+        result = await self.toolkit.get_lazy_tool(decision.tool_name).arun(inputs["input"], callbacks=self._callbacks(args, kwargs))
+        outputs = {**inputs, "output": self._to_output(result)}
+        self._remember(inputs, outputs)
+        return outputs
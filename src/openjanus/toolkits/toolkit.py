@@ -1,52 +1,96 @@
-import re
-from tabnanny import verbose
-from types import coroutine
-from typing import Dict
+from functools import lru_cache
+from typing import Any, Dict, Optional
 
 
 from langchain.agents import AgentExecutor
-from langchain.chains import SequentialChain
-from langchain.chains.llm import LLMChain
+from langchain.chains import SequentialChain, TransformChain
+from langchain.chains.base import Chain
 from langchain.chat_models.base import BaseChatModel
-from langchain.memory import ConversationSummaryBufferMemory, ConversationBufferWindowMemory
 from langchain.prompts import SystemMessagePromptTemplate, ChatPromptTemplate, HumanMessagePromptTemplate
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.schema import BaseMemory
 from langchain.schema.language_model import BaseLanguageModel
 from langchain.tools import Tool
-from openjanus.chains import planetary_survey
 
-from openjanus.chains.base import AsyncOpenJanusChainCallbackHandler, OpenJanusChainCallbackHandler, AsyncOpenJanusOpenAIFunctionsAgentCallbackHandler, OpenJanusOpenAIFunctionsAgentCallbackHandler
-from openjanus.chains.atc.base import AtcChain
-from openjanus.chains.onboardia.base import (
-    OnboardIaChain,
-    _parse_json_markdown, langchain_json_parser
+import openjanus.app.config as openjanus_config
+from openjanus.app.profiling import profile_phase
+from openjanus.toolkits.prompt import (
+    ATC_TOOL_NAME,
+    ATC_TOOL_DESCRIPTION,
+    ONBOARD_IA_TOOL_NAME,
+    ONBOARD_IA_TOOL_DESCRIPTION,
+    ITEM_FINDER_TOOL_NAME,
+    ITEM_FINDER_TOOL_DESCRIPTION,
+    PLANETARY_SURVEY_TOOL_NAME,
+    PLANETARY_SURVEY_TOOL_DESCRIPTION,
 )
-from openjanus.chains.onboardia.prompt import (
-    ONBOARD_IA_KEYMAP_USER_PROMPT,
-    ONBOARD_IA_KEYMAP_PROMPT
-)
-from openjanus.chains.item_finder.base import ItemFinderAgent
-from openjanus.chains.item_finder.base import _get_tools as get_item_finder_tools
-from openjanus.chains.planetary_survey.base import PlanetarySurveyAgent
-from openjanus.chains.planetary_survey.base import _get_tools as get_planetary_survey_tools
 
+# The chains and integrations behind each tool are imported inside the tool's builder, so that building (or
+# lazily registering) one tool does not pull in the dependencies of all the others.
+
+
+def _summary_memory(llm: BaseLanguageModel, max_token_limit: int) -> BaseMemory:
+    """
+    Build the default memory of the tools that summarize their conversation
+
+    :param llm: The LLM object to summarize with
+    :param max_token_limit: How many tokens of conversation to keep before summarizing the oldest messages
+    :return: A summary buffer memory, which summarizes in the background if `[memory] background_summary` is set
+    """
+    from openjanus.chains.memory import BackgroundSummaryBufferMemory
+
+    return BackgroundSummaryBufferMemory(
+        llm=llm,
+        return_messages=True,
+        memory_key="chat_history",
+        max_token_limit=max_token_limit,
+        background=openjanus_config.get_config().memory.background_summary,
+    )
+
+
+def _speaking_llm(llm: BaseLanguageModel, final_answer_only: bool = False) -> Optional[BaseLanguageModel]:
+    """
+    Get a copy of an LLM that speaks its responses as they are generated, if `[tts] stream_speech` is set
 
-def atc_chain_tool(llm: BaseLanguageModel, memory: BaseMemory, **kwargs) -> Tool:
+    :param llm: The LLM object to copy
+    :param final_answer_only: Only speak the final answer of a conversational agent, defaults to False
+    :return: The speaking LLM, or None if the whole output should be spoken once it is complete
+    """
+    settings = openjanus_config.get_config().tts
+    if not settings.stream_speech:
+        return None
+    from openjanus.tts.streaming import StreamingSpeechHandler
+
+    update: Dict[str, Any] = {
+        "callbacks": [StreamingSpeechHandler(final_answer_only=final_answer_only, min_chars=settings.min_sentence_chars)],
+    }
+    if "streaming" in llm.__fields__:
+        update["streaming"] = True
+    return llm.copy(update=update)
+
+
+def atc_chain_tool(llm: BaseLanguageModel, memory: Optional[BaseMemory] = None, **kwargs) -> Tool:
     """
     Generate a tool to expose the ATC
 
     :param llm: The LLM object to use
-    :param memory: A memory object to use
+    :param memory: A memory object to use, defaults to a summary buffer memory within `[memory] atc_token_budget`
     :return: A tool with an Air Traffic Controller
     """
+    from openjanus.chains.atc.base import AtcChain
+
+    if memory is None:
+        memory = _summary_memory(llm, openjanus_config.get_config().memory.atc_token_budget)
+    # The answer is spoken a sentence at a time as it is generated, rather than once it is complete
+    speaking_llm = _speaking_llm(llm)
     atc_chain = AtcChain(
-        llm=llm,
-        memory=memory
+        llm=speaking_llm or llm,
+        memory=memory,
+        speak_output=speaking_llm is None,
     )
     atc_tool = Tool(
-        name="Reply_ATC",
-        description="Use this tool to assume the role of an Air Traffic Controller. Pass the user's entire question unaltertered to this tool.",
+        name=ATC_TOOL_NAME,
+        description=ATC_TOOL_DESCRIPTION,
         func=atc_chain.process,
         coroutine=atc_chain.aprocess,
         return_direct=True,
@@ -56,26 +100,37 @@ def atc_chain_tool(llm: BaseLanguageModel, memory: BaseMemory, **kwargs) -> Tool
     return atc_tool
 
 
-def item_finder_tool(llm: BaseLanguageModel, memory: BaseMemory, **kwargs) -> Tool:
+def item_finder_tool(llm: BaseLanguageModel, memory: Optional[BaseMemory] = None, **kwargs) -> Tool:
     """
     Generate a tool to find items
 
     :param llm: The LLM object to use
-    :param memory: A memory object to use
+    :param memory: A memory object to use, defaults to a summary buffer memory within `[memory] item_finder_token_budget`
     :return: A tool with an Item Finder agent
     """
+    from openjanus.chains.base import AsyncOpenJanusOpenAIFunctionsAgentCallbackHandler, OpenJanusOpenAIFunctionsAgentCallbackHandler
+    from openjanus.chains.item_finder.base import ItemFinderAgent
+    from openjanus.chains.item_finder.base import _get_tools as get_item_finder_tools
+
+    if memory is None:
+        memory = _summary_memory(llm, openjanus_config.get_config().memory.item_finder_token_budget)
+    # Build the integration once, and share it between the agent and its executor
+    item_finder_tools = get_item_finder_tools()
+    # The final answer is spoken a sentence at a time as it is generated, rather than once it is complete
+    speaking_llm = _speaking_llm(llm, final_answer_only=True)
     item_finder_chain = ItemFinderAgent.from_llm_and_tools(
-        llm=llm,
+        llm=speaking_llm or llm,
+        tools=item_finder_tools,
     )
     item_finder_agent = AgentExecutor.from_agent_and_tools(
         agent=item_finder_chain,
-        tools=get_item_finder_tools(),
+        tools=item_finder_tools,
         memory=memory,
-        callbacks=[AsyncOpenJanusOpenAIFunctionsAgentCallbackHandler(), OpenJanusOpenAIFunctionsAgentCallbackHandler()],
+        callbacks=[AsyncOpenJanusOpenAIFunctionsAgentCallbackHandler(), OpenJanusOpenAIFunctionsAgentCallbackHandler()] if speaking_llm is None else [],
     )
     item_finder_tool = Tool(
-        name="Reply_Item_Finder",
-        description="Use this tool to assume the role of an Item Finder to help the user find an item. Pass the user's entire question unaltertered to this tool.",
+        name=ITEM_FINDER_TOOL_NAME,
+        description=ITEM_FINDER_TOOL_DESCRIPTION,
         func=item_finder_agent.run,
         coroutine=item_finder_agent.arun,
         return_direct=True,
@@ -85,26 +140,38 @@ def item_finder_tool(llm: BaseLanguageModel, memory: BaseMemory, **kwargs) -> To
     return item_finder_tool
 
 
-def planetary_survey_tool(llm: BaseLanguageModel, memory: BaseMemory, **kwargs) -> Tool:
+def planetary_survey_tool(llm: BaseLanguageModel, memory: Optional[BaseMemory] = None, **kwargs) -> Tool:
     """
     Generate a tool to find locations
-    
+
     :param llm: The LLM object to use
-    :param memory: A memory object to use
+    :param memory: A memory object to use, defaults to a summary buffer memory within `[memory] planetary_survey_token_budget`
     :return: A tool with a Planetary Survey agent
     """
+    from openjanus.chains.base import AsyncOpenJanusOpenAIFunctionsAgentCallbackHandler, OpenJanusOpenAIFunctionsAgentCallbackHandler
+    from openjanus.chains.planetary_survey.base import PlanetarySurveyAgent
+    from openjanus.chains.planetary_survey.base import _get_tools as get_planetary_survey_tools
+
+    if memory is None:
+        memory = _summary_memory(llm, openjanus_config.get_config().memory.planetary_survey_token_budget)
+    # Build the integration once (this loads the survey data), and share it between the agent and its executor
+    with profile_phase("survey_data_load"):
+        planetary_survey_tools = get_planetary_survey_tools()
+    # The final answer is spoken a sentence at a time as it is generated, rather than once it is complete
+    speaking_llm = _speaking_llm(llm, final_answer_only=True)
     planetary_survey_chain = PlanetarySurveyAgent.from_llm_and_tools(
-        llm=llm,
+        llm=speaking_llm or llm,
+        tools=planetary_survey_tools,
     )
     planetary_survey_agent = AgentExecutor.from_agent_and_tools(
         agent=planetary_survey_chain,
-        tools=get_planetary_survey_tools(),
+        tools=planetary_survey_tools,
         memory=memory,
-        callbacks=[AsyncOpenJanusOpenAIFunctionsAgentCallbackHandler(), OpenJanusOpenAIFunctionsAgentCallbackHandler()],
+        callbacks=[AsyncOpenJanusOpenAIFunctionsAgentCallbackHandler(), OpenJanusOpenAIFunctionsAgentCallbackHandler()] if speaking_llm is None else [],
     )
     planetary_survey_tool = Tool(
-        name="Reply_Planetary_Survey",
-        description="Use this tool to assume the role of a Planetary Surveyor to help the user find a location. Pass the user's entire question unaltertered to this tool.",
+        name=PLANETARY_SURVEY_TOOL_NAME,
+        description=PLANETARY_SURVEY_TOOL_DESCRIPTION,
         func=planetary_survey_agent.run,
         coroutine=planetary_survey_agent.arun,
         return_direct=True,
@@ -123,29 +190,109 @@ class OnboardIAChainInputSchema(BaseModel):
     input: Dict[str, str]
 
 
-def onboard_ia_chain_tool(llm: BaseLanguageModel, memory: BaseMemory, **kwargs) -> Tool:
+def _onboard_ia_sequential_chain(
+        llm: BaseLanguageModel,
+        memory: BaseMemory,
+        retriever: Optional[Any] = None,
+        plan_cache: Optional[Any] = None,
+) -> Chain:
     """
-    Generate a tool to expose the onboard IA
+    Build the Onboard IA as two chains, one picking the keys to press, and one phrasing the response
 
     :param llm: The LLM object to use
-    :param memory: the memory object to use
-    :return: A tool with the onboard ship IA
+    :param memory: The memory object to use
+    :param retriever: A `KeymapRetriever` to pick the keymap rows to send, defaults to sending the whole keymap
+    :param plan_cache: A `PlanCache` to replay the actions picked for previous commands from, defaults to none
+    :return: The Onboard IA chain
     """
+    from openjanus.chains.base import AsyncOpenJanusChainCallbackHandler, OpenJanusChainCallbackHandler
+    from openjanus.chains.onboardia.base import KeypressChain, OnboardIaChain
+    from openjanus.chains.onboardia.prompt import (
+        ONBOARD_IA_KEYMAP_USER_PROMPT,
+        ONBOARD_IA_KEYMAP_PROMPT,
+        ONBOARD_IA_KEYMAP_RETRIEVED_PROMPT
+    )
+
     keypress_prompt = ChatPromptTemplate.from_messages([
-            SystemMessagePromptTemplate.from_template(template=ONBOARD_IA_KEYMAP_PROMPT),
+            SystemMessagePromptTemplate.from_template(
+                template=ONBOARD_IA_KEYMAP_PROMPT if retriever is None else ONBOARD_IA_KEYMAP_RETRIEVED_PROMPT
+            ),
             HumanMessagePromptTemplate.from_template(ONBOARD_IA_KEYMAP_USER_PROMPT)
         ])
-    keypress_prompt.input_variables = ['input']
-    langchain_json_parser.parse_json_markdown = _parse_json_markdown
-    PatchedSimpleJsonOutputParser = langchain_json_parser.SimpleJsonOutputParser
-    keypress_chain = LLMChain(memory=None, prompt=keypress_prompt, llm=llm)
-    keypress_chain.output_parser = PatchedSimpleJsonOutputParser()
+    keypress_prompt.input_variables = ['input'] if retriever is None else ['input', 'keymap']
+    # Keys are pressed as each action is streamed in, rather than once the whole response has been parsed
+    keypress_chain = KeypressChain(prompt=keypress_prompt, llm=llm, plan_cache=plan_cache)
     chains = [keypress_chain,
               OnboardIaChain(memory=memory, llm=llm, verbose=True, callbacks=[AsyncOpenJanusChainCallbackHandler(), OpenJanusChainCallbackHandler()])]
-    onboard_ia_chain = SequentialChain(memory=memory, verbose=True, chains=chains, input_variables=['input'], output_variables=['response'])
+    if retriever is not None:
+        chains.insert(0, TransformChain(
+            input_variables=['input'],
+            output_variables=['keymap'],
+            transform=retriever.transform,
+            atransform=retriever.atransform,
+        ))
+    return SequentialChain(memory=memory, verbose=True, chains=chains, input_variables=['input'], output_variables=['response'])
+
+
+@lru_cache(maxsize=None)
+def get_onboard_ia_memory() -> BaseMemory:
+    """
+    Get the memory of the Onboard IA, a token buffer memory within `[memory] onboard_ia_token_budget`. It is shared
+    with the fast path, so the LLM knows about the actions that were performed without it
+
+    :return: The memory
+    """
+    from openjanus.chains.memory import TokenBufferMemory
+
+    return TokenBufferMemory(
+        return_messages=True,
+        memory_key="chat_history",
+        output_key="response",
+        input_key="input",
+        max_token_limit=openjanus_config.get_config().memory.onboard_ia_token_budget,
+    )
+
+
+def onboard_ia_chain_tool(llm: BaseLanguageModel, memory: Optional[BaseMemory] = None, **kwargs) -> Tool:
+    """
+    Generate a tool to expose the onboard IA
+
+    :param llm: The LLM object to use
+    :param memory: the memory object to use, defaults to `get_onboard_ia_memory`
+    :return: A tool with the onboard ship IA
+    """
+    settings = openjanus_config.get_config().onboard_ia
+    if memory is None:
+        memory = get_onboard_ia_memory()
+    retriever = None
+    if settings.keymap_retrieval:
+        from openjanus.chains.onboardia.retrieval import KeymapRetriever
+
+        # Only the keymap rows relevant to the command are put in the prompt
+        retriever = KeymapRetriever(top_k=settings.keymap_top_k, min_score=settings.keymap_min_score)
+    from openjanus.chains.onboardia.plan_cache import get_plan_cache
+
+    # Repeated commands are performed from the cache, without asking the LLM
+    plan_cache = get_plan_cache()
+    if settings.single_call:
+        from openjanus.chains.onboardia.single_call import OnboardIaSingleCallChain
+
+        # One call picks the actions and phrases the response
+        tts_settings = openjanus_config.get_config().tts
+        onboard_ia_chain = OnboardIaSingleCallChain(
+            llm=llm,
+            memory=memory,
+            retriever=retriever,
+            plan_cache=plan_cache,
+            stream_speech=tts_settings.stream_speech,
+            min_sentence_chars=tts_settings.min_sentence_chars,
+            verbose=True,
+        )
+    else:
+        onboard_ia_chain = _onboard_ia_sequential_chain(llm=llm, memory=memory, retriever=retriever, plan_cache=plan_cache)
     onboard_ia_tool = Tool(
-        name="Reply_Onboard_IA",
-        description="Use this tool to assume the role of an Onboard Ship-AI/Computer. This tool can be used to perform actions related to this ship. Pass the user's entire question unaltertered to this tool within the input schema.",
+        name=ONBOARD_IA_TOOL_NAME,
+        description=ONBOARD_IA_TOOL_DESCRIPTION,
         func=onboard_ia_chain.invoke,
         coroutine=onboard_ia_chain.ainvoke,
         verbose=True,
@@ -155,7 +302,8 @@ def onboard_ia_chain_tool(llm: BaseLanguageModel, memory: BaseMemory, **kwargs)
 
 def get_openjanus_tools(llm:BaseChatModel) -> list:
     """
-    Return a list of tools for the base chat agent to use
+    Build every built-in tool immediately. Prefer `openjanus.toolkits.registry.get_openjanus_tools`, which defers
+    building each tool until it is first used
 
     :param llm: A chat llm with a context window
     :return: A list object of tools (i.e. a toolkit)
@@ -163,11 +311,10 @@ def get_openjanus_tools(llm:BaseChatModel) -> list:
     tools = []
     try:
         tools = [
-            atc_chain_tool(llm=llm, memory=ConversationSummaryBufferMemory(llm=llm, return_messages=True, memory_key="chat_history")),
-            # onboard_ia_chain_tool(llm=llm, memory=ConversationSummaryBufferMemory(llm=llm, return_messages=True, memory_key="chat_history", output_key="response", input_key="input")),
-            onboard_ia_chain_tool(llm=llm, memory=ConversationBufferWindowMemory(return_messages=True, memory_key="chat_history", output_key="response", input_key="input")),
-            item_finder_tool(llm=llm, memory=ConversationSummaryBufferMemory(llm=llm, return_messages=True, memory_key="chat_history")),
-            planetary_survey_tool(llm=llm, memory=ConversationSummaryBufferMemory(llm=llm, return_messages=True, memory_key="chat_history"))
+            atc_chain_tool(llm=llm),
+            onboard_ia_chain_tool(llm=llm),
+            item_finder_tool(llm=llm),
+            planetary_survey_tool(llm=llm)
         ]
     except ImportError:
         pass
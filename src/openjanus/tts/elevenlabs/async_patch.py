@@ -5,7 +5,9 @@ import logging
 import os
 from typing import Iterator, Optional, Union
 import websockets
-from websockets.sync.client import connect
+# The asyncio client, so that cancelling the generation closes the websocket. `websockets.client` is the one
+# websockets 12 has, the newer `websockets.asyncio` package only exists from 13 on
+from websockets.client import connect
 
 from elevenlabs.api.tts import TTS, Voice, Model, API, api_base_url_v1, text_chunker
 from elevenlabs import VoiceSettings, is_voice_id
@@ -46,7 +48,7 @@ async def generate_stream_input_async(text, voice: Voice, model: Model, api_key:
 
     async with connect(
             f"wss://api.elevenlabs.io/v1/text-to-speech/{voice.voice_id}/stream-input?model_id={model.model_id}",
-            additional_headers={
+            extra_headers={
                 "xi-api-key": api_key or os.environ.get("ELEVEN_API_KEY")
             },
     ) as websocket:
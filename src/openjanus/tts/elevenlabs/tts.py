@@ -1,5 +1,6 @@
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 import logging
 import pathlib
 import tempfile
@@ -9,16 +10,18 @@ import asyncio
 
 from elevenlabs import Voice
 from langchain.callbacks.manager import CallbackManagerForToolRun
-from langchain.pydantic_v1 import root_validator
+from langchain.pydantic_v1 import Field, root_validator
 from langchain.tools.base import BaseTool
 from langchain.utils import get_from_dict_or_env
 import openjanus.tts.elevenlabs.async_patch as eleven_labs_async_patch
 from openjanus.app.config import get_recordings_dir
+from openjanus.tts.playback import get_speech_interrupter, play_audio_stream
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
 def _import_elevenlabs() -> Any:
     try:
         import elevenlabs
@@ -58,7 +61,7 @@ class ElevenLabsText2SpeechTool(BaseTool):
         "Spanish, Italian, French, Portuguese, and Hindi. "
     )
     voice: Voice
-    output_dir: str = get_recordings_dir()
+    output_dir: str = Field(default_factory=get_recordings_dir)
     output_file_path: Optional[str] = ""
 
     @root_validator(pre=True)
@@ -89,7 +92,7 @@ class ElevenLabsText2SpeechTool(BaseTool):
         elevenlabs = _import_elevenlabs()
         try:
             speech = elevenlabs.generate(text=query, model=self.model, voice=self.voice)
-            elevenlabs.play(speech)
+            self.play_audio(speech)
             self.save_file(audio=speech)
             # with tempfile.NamedTemporaryFile(
             #     mode="bx", suffix=".wav", delete=False
@@ -122,10 +125,33 @@ class ElevenLabsText2SpeechTool(BaseTool):
         """
         elevenlabs = _import_elevenlabs()
         audio = elevenlabs.generate(text=query, voice=self.voice, model=self.model, stream=False, latency=2)
-        elevenlabs.play(audio)
+        self.play_audio(audio)
         if save_message:
             self.save_file(audio)
 
+    def warm_up(self):
+        """Import and patch elevenlabs now, rather than on the first utterance"""
+        _import_elevenlabs()
+
+    def synthesize(self, query: str) -> bytes:
+        """
+        Generate the speech for a text, without playing it
+
+        :param query: The text to speak
+        :return: The audio
+        """
+        elevenlabs = _import_elevenlabs()
+        return elevenlabs.generate(text=query, voice=self.voice, model=self.model, stream=False, latency=2)
+
+    def play_audio(self, audio: bytes) -> None:
+        """
+        Play speech generated by `synthesize`
+
+        :param audio: The audio
+        """
+        # Rather than `elevenlabs.play`, so that it is stopped as soon as speech is interrupted
+        play_audio_stream(iter([audio]), player="ffplay")
+
     def stream_speech(self, text_stream) -> None:
         """Stream the text as speech as it is generated.
         Play the text in your speakers."""
@@ -134,7 +160,7 @@ class ElevenLabsText2SpeechTool(BaseTool):
         for message in text_stream:
             query = message.content
             speech_stream = elevenlabs.generate(text=query, voice=self.voice, model=self.model, stream=True, latency=2)
-            elevenlabs.stream(speech_stream)
+            play_audio_stream(speech_stream)
 
     async def aprocess_message(self, query, save_message):
         elevenlabs = _import_elevenlabs()
@@ -147,7 +173,7 @@ class ElevenLabsText2SpeechTool(BaseTool):
         async for chunk in elevenlabs.agenerate(query, voice=self.voice, model=self.model, stream=True, latency=0):
             audio_chunks.append(chunk)
 
-        elevenlabs.stream(audio_chunks)
+        await asyncio.get_running_loop().run_in_executor(None, play_audio_stream, audio_chunks)
 
         if save_message:
             self.save_file(b''.join(audio_chunks))
@@ -196,7 +222,8 @@ class ElevenLabsText2SpeechTool(BaseTool):
                         self.save_file(audio_bytes)
                     if chunk_text:
                         LOGGER.debug(chunk_text)
-                    elevenlabs.stream(iter([audio_bytes]))
+                    # Played off the event loop, so interrupting it does not wait for the audio to end
+                    await asyncio.get_running_loop().run_in_executor(None, play_audio_stream, [audio_bytes])
                     LOGGER.info("Ending audio stream")
                 except TypeError:
                     break
@@ -212,9 +239,16 @@ class ElevenLabsText2SpeechTool(BaseTool):
         audio_task = asyncio.create_task(process_audio(queue))
 
         tasks = []
-        for combined_message in chunk_messages(text_stream, chunk_size):
-            tasks.append(asyncio.create_task(process_chunks(combined_message)))
-
-        await asyncio.gather(*tasks)
-        await queue.put(None)
-        await audio_task
+        try:
+            for combined_message in chunk_messages(text_stream, chunk_size):
+                tasks.append(asyncio.create_task(process_chunks(combined_message)))
+
+            await asyncio.gather(*tasks)
+            await queue.put(None)
+            await audio_task
+        except asyncio.CancelledError:
+            # Interrupted, e.g. by pressing the listen key again: stop synthesizing and playing what is left
+            for task in tasks + [audio_task]:
+                task.cancel()
+            get_speech_interrupter().interrupt()
+            raise
@@ -0,0 +1,112 @@
+from contextlib import contextmanager
+from functools import lru_cache
+import logging
+import shutil
+import subprocess
+import threading
+from typing import Iterable, Iterator, List, Set
+
+
+LOGGER = logging.getLogger(__name__)
+
+PLAYER_COMMANDS = {
+    "mpv": ["mpv", "--no-cache", "--no-terminal", "--", "fd://0"],
+    "ffplay": ["ffplay", "-autoexit", "-", "-nodisp"],
+}
+
+
+class SpeechInterrupter:
+    """
+    Stops everything that is being spoken, e.g. when the user presses the listen key again
+
+    Every audio player process is tracked while it plays, and killed on `interrupt`. Anything that speaks in several
+    steps, e.g. a `SpeechPipeline`, notes the `generation` it started in and stops once it has moved on.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes: Set[subprocess.Popen] = set()
+        self.generation = 0
+
+    def interrupted_since(self, generation: int) -> bool:
+        """Whether speech was interrupted since `generation` was read"""
+        return self.generation != generation
+
+    @contextmanager
+    def track(self, process: subprocess.Popen) -> Iterator[subprocess.Popen]:
+        """Kill a player process if speech is interrupted while it plays"""
+        with self._lock:
+            self._processes.add(process)
+        try:
+            yield process
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+
+    def interrupt(self) -> int:
+        """
+        Stop speaking
+
+        :return: How many players were stopped
+        """
+        with self._lock:
+            self.generation += 1
+            processes: List[subprocess.Popen] = list(self._processes)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+        return len(processes)
+
+
+@lru_cache(maxsize=None)
+def get_speech_interrupter() -> SpeechInterrupter:
+    """Get the process-wide speech interrupter"""
+    return SpeechInterrupter()
+
+
+@lru_cache(maxsize=None)
+def _which(player: str) -> bool:
+    return shutil.which(player) is not None
+
+
+def play_audio_stream(audio_stream: Iterable[bytes], player: str = "mpv") -> bytes:
+    """
+    Play audio as it arrives, with a player that stops as soon as speech is interrupted
+
+    :param audio_stream: The audio, in any format the player reads, e.g. mp3
+    :param player: `mpv` or `ffplay`, defaults to mpv
+    :return: The audio that was played
+    """
+    if not _which(player):
+        raise ValueError(
+            f"{player} not found, necessary to play audio. "
+            "On mac you can install it with 'brew install mpv ffmpeg'. "
+            "On linux and windows you can install it from https://mpv.io/ or https://ffmpeg.org/"
+        )
+    interrupter = get_speech_interrupter()
+    generation = interrupter.generation
+    process = subprocess.Popen(
+        PLAYER_COMMANDS[player],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    audio = b""
+    with interrupter.track(process):
+        # Interrupted while the player was starting, it was not tracked yet
+        if interrupter.interrupted_since(generation):
+            process.kill()
+        try:
+            for chunk in audio_stream:
+                if chunk is None:
+                    continue
+                process.stdin.write(chunk)  # type: ignore
+                process.stdin.flush()  # type: ignore
+                audio += chunk
+            process.stdin.close()  # type: ignore
+        except (BrokenPipeError, OSError, ValueError):
+            # The player was killed because speech was interrupted
+            pass
+        process.wait()
+    return audio
@@ -0,0 +1,80 @@
+from functools import lru_cache
+import logging
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+from langchain.tools.base import BaseTool
+
+import openjanus.app.config as openjanus_config
+from openjanus.utils.exceptions import TtsNotImplementedException
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _get_tts_tool_factory(tts_engine: str) -> Callable[[], BaseTool]:
+    """Resolve a TTS engine, importing it the first time speech is needed rather than at import time"""
+    if tts_engine == "elevenlabs":
+        from openjanus.tts.elevenlabs.chat import get_tool as get_tts_tool
+    elif tts_engine == "whisper":
+        from openjanus.tts.whisper.chat import get_tool as get_tts_tool
+    else:
+        raise TtsNotImplementedException(tts_engine)
+    return get_tts_tool
+
+
+class TtsService:
+    """
+    The one TTS tool that every chain and callback speaks with
+
+    The tool, and the client and connections it holds, are built on first use and then kept between utterances. They
+    are only built again if the TTS engine, or its section of the config, is changed.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tool: Optional[BaseTool] = None
+        self._key: Optional[Tuple[str, Any]] = None
+
+    @staticmethod
+    def _config_key() -> Tuple[str, Any]:
+        """What the tool is built from, reading it costs a `stat` of the config file"""
+        config = openjanus_config.get_config()
+        tts_engine = openjanus_config.get_tts_engine().lower()
+        settings = config.elevenlabs if tts_engine == "elevenlabs" else config.openai_whisper
+        return tts_engine, settings
+
+    @property
+    def tool(self) -> BaseTool:
+        """The TTS tool for the configured engine"""
+        key = self._config_key()
+        tool = self._tool
+        if tool is not None and key == self._key:
+            return tool
+        with self._lock:
+            if self._tool is None or key != self._key:
+                if self._tool is not None:
+                    LOGGER.info("The TTS config changed, building the TTS tool again")
+                self._tool = _get_tts_tool_factory(key[0])()
+                self._key = key
+            return self._tool
+
+    def warm_up(self):
+        """Build the tool, and whatever it keeps between utterances, now rather than on the first utterance"""
+        tool = self.tool
+        warm_up = getattr(tool, "warm_up", None)
+        if warm_up is not None:
+            warm_up()
+
+    def speak(self, text: str) -> Any:
+        """
+        Speak a text, waiting until it has been played
+
+        :param text: The text to speak
+        """
+        return self.tool.run({"query": text})
+
+
+@lru_cache(maxsize=None)
+def get_tts_service() -> TtsService:
+    """Get the process-wide TTS service"""
+    return TtsService()
@@ -0,0 +1,376 @@
+import logging
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.schema.output import LLMResult
+from langchain.tools.base import BaseTool
+
+from openjanus.tts.playback import get_speech_interrupter
+
+
+LOGGER = logging.getLogger(__name__)
+
+# The end of a sentence: its punctuation, any closing quotes or brackets, then whitespace
+_SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+|\n+")
+# Where to break a sentence that is too long to wait for
+_CLAUSE_END = re.compile(r"[,;:—]\s+")
+# Abbreviations whose full stop does not end a sentence
+_ABBREVIATIONS = ("e.g.", "i.e.", "etc.", "vs.", "mr.", "mrs.", "dr.", "st.", "no.", "approx.")
+
+
+class SentenceSegmenter:
+    """
+    Splits text that is being streamed into sentences, so each sentence can be spoken as soon as it is complete
+
+    Sentences shorter than `min_chars` are joined to the next one, rather than being spoken on their own. Text that
+    runs for `max_chars` without ending a sentence is broken at the last clause, or word, that fits.
+    """
+    def __init__(self, min_chars: int = 20, max_chars: int = 250):
+        """
+        Initialises the SentenceSegmenter
+
+        :param min_chars: The shortest text to speak on its own, defaults to 20
+        :param max_chars: The longest text to wait for the end of a sentence for, defaults to 250
+        """
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Add the next piece of text
+
+        :param text: The text streamed since the last call
+        :return: The sentences completed by this text, in order
+        """
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            end = match.end()
+            candidate = self._buffer[start:end].strip()
+            if len(candidate) < self.min_chars or candidate.lower().endswith(_ABBREVIATIONS):
+                continue
+            sentences.append(candidate)
+            start = end
+        self._buffer = self._buffer[start:]
+        while len(self._buffer) > self.max_chars:
+            head = self._buffer[:self.max_chars]
+            breaks = [match.end() for match in _CLAUSE_END.finditer(head)] or [head.rfind(" ") + 1]
+            cut = breaks[-1] if breaks[-1] > 0 else self.max_chars
+            sentences.append(self._buffer[:cut].strip())
+            self._buffer = self._buffer[cut:]
+        return [sentence for sentence in sentences if sentence]
+
+    def flush(self) -> Optional[str]:
+        """
+        End the text
+
+        :return: Whatever was left after the last complete sentence, if anything
+        """
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest or None
+
+
+class JsonFieldExtractor:
+    """
+    Finds the text of one string field of a JSON response while it is being streamed, e.g. `response` in
+    `{"actions": [...], "response": "..."}`
+
+    Only the text of the field is passed on, decoded, as it arrives.
+    """
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "", "f": "", "n": "\n", "r": "", "t": " "}
+
+    def __init__(self, field: str):
+        """
+        Initialises the JsonFieldExtractor
+
+        :param field: The name of the field
+        """
+        self._start = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._text = ""
+        self._position: Optional[int] = None
+        self._done = False
+
+    def _find_start(self) -> Optional[int]:
+        """Where the text of the field starts, once it has arrived"""
+        start = self._start.search(self._text)
+        return None if start is None else start.end()
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add the next chunk of the response
+
+        :param chunk: The text streamed since the last call
+        :return: The text of the field decoded from it, if any
+        """
+        self._text += chunk
+        if self._done:
+            return ""
+        if self._position is None:
+            self._position = self._find_start()
+            if self._position is None:
+                return ""
+        decoded = []
+        index = self._position
+        text = self._text
+        while index < len(text):
+            char = text[index]
+            if char == '"':
+                self._done = True
+                break
+            if char == "\\":
+                # Wait for the whole escape sequence
+                if index + 1 >= len(text):
+                    break
+                escaped = text[index + 1]
+                if escaped == "u":
+                    if index + 6 > len(text):
+                        break
+                    try:
+                        decoded.append(chr(int(text[index + 2:index + 6], 16)))
+                    except ValueError:
+                        pass
+                    index += 6
+                    continue
+                decoded.append(self._ESCAPES.get(escaped, escaped))
+                index += 2
+                continue
+            decoded.append(char)
+            index += 1
+        self._position = index
+        return "".join(decoded)
+
+
+class FinalAnswerExtractor(JsonFieldExtractor):
+    """
+    Finds the final answer of a conversational agent while its response is being streamed
+
+    The agent answers with a JSON blob, e.g. `{"action": "Final Answer", "action_input": "..."}`. Only the text of
+    `action_input` is passed on, decoded, and only when the action is the final answer, not a tool.
+    """
+    _ACTION = re.compile(r'"action"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+    def __init__(self):
+        super().__init__("action_input")
+
+    def _find_start(self) -> Optional[int]:
+        action = self._ACTION.search(self._text)
+        start = super()._find_start()
+        if action is None or start is None:
+            return None
+        if action.group(1) != "Final Answer":
+            self._done = True
+            return None
+        return start
+
+
+class SpeechPipeline:
+    """
+    Speaks sentences in order, synthesizing the next sentence while the current one is being played
+
+    TTS tools that can `synthesize` audio and `play_audio` it separately are pipelined. Any other tool is simply
+    `run` with each sentence in turn.
+    """
+    _END = object()
+
+    def __init__(self, tts: BaseTool):
+        """
+        Initialises the SpeechPipeline, and starts its threads
+
+        :param tts: The TTS tool to speak with
+        """
+        self.tts = tts
+        self.interrupter = get_speech_interrupter()
+        # Speech interrupted after this is not spoken, e.g. the user pressed the listen key again
+        self.generation = self.interrupter.generation
+        self.started = time.perf_counter()
+        self.first_audio: Optional[float] = None
+        self._texts: queue.Queue = queue.Queue()
+        self._audio: queue.Queue = queue.Queue()
+        self._pipelined = hasattr(tts, "synthesize") and hasattr(tts, "play_audio")
+        self._synthesizer = threading.Thread(target=self._synthesize, name="openjanus-tts-synthesize", daemon=True)
+        self._player = threading.Thread(target=self._play, name="openjanus-tts-play", daemon=True)
+        self._synthesizer.start()
+        self._player.start()
+
+    @property
+    def interrupted(self) -> bool:
+        return self.interrupter.interrupted_since(self.generation)
+
+    def say(self, text: str):
+        """Queue a sentence to be spoken, after any queued before it"""
+        if self.interrupted:
+            return
+        LOGGER.debug(f"Speaking {text!r}")
+        self._texts.put(text)
+
+    def close(self):
+        """Stop taking sentences, the ones already queued are still spoken"""
+        self._texts.put(self._END)
+
+    def wait(self, timeout: Optional[float] = None):
+        """Wait until every queued sentence has been spoken, or speech is interrupted"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self._player.is_alive() and not self.interrupted:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            self._player.join(0.05)
+
+    def _synthesize(self):
+        while True:
+            text = self._texts.get()
+            if text is self._END or self.interrupted:
+                self._audio.put(self._END)
+                return
+            try:
+                self._audio.put((text, self.tts.synthesize(text) if self._pipelined else None))
+            except Exception as e:
+                LOGGER.error(f"Failed to synthesize {text!r}", exc_info=e)
+
+    def _play(self):
+        while True:
+            item = self._audio.get()
+            if item is self._END or self.interrupted:
+                return
+            text, audio = item
+            if self.first_audio is None:
+                self.first_audio = time.perf_counter()
+                LOGGER.info(f"First audio after {(self.first_audio - self.started) * 1000:.0f}ms")
+            try:
+                if self._pipelined:
+                    self.tts.play_audio(audio)
+                else:
+                    self.tts.run({"query": text})
+            except Exception as e:
+                LOGGER.error(f"Failed to play {text!r}", exc_info=e)
+
+
+class SpeechStream:
+    """
+    Speaks a response while it is being streamed, a sentence at a time
+
+    With an extractor, only the text it extracts is spoken, e.g. one field of a JSON response. Nothing is synthesized
+    until the first sentence is complete.
+    """
+    def __init__(self, extractor: Optional[JsonFieldExtractor] = None, min_chars: int = 20, tts: Optional[BaseTool] = None):
+        """
+        Initialises the SpeechStream
+
+        :param extractor: Picks the text to speak out of the response, defaults to speaking all of it
+        :param min_chars: The shortest text to speak on its own, defaults to 20
+        :param tts: The TTS tool to speak with, defaults to the configured one
+        """
+        self.segmenter = SentenceSegmenter(min_chars=min_chars)
+        self.extractor = extractor
+        self.tts = tts
+        self.pipeline: Optional[SpeechPipeline] = None
+
+    @property
+    def started(self) -> bool:
+        """Whether anything has been spoken, or queued to be"""
+        return self.pipeline is not None
+
+    def _get_tts(self) -> BaseTool:
+        if self.tts is not None:
+            return self.tts
+        from openjanus.chains.base import get_tool as get_tts_tool
+        return get_tts_tool()
+
+    def _say(self, sentences: List[str]):
+        for sentence in sentences:
+            if self.pipeline is None:
+                self.pipeline = SpeechPipeline(self._get_tts())
+            self.pipeline.say(sentence)
+
+    def feed(self, chunk: str):
+        """
+        Add the next chunk of the response, speaking every sentence it completes
+
+        :param chunk: The text streamed since the last call
+        """
+        text = self.extractor.feed(chunk) if self.extractor is not None else chunk
+        if text:
+            self._say(self.segmenter.feed(text))
+
+    def finish(self, wait: bool = True):
+        """
+        End the response, speaking whatever is left of it
+
+        :param wait: Whether to wait until it has all been spoken, defaults to True
+        """
+        rest = self.segmenter.flush()
+        if rest:
+            self._say([rest])
+        if self.pipeline is not None:
+            self.pipeline.close()
+            if wait:
+                self.pipeline.wait()
+
+    def abort(self):
+        """Stop taking text, whatever was already queued is still spoken"""
+        if self.pipeline is not None:
+            self.pipeline.close()
+
+
+class StreamingSpeechHandler(BaseCallbackHandler):
+    """
+    Speaks an LLM's response while it is being generated, a sentence at a time
+
+    Attach it to the LLM of a chain or agent whose output is spoken. Once the response is complete, the handler waits
+    for the last sentence to be spoken, so the chain ends when speaking does, like it did when the whole output was
+    spoken at the end.
+    """
+    def __init__(self, final_answer_only: bool = False, min_chars: int = 20, tts: Optional[BaseTool] = None):
+        """
+        Initialises the StreamingSpeechHandler
+
+        :param final_answer_only: Only speak the final answer of a conversational agent, rather than the whole
+            response, defaults to False
+        :param min_chars: The shortest text to speak on its own, defaults to 20
+        :param tts: The TTS tool to speak with, defaults to the configured one
+        """
+        self.final_answer_only = final_answer_only
+        self.min_chars = min_chars
+        self.tts = tts
+        self._responses: Dict[UUID, SpeechStream] = {}
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> Any:
+        self._start(run_id)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> Any:
+        self._start(run_id)
+
+    def _start(self, run_id: UUID):
+        stream = SpeechStream(
+            extractor=FinalAnswerExtractor() if self.final_answer_only else None,
+            min_chars=self.min_chars,
+            tts=self.tts,
+        )
+        with self._lock:
+            self._responses[run_id] = stream
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> Any:
+        with self._lock:
+            stream = self._responses.get(run_id)
+        if stream is not None and token:
+            stream.feed(token)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> Any:
+        with self._lock:
+            stream = self._responses.pop(run_id, None)
+        if stream is not None:
+            stream.finish()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> Any:
+        with self._lock:
+            stream = self._responses.pop(run_id, None)
+        # Whatever was already queued is still spoken, the rest of the response never arrives
+        if stream is not None:
+            stream.abort()
@@ -1,20 +1,28 @@
 import asyncio
 from datetime import datetime
+from functools import lru_cache
 import logging
 import pathlib
 import shutil
-import subprocess
 from typing import Any, Dict, Optional, Union, Iterator, Literal
 
+from langchain.pydantic_v1 import PrivateAttr
 from langchain.tools.base import BaseTool
 
 from openjanus.app.config import get_recordings_dir
 from openjanus.app.config import get_openai_whisper_config
+from openjanus.tts.playback import play_audio_stream
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def _which(lib_name: str) -> Optional[str]:
+    """Look for a program on the path once, rather than before every utterance"""
+    return shutil.which(lib_name)
+
+
 class OpenAIWhisperSpeaker(BaseTool):
     """Use OpenAI as a speech to text engine
     Speech generation is with the OpenAI Whisper model."""
@@ -23,34 +31,52 @@ class OpenAIWhisperSpeaker(BaseTool):
     api_key: Optional[str]
     voice_id: Optional[Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"]] = "nova"
     voice_model: Optional[Union[str, Literal["tts-1", "tts-1-hd"]]]
-    output_dir: str = get_recordings_dir()
+    output_dir: str = ""
     output_file_path: Optional[str] = ""
     verbose: bool = True
-    config: Dict[str, Any] = get_openai_whisper_config()
+    config: Dict[str, Any] = {}
+    _client: Any = PrivateAttr(default=None)
 
     def __init__(
             self, 
             api_key: Optional[str] = None, 
             voice_id: Optional[Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"]] = "nova",
             voice_model: Optional[Union[str, Literal["tts-1", "tts-1-hd"]]] = "tts-1",
-            output_dir: str = get_recordings_dir(),
-            config: Dict[str, Any] = get_openai_whisper_config(),
+            output_dir: Optional[str] = None,
+            config: Optional[Dict[str, Any]] = None,
             *args,
             **kwargs
         ) -> None:
         super().__init__(*args, **kwargs)
-        self.config = config
+        # Resolved here rather than in the signature, so importing this module does not read the config
+        self.config = config if config is not None else get_openai_whisper_config()
         self.api_key = api_key
         self.voice_id = self.config.get('whisper_voice_id', voice_id)
         self.voice_model = self.config.get('whisper_voice_model', voice_model)
-        self.output_dir = output_dir
+        self.output_dir = output_dir if output_dir is not None else get_recordings_dir()
         self.output_file_path = ""
 
+    @property
+    def client(self) -> Any:
+        """The OpenAI client, created once so that its connections are kept between utterances"""
+        if self._client is None:
+            try:
+                import openai
+            except ImportError:
+                raise ImportError(
+                    "openai package not found, please install it with "
+                    "`pip install openai`"
+                )
+            self._client = openai.OpenAI(api_key=self.api_key) if self.api_key else openai.OpenAI()
+        return self._client
+
+    def warm_up(self):
+        """Create the client and look for the audio player now, rather than on the first utterance"""
+        _ = self.client
+        self.is_installed("mpv")
+
     def is_installed(self, lib_name: str) -> bool:
-        lib = shutil.which(lib_name)
-        if lib is None:
-            return False
-        return True
+        return _which(lib_name) is not None
 
     def set_recording_path(self):
         # TODO: Clean this up, set from config, etc
@@ -67,27 +93,8 @@ class OpenAIWhisperSpeaker(BaseTool):
             )
             raise ValueError(message)
 
-        mpv_command = ["mpv", "--no-cache", "--no-terminal", "--", "fd://0"]
-        mpv_process = subprocess.Popen(
-            mpv_command,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-
-        audio = b""
-
-        for chunk in audio_stream:
-            if chunk is not None:
-                mpv_process.stdin.write(chunk)  # type: ignore
-                mpv_process.stdin.flush()  # type: ignore
-                audio += chunk
-
-        if mpv_process.stdin:
-            mpv_process.stdin.close()
-        mpv_process.wait()
-
-        return audio
+        # Stopped as soon as speech is interrupted, e.g. by pressing the listen key again
+        return play_audio_stream(audio_stream, player="mpv")
     
     # Ripped from elevenlabs
     def play(self, audio: bytes, notebook: bool = False, use_ffmpeg: bool = True) -> None:
@@ -103,15 +110,7 @@ class OpenAIWhisperSpeaker(BaseTool):
                     "On linux and windows you can install it from https://ffmpeg.org/"
                 )
                 raise ValueError(message)
-            args = ["ffplay", "-autoexit", "-", "-nodisp"]
-            proc = subprocess.Popen(
-                args=args,
-                stdout=subprocess.PIPE,
-                stdin=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-            out, err = proc.communicate(input=audio)
-            proc.poll()
+            play_audio_stream(iter([audio]), player="ffplay")
         else:
             try:
                 import io
@@ -126,26 +125,35 @@ class OpenAIWhisperSpeaker(BaseTool):
             sd.play(*sf.read(io.BytesIO(audio)))
             sd.wait()
 
+    def synthesize(self, query: str) -> bytes:
+        """
+        Generate the speech for a text, without playing it
+
+        :param query: The text to speak
+        :return: The audio
+        """
+        return self.client.audio.speech.create(
+            model=self.voice_model,  # type: ignore
+            voice=self.voice_id,  # type: ignore
+            input=query
+        ).content
+
+    def play_audio(self, audio: bytes) -> None:
+        """
+        Play speech generated by `synthesize`
+
+        :param audio: The audio
+        """
+        self.stream_audio(audio_stream=iter([audio]))
+
     def _run(self, query: str, *args: Any, **kwargs: Any) -> Any:
         import io
 
-        try:
-            import openai
-        except ImportError:
-            raise ImportError(
-                "openai package not found, please install it with "
-                "`pip install openai`"
-            )
-        
-        # Set the API key if provided
-        if self.api_key:
-            openai.api_key = self.api_key
-        
         # TODO: Set from config
         self.set_recording_path()
 
         try:
-            response = openai.audio.speech.create(
+            response = self.client.audio.speech.create(
                 model=self.voice_model,  # type: ignore
                 voice=self.voice_id,  # type: ignore
                 input=query
@@ -169,18 +177,6 @@ class OpenAIWhisperSpeaker(BaseTool):
     async def _arun(self, stream, *args: Any, **kwargs: Any) -> Any:
         import io
 
-        try:
-            import openai
-        except ImportError:
-            raise ImportError(
-                "openai package not found, please install it with "
-                "`pip install openai`"
-            )
-        
-        # Set the API key if provided
-        if self.api_key:
-            openai.api_key = self.api_key
-        
         # TODO: Set from config
         self.set_recording_path()
 
@@ -207,7 +203,8 @@ class OpenAIWhisperSpeaker(BaseTool):
                 # LOGGER.debug(f"Wrote response to {self.output_file_path}")
                 if chunk_text:
                     LOGGER.debug(chunk_text)
-                self.stream_audio(audio_stream=iter([audio_bytes]))
+                # Played off the event loop, so interrupting it does not wait for the audio to end
+                await asyncio.get_running_loop().run_in_executor(None, self.stream_audio, iter([audio_bytes]))
                 LOGGER.info("Ending audio stream")
                 with open(self.output_file_path, 'wb') as f:  # type: ignore
                     f.write(audio_bytes)
@@ -217,7 +214,7 @@ class OpenAIWhisperSpeaker(BaseTool):
 
         async def process_chunks(chunk_text):
             audio_bytes = []
-            audio_chunk = openai.audio.speech.create(
+            audio_chunk = self.client.audio.speech.create(
                 model=self.voice_model,  # type: ignore
                 voice=self.voice_id,  # type: ignore
                 input=chunk_text
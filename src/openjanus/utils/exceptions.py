@@ -34,6 +34,12 @@ class TtsNotImplementedException(Exception):
         super().__init__(message)
 
 
+class SttNotImplementedException(Exception):
+    def __init__(self, stt_engine: str):
+        message = f"The STT engine {stt_engine} is not implemented"
+        super().__init__(message)
+
+
 class DirectoryCreationException(Exception):
     def __init__(self, directory: str):
         message = f"Failed to create the {directory} directory"
@@ -46,6 +52,12 @@ class ListenKeyNotSupportedException(Exception):
         super().__init__(message)
 
 
+class ListenModeNotSupportedException(Exception):
+    def __init__(self, listen_mode: str):
+        message = f"The listen mode {listen_mode} is not supported, it must be one of `push_to_talk` or `continuous`"
+        super().__init__(message)
+
+
 class TtsMpvNotFoundException(Exception):
     def __init__(self):
         message = f"mpv.exe is not found"
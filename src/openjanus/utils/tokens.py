@@ -0,0 +1,54 @@
+from functools import lru_cache
+import logging
+from typing import Any
+
+from langchain.schema.messages import BaseMessage
+
+
+LOGGER = logging.getLogger(__name__)
+
+# What every chat message costs on top of its content: the tokens framing it, and its role
+TOKENS_PER_MESSAGE = 4
+# Set once the encoding failed to load, so it is not tried again on every message
+_estimate_only = False
+
+
+@lru_cache(maxsize=None)
+def _get_encoding() -> Any:
+    try:
+        import tiktoken
+    except ImportError:
+        raise ImportError(
+            "tiktoken package not found, please install it with "
+            "`pip install tiktoken`"
+        )
+    return tiktoken.encoding_for_model("gpt-3.5-turbo")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text, as the chat models see them
+
+    :param text: The text
+    :return: The number of tokens
+    """
+    return len(_get_encoding().encode(text))
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    """
+    Count the tokens a chat message takes up in a prompt
+
+    :param message: The message
+    :return: The number of tokens, estimated from its length if the encoding cannot be loaded
+    """
+    global _estimate_only
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if not _estimate_only:
+        try:
+            return TOKENS_PER_MESSAGE + count_tokens(content)
+        except Exception as e:
+            # The encoding is downloaded on first use, an estimate is better than losing the conversation
+            LOGGER.warning(f"Could not load the token encoding, estimating token counts from lengths instead: {e}")
+            _estimate_only = True
+    return TOKENS_PER_MESSAGE + (len(content) + 3) // 4
@@ -0,0 +1,114 @@
+import json
+
+from openjanus.chains.onboardia.actions import ActionDispatcher, StreamingActionParser
+from openjanus.chains.onboardia.executor import ActionExecutor, VirtualInputBackend
+
+
+RESPONSE = """```json
+{
+      "actions":
+      [
+        {
+          "keys": ["n"],
+          "hold": false,
+          "action_name": "Landing Gear"
+        },
+        {
+          "keys": ["left alt", "n"],
+          "hold": false,
+          "action_name": "Request landing/take off, \\"now\\" {please}"
+        }
+      ],
+      "response": "Gear down, requesting landing."
+}
+```"""
+
+
+def _feed_in_chunks(parser: StreamingActionParser, text: str, size: int):
+    """Feed a response in chunks, noting how much of it had arrived when each action was completed"""
+    completed = []
+    for start in range(0, len(text), size):
+        for action in parser.feed(text[start:start + size]):
+            completed.append((start + size, action))
+    for action in parser.close():
+        completed.append((len(text), action))
+    return completed
+
+
+def test_actions_are_completed_as_soon_as_their_brace_arrives():
+    for size in (1, 3, 7, 64, len(RESPONSE)):
+        completed = _feed_in_chunks(StreamingActionParser(), RESPONSE, size)
+        assert [action["action_name"] for _, action in completed] == [
+            "Landing Gear",
+            'Request landing/take off, "now" {please}',
+        ]
+        # The first action is performed before the second one is generated
+        first_end = RESPONSE.index("}") + 1
+        assert completed[0][0] < first_end + size
+
+
+def test_partial_response_yields_only_complete_actions():
+    parser = StreamingActionParser()
+    partial = RESPONSE[:RESPONSE.index('"Request landing')]
+    assert [action["action_name"] for action in parser.feed(partial)] == ["Landing Gear"]
+    assert parser.close() == []
+    assert not parser.done
+
+
+def test_bare_list_of_actions():
+    text = json.dumps([{"keys": ["l"], "action_name": "Toogle Ship Lights"}, {"keys": ["r"], "action_name": "Flight Ready"}])
+    completed = _feed_in_chunks(StreamingActionParser(), text, 5)
+    assert [action["action_name"] for _, action in completed] == ["Toogle Ship Lights", "Flight Ready"]
+
+
+def test_single_action_object_in_place_of_the_list():
+    text = '{"actions": {"keys": ["l"], "hold": false, "action_name": "Toogle Ship Lights"}}'
+    completed = _feed_in_chunks(StreamingActionParser(), text, 4)
+    assert [action["action_name"] for _, action in completed] == ["Toogle Ship Lights"]
+
+
+def test_bare_action_object_is_found_on_close():
+    parser = StreamingActionParser()
+    assert parser.feed('{"keys": ["l"], "hold": false, "action_name": "Toogle Ship Lights"}') == []
+    assert [action["action_name"] for action in parser.close()] == ["Toogle Ship Lights"]
+
+
+def test_missing_commas_are_repaired():
+    text = '{"actions": [{"keys": ["n"]\n"hold": false\n"action_name": "Landing Gear",}]}'
+    assert _feed_in_chunks(StreamingActionParser(), text, 2)[0][1] == {"keys": ["n"], "hold": False, "action_name": "Landing Gear"}
+
+
+def test_empty_list_of_actions():
+    parser = StreamingActionParser()
+    assert parser.feed('{"actions": [], "response": "Nothing to do."}') == []
+    assert parser.done
+    assert parser.close() == []
+
+
+class FailingBackend(VirtualInputBackend):
+    """Fails to press one key, like a game window that refuses input"""
+    def key_down(self, code):
+        if code == "x":
+            raise OSError("SendInput failed")
+        super().key_down(code)
+
+
+def test_dispatcher_reports_failed_actions():
+    dispatcher = ActionDispatcher(ActionExecutor(FailingBackend(), tap_seconds=0.01, gap_seconds=0.01))
+    dispatcher.dispatch([
+        {"keys": ["n"], "action_name": "Landing Gear"},
+        {"keys": ["x"], "action_name": "Broken"},
+        {"keys": ["not a key"], "action_name": "Unknown"},
+    ])
+    summary = dispatcher.wait()
+    assert summary == "Actions ['Landing Gear'] Completed Successfully, Actions ['Broken', 'Unknown'] Failed"
+    assert not dispatcher.succeeded
+
+
+def test_dispatcher_succeeds_only_when_every_action_did():
+    dispatcher = ActionDispatcher(ActionExecutor(VirtualInputBackend(), tap_seconds=0.01, gap_seconds=0.01))
+    assert dispatcher.wait() == "No actions performed"
+    assert not dispatcher.succeeded
+    dispatcher.dispatch([{"keys": ["n"], "action_name": "Landing Gear"}])
+    assert dispatcher.wait() == "Actions ['Landing Gear'] Completed Successfully"
+    assert dispatcher.succeeded
@@ -0,0 +1,121 @@
+import sys
+import types
+
+import pytest
+
+from openjanus.chains.onboardia.executor import ActionExecutor, DirectInputBackend, VirtualInputBackend
+from openjanus.chains.onboardia.keymap import get_keymap
+
+
+TAP = 0.02
+GAP = 0.03
+HOLD = 0.1
+# How far off the executor thread may send an event, scheduling on a busy machine is not exact
+SLACK = 0.02
+
+
+@pytest.fixture
+def direct_input(monkeypatch) -> DirectInputBackend:
+    """A DirectInput backend that can compile keys off Windows, nothing is sent with it"""
+    monkeypatch.setitem(sys.modules, "pydirectinput", types.ModuleType("pydirectinput"))
+    return DirectInputBackend()
+
+
+@pytest.fixture
+def virtual() -> VirtualInputBackend:
+    return VirtualInputBackend()
+
+
+def _close(actual: float, expected: float) -> bool:
+    return abs(actual - expected) < SLACK
+
+
+def _run(backend: VirtualInputBackend, actions, **kwargs):
+    executor = ActionExecutor(backend, tap_seconds=TAP, hold_seconds=HOLD, gap_seconds=GAP, **kwargs)
+    summary = executor.submit(actions).result(timeout=5)
+    return summary, backend.events
+
+
+def test_every_keymap_binding_compiles(virtual, direct_input):
+    entries = [entry for entry in get_keymap() if entry.is_executable]
+    assert entries
+    for entry in entries:
+        for key in entry.keys:
+            virtual.compile_key(key)
+            direct_input.compile_key(key)
+        if entry.mouse is not None:
+            virtual.compile_button(entry.mouse)
+            direct_input.compile_button(entry.mouse)
+
+
+def test_numpad_keys_are_numpad_scan_codes(direct_input):
+    codes = {digit: direct_input.compile_key(f"numpad {digit}") for digit in "1245678"}
+    assert codes == {"1": 0x4F, "2": 0x50, "4": 0x4B, "5": 0x4C, "6": 0x4D, "7": 0x47, "8": 0x48}
+    # Extended keys keep their prefix, so they are not sent as their left hand twin
+    assert direct_input.compile_key("right alt") != direct_input.compile_key("left alt")
+
+
+def test_unknown_keys_are_rejected(virtual, direct_input):
+    for backend in (virtual, direct_input):
+        with pytest.raises(ValueError):
+            backend.compile_key("numpad8")
+
+
+def test_tap_is_released_after_tap_seconds(virtual):
+    summary, events = _run(virtual, [{"keys": ["n"], "action_name": "Landing Gear"}])
+    assert [(event.kind, event.code) for event in events] == [("key_down", "n"), ("key_up", "n")]
+    assert _close(events[1].time - events[0].time, TAP)
+    assert "Landing Gear" in summary
+
+
+def test_modifiers_are_pressed_in_order_and_released_in_reverse(virtual):
+    _, events = _run(virtual, [{"keys": ["Left ALT", "N"], "action_name": "Request landing/take off"}])
+    assert [(event.kind, event.code) for event in events] == [
+        ("key_down", "left alt"),
+        ("key_down", "n"),
+        ("key_up", "n"),
+        ("key_up", "left alt"),
+    ]
+
+
+def test_holds_of_different_keys_overlap(virtual):
+    actions = [
+        {"keys": ["hold b"], "action_name": "Quantum Travel"},
+        {"keys": ["numpad 8"], "action_name": "Shields Front"},
+    ]
+    _, events = _run(virtual, actions)
+    times = {(event.kind, event.code): event.time for event in events}
+    # The second action starts a gap after the first rather than after its release
+    assert _close(times["key_down", "numpad 8"] - times["key_down", "b"], GAP)
+    assert times["key_up", "numpad 8"] < times["key_up", "b"]
+    assert _close(times["key_up", "b"] - times["key_down", "b"], HOLD)
+
+
+def test_held_key_is_released_before_it_is_pressed_again(virtual):
+    actions = [
+        {"keys": ["b"], "hold": True, "action_name": "Quantum Travel"},
+        {"keys": ["b"], "action_name": "Quantum Travel"},
+    ]
+    _, events = _run(virtual, actions)
+    assert [event.kind for event in events] == ["key_down", "key_up", "key_down", "key_up"]
+    assert events[2].time >= events[1].time
+
+
+def test_modifier_and_mouse_button(virtual):
+    action = {"keys": ["left alt"], "mouse": {"button": "Right Mouse Button", "clicks": 2}, "action_name": "Test"}
+    _, events = _run(virtual, [action])
+    assert [(event.kind, event.code) for event in events] == [
+        ("key_down", "left alt"),
+        ("mouse_down", "right"),
+        ("mouse_up", "right"),
+        ("mouse_down", "right"),
+        ("mouse_up", "right"),
+        ("key_up", "left alt"),
+    ]
+
+
+def test_unknown_key_fails_the_submission(virtual):
+    executor = ActionExecutor(virtual, tap_seconds=TAP, hold_seconds=HOLD, gap_seconds=GAP)
+    with pytest.raises(ValueError):
+        executor.submit([{"keys": ["not a key"], "action_name": "Nothing"}]).result(timeout=5)
+    assert virtual.events == []
@@ -0,0 +1,116 @@
+from openjanus.chains.memory import TokenBufferMemory
+from openjanus.chains.onboardia import fastpath
+from openjanus.chains.onboardia.fastpath import KeymapMatcher, OnboardIaFastPath
+from openjanus.chains.onboardia.keymap import KeymapEntry
+
+
+def _entry(action_name: str, binding: str, keys: tuple, section: str = "Flight Controls") -> KeymapEntry:
+    return KeymapEntry(section=section, action_name=action_name, binding=binding, keys=keys, aliases=(action_name,))
+
+
+class _Agent:
+    def __init__(self):
+        self.inputs = []
+
+    def invoke(self, inputs, *args, **kwargs):
+        self.inputs.append(inputs)
+        return {**inputs, "output": "from the agent"}
+
+
+def test_exact_name_matches():
+    matched = KeymapMatcher().match("flight ready")
+    assert [entry.action_name for entry in matched.entries] == ["Flight Ready"]
+    assert matched.score == 1.0
+
+
+def test_several_clauses_match_in_order():
+    matched = KeymapMatcher().match("landing gear and then lights on")
+    assert [entry.action_name for entry in matched.entries] == ["Landing Gear", "Toogle Ship Lights"]
+
+
+def test_one_unmatched_clause_leaves_the_command_to_the_llm():
+    assert KeymapMatcher().match("flight ready and plot a course to Crusader") is None
+
+
+def test_threshold():
+    entries = [_entry("Cruise Control", "C", ("c",))]
+    # "cruise contrl" scores ~0.96 against "cruise control"
+    assert KeymapMatcher(entries, threshold=0.9).match("cruise contrl") is not None
+    assert KeymapMatcher(entries, threshold=0.99).match("cruise contrl") is None
+
+
+def test_margin_over_a_different_binding():
+    entries = [_entry("Cruise Control", "C", ("c",)), _entry("Cruise Central", "X", ("x",))]
+    # A mistranscription that is as close to one name as to the other
+    assert KeymapMatcher(entries, threshold=0.5).match("cruise contral") is None
+    assert KeymapMatcher(entries, threshold=0.5, margin=0.0).match("cruise contral") is not None
+
+
+def test_other_names_for_the_same_binding_are_not_ambiguous():
+    entries = [_entry("Landing Gear", "N", ("n",)), _entry("Request Docking", "N", ("n",))]
+    assert KeymapMatcher(entries, threshold=0.5, margin=0.5).match("landing gear") is not None
+
+
+def test_weapons_need_an_exact_match():
+    matcher = KeymapMatcher()
+    assert matcher.match("fire weapon group 1") is not None
+    # Close to both weapon groups, fine for a flight control but not for a weapon
+    assert matcher.match("fire weapon group one") is None
+
+
+def test_countermeasures_need_a_clear_margin():
+    entries = [
+        _entry("Deploy Decoy", "Hold H", ("h",), section="Shields and Countermeasures"),
+        _entry("Deploy Noise", "J", ("j",), section="Shields and Countermeasures"),
+    ]
+    assert KeymapMatcher(entries, threshold=0.5, guarded_threshold=0.5).match("deploy decoy") is not None
+    assert KeymapMatcher(entries, threshold=0.5, guarded_threshold=0.5, guarded_margin=0.9).match("deploy decoys") is None
+    assert KeymapMatcher(entries, threshold=0.5, guarded_threshold=0.5, guarded_margin=0.1).match("deploy decoys") is not None
+
+
+def test_fast_path_saves_performed_commands_to_memory(monkeypatch):
+    performed = []
+    monkeypatch.setattr(fastpath, "perform_actions", lambda actions: performed.append(actions))
+    memory = TokenBufferMemory(return_messages=True, memory_key="chat_history", input_key="input", output_key="response")
+    agent = _Agent()
+    fast_path = OnboardIaFastPath(agent, speak=False, memory=memory)
+
+    output = fast_path.invoke({"input": "flight ready"})
+
+    assert output["output"] == "Flight Ready, done."
+    assert performed and not agent.inputs
+    messages = memory.load_memory_variables({})["chat_history"]
+    assert [message.content for message in messages] == ["flight ready", "Flight Ready, done."]
+
+
+def test_fast_path_passes_unmatched_commands_through(monkeypatch):
+    monkeypatch.setattr(fastpath, "perform_actions", lambda actions: None)
+    agent = _Agent()
+    assert OnboardIaFastPath(agent, speak=False).invoke({"input": "what is the weather on Hurston"})["output"] == "from the agent"
+
+
+def test_part_of_a_name_does_not_match():
+    matcher = KeymapMatcher()
+    assert matcher.match("toggle power") is None
+    assert [entry.action_name for entry in matcher.match("toggle power all").entries] == ["Toggle Power - All"]
+
+
+def test_spelling_mistakes_still_name_every_word():
+    entries = [_entry("Cruise Control", "C", ("c",)), _entry("Cruise Missile", "M", ("m",))]
+    assert KeymapMatcher(entries).match("cruise contrl") is not None
+    assert KeymapMatcher(entries).match("cruise") is None
+
+
+def test_irreversible_controls_are_guarded():
+    entries = [
+        _entry("Jettison Cargo", "Left ALT + J", ("left alt", "j"), section="Mining Systems"),
+        _entry("Exit Seat", "Hold Y", ("y",), section="Flight Controls"),
+        _entry("Cruise Control", "C", ("c",)),
+    ]
+    matcher = KeymapMatcher(entries, guarded_threshold=0.99)
+    assert matcher.match("jettison cargo") is not None
+    assert matcher.match("exit seat") is not None
+    # Mistakes that are close enough for any other control
+    assert matcher.match("jettison cargoes") is None
+    assert matcher.match("exit seats") is None
+    assert matcher.match("cruise controls") is not None
@@ -0,0 +1,109 @@
+import threading
+from typing import Any, List, Optional
+
+from langchain.llms.fake import FakeListLLM
+from langchain.schema.messages import AIMessage, HumanMessage, SystemMessage
+
+from openjanus.chains.memory import BackgroundSummaryBufferMemory, TokenBufferMemory
+from openjanus.utils.tokens import count_message_tokens
+
+
+def _turn_tokens(command: str, response: str) -> int:
+    return count_message_tokens(HumanMessage(content=command)) + count_message_tokens(AIMessage(content=response))
+
+
+def _save_turns(memory, count: int, start: int = 0):
+    for index in range(start, start + count):
+        memory.save_context({"input": f"command number {index}"}, {"output": f"response number {index}"})
+
+
+class GatedLLM(FakeListLLM):
+    """Returns its responses only once the gate is opened, to catch a summary while it is in progress"""
+    gate: Any
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        assert self.gate.wait(timeout=5)
+        return super()._call(prompt, stop, **kwargs)
+
+
+def test_token_buffer_drops_oldest_turns_over_the_budget():
+    turn = _turn_tokens("command number 0", "response number 0")
+    memory = TokenBufferMemory(max_token_limit=turn * 2, return_messages=True)
+    _save_turns(memory, 5)
+    messages = memory.load_memory_variables({})["history"]
+    assert [message.content for message in messages] == [
+        "command number 3", "response number 3", "command number 4", "response number 4",
+    ]
+    assert memory.token_count == sum(count_message_tokens(message) for message in messages)
+    assert memory.token_count <= memory.max_token_limit
+
+
+def test_token_buffer_keeps_the_latest_turn_over_the_budget():
+    memory = TokenBufferMemory(max_token_limit=1, return_messages=True)
+    _save_turns(memory, 3)
+    messages = memory.load_memory_variables({})["history"]
+    assert [message.content for message in messages] == ["command number 2", "response number 2"]
+
+
+def test_token_buffer_recounts_messages_added_directly():
+    memory = TokenBufferMemory(max_token_limit=1000, return_messages=True)
+    memory.chat_memory.add_user_message("added outside save_context")
+    _save_turns(memory, 1)
+    assert memory.token_count == sum(count_message_tokens(message) for message in memory.chat_memory.messages)
+    memory.clear()
+    assert memory.token_count == 0
+    assert memory.load_memory_variables({})["history"] == []
+
+
+def test_summary_buffer_summarizes_what_overflows_the_budget():
+    turn = _turn_tokens("command number 0", "response number 0")
+    memory = BackgroundSummaryBufferMemory(
+        llm=FakeListLLM(responses=["The pilot gave commands 0 to 2."]),
+        max_token_limit=turn * 2,
+        background=False,
+        return_messages=True,
+    )
+    _save_turns(memory, 2)
+    assert memory.moving_summary_buffer == ""
+    _save_turns(memory, 1, start=2)
+    messages = memory.load_memory_variables({})["history"]
+    assert isinstance(messages[0], SystemMessage)
+    assert messages[0].content == "The pilot gave commands 0 to 2."
+    assert [message.content for message in messages[1:]] == [
+        "command number 1", "response number 1", "command number 2", "response number 2",
+    ]
+    assert memory.token_count <= memory.max_token_limit
+
+
+def test_summary_buffer_summarizes_in_the_background():
+    turn = _turn_tokens("command number 0", "response number 0")
+    gate = threading.Event()
+    memory = BackgroundSummaryBufferMemory(
+        llm=GatedLLM(responses=["A summary."], gate=gate),
+        max_token_limit=turn,
+        return_messages=True,
+    )
+    _save_turns(memory, 2)
+    # Saving did not wait for the summary, and the buffer is returned whole until it is ready
+    assert len(memory.load_memory_variables({})["history"]) == 4
+    gate.set()
+    memory.flush(timeout=5)
+    messages = memory.load_memory_variables({})["history"]
+    assert messages[0].content == "A summary."
+    assert [message.content for message in messages[1:]] == ["command number 1", "response number 1"]
+    assert memory.token_count <= memory.max_token_limit
+
+
+def test_summary_of_a_cleared_conversation_is_discarded():
+    gate = threading.Event()
+    memory = BackgroundSummaryBufferMemory(
+        llm=GatedLLM(responses=["A stale summary."], gate=gate),
+        max_token_limit=1,
+        return_messages=True,
+    )
+    _save_turns(memory, 1)
+    memory.clear()
+    gate.set()
+    memory.flush(timeout=5)
+    assert memory.moving_summary_buffer == ""
+    assert memory.load_memory_variables({})["history"] == []
@@ -0,0 +1,122 @@
+import json
+
+from langchain.chat_models.fake import FakeListChatModel
+import pytest
+
+from openjanus.chains.memory import TokenBufferMemory
+from openjanus.chains.onboardia import actions
+from openjanus.chains.onboardia import plan_cache as plan_cache_module
+from openjanus.chains.onboardia.executor import ActionExecutor, VirtualInputBackend
+from openjanus.chains.onboardia.plan_cache import PlanCache, is_cacheable, normalize_utterance
+from openjanus.chains.onboardia.single_call import OnboardIaSingleCallChain
+
+
+LIGHTS = [{"keys": ["l"], "hold": False, "action_name": "Toogle Ship Lights"}]
+GEAR = [{"keys": ["n"], "hold": False, "action_name": "Landing Gear"}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(plan_cache_module.time, "time", clock)
+    return clock
+
+
+def test_commands_are_normalized():
+    assert normalize_utterance("Computer, lights on please.") == normalize_utterance("lights on")
+    assert normalize_utterance("lights on") != normalize_utterance("lights off")
+
+
+def test_plan_is_replayed(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.sqlite"), fingerprint="a")
+    cache.put("Lights on, please", LIGHTS, "Lights on.")
+    plan = cache.get("computer lights on")
+    assert plan.actions == LIGHTS
+    assert plan.response == "Lights on."
+    assert cache.get("lights off") is None
+
+
+def test_plans_expire(clock):
+    cache = PlanCache(":memory:", ttl_seconds=60, fingerprint="a")
+    cache.put("lights on", LIGHTS)
+    clock.now += 59
+    assert cache.get("lights on") is not None
+    clock.now += 2
+    assert cache.get("lights on") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_plan_is_evicted(clock):
+    cache = PlanCache(":memory:", max_entries=2, fingerprint="a")
+    cache.put("lights on", LIGHTS)
+    clock.now += 1
+    cache.put("gear down", GEAR)
+    clock.now += 1
+    # Using the older plan makes the newer one the least recently used
+    assert cache.get("lights on") is not None
+    clock.now += 1
+    cache.put("gear up", GEAR)
+    assert len(cache) == 2
+    assert cache.get("gear down") is None
+    assert cache.get("lights on") is not None
+    assert cache.get("gear up") is not None
+
+
+def test_plans_are_dropped_when_the_keymap_changes(tmp_path):
+    path = str(tmp_path / "plans.sqlite")
+    PlanCache(path, fingerprint="a").put("lights on", LIGHTS)
+    assert PlanCache(path, fingerprint="a").get("lights on") is not None
+    assert PlanCache(path, fingerprint="b").get("lights on") is None
+    assert len(PlanCache(path, fingerprint="a")) == 0
+
+
+def test_commands_that_refer_back_are_not_cacheable():
+    assert is_cacheable("Computer, lights on please")
+    assert is_cacheable("request landing")
+    assert not is_cacheable("do that again")
+    assert not is_cacheable("undo")
+    assert not is_cacheable("same as before")
+
+
+class CountingChatModel(FakeListChatModel):
+    """Answers every command with the same response, counting how often it was asked"""
+    calls: int = 0
+
+    def _stream(self, *args, **kwargs):
+        self.calls += 1
+        return super()._stream(*args, **kwargs)
+
+
+def _single_call_chain(monkeypatch, llm: CountingChatModel) -> OnboardIaSingleCallChain:
+    executor = ActionExecutor(VirtualInputBackend(), tap_seconds=0.01, gap_seconds=0.01)
+    monkeypatch.setattr(actions, "get_action_executor", lambda: executor)
+    memory = TokenBufferMemory(return_messages=True, memory_key="chat_history", input_key="input", output_key="response")
+    # The memory is shared with the fast path and the earlier turns, so it is never empty
+    memory.save_context({"input": "flight ready"}, {"response": "Flight Ready, done."})
+    return OnboardIaSingleCallChain(llm=llm, memory=memory, plan_cache=PlanCache(":memory:", fingerprint="a"), speak=False)
+
+
+def test_repeated_command_is_performed_from_the_cache_despite_history(monkeypatch):
+    llm = CountingChatModel(responses=[json.dumps({"actions": LIGHTS, "response": "Lights on."})])
+    chain = _single_call_chain(monkeypatch, llm)
+    for _ in range(3):
+        assert chain.invoke({"input": "lights on"})["response"] == "Lights on."
+    assert llm.calls == 1
+    assert len(chain.plan_cache) == 1
+
+
+def test_command_that_refers_back_always_goes_to_the_llm(monkeypatch):
+    llm = CountingChatModel(responses=[json.dumps({"actions": LIGHTS, "response": "Lights on."})])
+    chain = _single_call_chain(monkeypatch, llm)
+    for _ in range(2):
+        chain.invoke({"input": "do that again"})
+    assert llm.calls == 2
+    assert len(chain.plan_cache) == 0
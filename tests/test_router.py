@@ -0,0 +1,35 @@
+from langchain.memory import ConversationBufferMemory
+from langchain.tools import Tool
+
+from openjanus.toolkits.registry import OpenJanusToolkit, OpenJanusToolRegistry, OpenJanusToolSpec
+from openjanus.toolkits.router import BaseIntentRouter, RouteDecision, RoutingAgent
+
+
+def build_echo_tool(llm):
+    return Tool(name="Echo", description="Repeats the request", func=lambda query: f"echo: {query}")
+
+
+class _AlwaysEcho(BaseIntentRouter):
+    def route(self, text):
+        return RouteDecision(tool_name="Echo", confidence=1.0, reason="test")
+
+
+class _Agent:
+    def __init__(self):
+        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+
+
+def _routing_agent(agent):
+    registry = OpenJanusToolRegistry()
+    registry._entry_points_loaded = True
+    registry.register(OpenJanusToolSpec(name="Echo", description="Repeats the request", builder=f"{__name__}:build_echo_tool"))
+    return RoutingAgent(agent, OpenJanusToolkit(llm=None, registry=registry), router=_AlwaysEcho())
+
+
+def test_routed_turns_are_saved_to_the_agents_memory():
+    agent = _Agent()
+    output = _routing_agent(agent).invoke({"input": "hello", "chat_history": []})
+
+    assert output["output"] == "echo: hello"
+    messages = agent.memory.load_memory_variables({})["chat_history"]
+    assert [message.content for message in messages] == ["hello", "echo: hello"]
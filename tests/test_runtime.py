@@ -0,0 +1,82 @@
+import asyncio
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from openjanus.app import runtime as runtime_module
+from openjanus.app.runtime import InteractionInterrupted, InteractionRuntime, barge_in
+from openjanus.tts.playback import get_speech_interrupter
+
+
+def test_stop_cancels_jobs_still_queued_after_the_timeout():
+    runtime = InteractionRuntime(concurrency=1, max_queued=4)
+    runtime.start()
+    running = runtime.submit(lambda: asyncio.sleep(10), name="slow")
+    queued = runtime.submit(lambda: asyncio.sleep(0), name="queued")
+    runtime.stop(timeout=0.1)
+    with pytest.raises(InteractionInterrupted):
+        running.result(timeout=1)
+    assert queued.cancelled()
+    assert runtime.submit(lambda: asyncio.sleep(0)).cancelled()
+
+
+def test_stop_lets_queued_jobs_finish_within_the_timeout():
+    runtime = InteractionRuntime(concurrency=1, max_queued=4)
+    runtime.start()
+    futures = [runtime.submit(lambda index=index: asyncio.sleep(0.01, result=index)) for index in range(3)]
+    runtime.stop(timeout=5)
+    assert [future.result(timeout=1) for future in futures] == [0, 1, 2]
+
+
+def _player() -> subprocess.Popen:
+    """Stands in for an audio player that is still playing"""
+    return subprocess.Popen([sys.executable, "-c", "import time; time.sleep(10)"], stdin=subprocess.PIPE)
+
+
+def test_interrupt_cancels_the_running_job_and_drops_queued_ones():
+    runtime = InteractionRuntime(concurrency=1, max_queued=4)
+    runtime.start()
+    try:
+        started = threading.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        running = runtime.submit(slow, name="slow")
+        queued = runtime.submit(lambda: asyncio.sleep(0), name="queued")
+        assert started.wait(timeout=5)
+        runtime.interrupt()
+        with pytest.raises(InteractionInterrupted):
+            running.result(timeout=5)
+        assert queued.cancelled()
+        # The workers are not cancelled along with the jobs, later ones still run
+        assert runtime.submit(lambda: asyncio.sleep(0, result="next")).result(timeout=5) == "next"
+    finally:
+        runtime.stop(timeout=1)
+
+
+def test_barge_in_kills_players_and_interrupts_the_running_job(monkeypatch):
+    runtime = InteractionRuntime(concurrency=1, max_queued=4)
+    runtime.start()
+    monkeypatch.setattr(runtime_module, "get_runtime", lambda: runtime)
+    process = _player()
+    try:
+        started = threading.Event()
+
+        async def speaking():
+            started.set()
+            await asyncio.sleep(10)
+
+        running = runtime.submit(speaking)
+        assert started.wait(timeout=5)
+        with get_speech_interrupter().track(process):
+            barge_in()
+            assert process.wait(timeout=5) is not None
+        with pytest.raises(InteractionInterrupted):
+            running.result(timeout=5)
+    finally:
+        process.kill()
+        runtime.stop(timeout=1)
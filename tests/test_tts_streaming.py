@@ -0,0 +1,145 @@
+import json
+import sys
+import threading
+import time
+
+from openjanus.tts import playback
+from openjanus.tts.playback import get_speech_interrupter, play_audio_stream
+from openjanus.tts.streaming import FinalAnswerExtractor, JsonFieldExtractor, SentenceSegmenter, SpeechPipeline
+
+
+def _segment(text: str, size: int, **kwargs) -> list:
+    segmenter = SentenceSegmenter(**kwargs)
+    sentences = []
+    for start in range(0, len(text), size):
+        sentences += segmenter.feed(text[start:start + size])
+    rest = segmenter.flush()
+    return sentences + ([rest] if rest else [])
+
+
+def _extract(extractor: JsonFieldExtractor, text: str, size: int) -> str:
+    return "".join(extractor.feed(text[start:start + size]) for start in range(0, len(text), size))
+
+
+def test_sentences_are_split_however_the_text_arrives():
+    text = "Quantum drive spooling up now. Destination is Port Olisar, e.g. the station! Ready?"
+    for size in (1, 4, 16, len(text)):
+        assert _segment(text, size, min_chars=10) == [
+            "Quantum drive spooling up now.",
+            "Destination is Port Olisar, e.g. the station!",
+            "Ready?",
+        ]
+
+
+def test_short_sentences_are_joined_to_the_next():
+    assert _segment("Yes. Gear is now down and locked. Okay.", 3, min_chars=20) == [
+        "Yes. Gear is now down and locked.",
+        "Okay.",
+    ]
+
+
+def test_sentence_is_spoken_as_soon_as_it_ends():
+    segmenter = SentenceSegmenter(min_chars=5)
+    assert segmenter.feed("Shields are up") == []
+    # A full stop could still be part of e.g. a number, until the space after it
+    assert segmenter.feed(".") == []
+    assert segmenter.feed(" Weapons") == ["Shields are up."]
+    assert segmenter.feed(" are hot.") == []
+    assert segmenter.flush() == "Weapons are hot."
+    assert segmenter.flush() is None
+
+
+def test_long_text_is_broken_at_a_clause():
+    text = "Scanning the area, " + "and nothing else " * 20
+    sentences = _segment(text, 7, min_chars=5, max_chars=60)
+    assert sentences[0] == "Scanning the area,"
+    assert all(len(sentence) <= 60 for sentence in sentences)
+    assert " ".join(sentences).split() == text.split()
+
+
+def test_json_field_is_decoded_as_it_arrives():
+    response = json.dumps({
+        "actions": [{"keys": ["n"], "action_name": "Landing Gear"}],
+        "response": 'Gear "down",\nand locked ✓ \\ done',
+    })
+    for size in (1, 2, 5, len(response)):
+        assert _extract(JsonFieldExtractor("response"), response, size) == 'Gear "down",\nand locked ✓ \\ done'
+
+
+def test_json_field_stops_at_its_closing_quote():
+    extractor = JsonFieldExtractor("response")
+    assert extractor.feed('{"response": "Lights') == "Lights"
+    assert extractor.feed(' on.", "other": "ignored"}') == " on."
+    assert extractor.feed('{"response": "again"}') == ""
+
+
+def test_final_answer_is_extracted():
+    blob = '```json\n{\n    "action": "Final Answer",\n    "action_input": "Docking request sent."\n}\n```'
+    for size in (1, 3, len(blob)):
+        assert _extract(FinalAnswerExtractor(), blob, size) == "Docking request sent."
+
+
+def test_tool_input_is_not_extracted():
+    blob = '{"action": "Onboard IA", "action_input": "lower the landing gear"}'
+    for size in (1, 3, len(blob)):
+        assert _extract(FinalAnswerExtractor(), blob, size) == ""
+
+
+class BlockingTts:
+    """A pipelined TTS whose first sentence keeps playing until it is released"""
+    def __init__(self):
+        self.played = []
+        self.playing = threading.Event()
+        self.release = threading.Event()
+
+    def synthesize(self, text: str) -> bytes:
+        return text.encode()
+
+    def play_audio(self, audio: bytes):
+        self.played.append(audio.decode())
+        self.playing.set()
+        self.release.wait(timeout=5)
+
+
+def test_interrupted_pipeline_skips_the_sentences_left():
+    tts = BlockingTts()
+    pipeline = SpeechPipeline(tts)
+    for sentence in ("Shields are up.", "Weapons are hot.", "Good luck."):
+        pipeline.say(sentence)
+    pipeline.close()
+    assert tts.playing.wait(timeout=5)
+    get_speech_interrupter().interrupt()
+    tts.release.set()
+    pipeline.wait(timeout=5)
+    pipeline._player.join(timeout=5)
+    assert not pipeline._player.is_alive()
+    assert tts.played == ["Shields are up."]
+    # Nothing said after the interruption is queued either
+    pipeline.say("Too late.")
+    assert tts.played == ["Shields are up."]
+
+
+def test_interrupt_kills_the_player(monkeypatch):
+    monkeypatch.setitem(playback.PLAYER_COMMANDS, "mpv", [sys.executable, "-c", "import time; time.sleep(10)"])
+    monkeypatch.setattr(playback, "_which", lambda player: True)
+    interrupter = get_speech_interrupter()
+    stopped = threading.Event()
+
+    def audio():
+        # Keeps streaming until the player is gone
+        for _ in range(200):
+            if stopped.is_set():
+                return
+            yield b"\0" * 64
+            time.sleep(0.02)
+
+    played = []
+    player = threading.Thread(target=lambda: played.append(play_audio_stream(audio())))
+    player.start()
+    deadline = time.perf_counter() + 5
+    while not interrupter.interrupt() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    player.join(timeout=5)
+    stopped.set()
+    assert not player.is_alive()
+    assert played and len(played[0]) < 200 * 64